@@ -84,6 +84,10 @@ USER_DICT = {
              'cores': PROCESSORS,
              'time_limit': 30. * 60.,
              'template_file': TEMPLATE_FILE,
+             # Setting in the template changed by each parameter
+             'parameter_paths': ['tec.strut_height', 'tec.strut_width'],
+             # Diagnostics read from the efficiency file with the efficiency. Recorded if sim_specs['out'] has the field.
+             'diagnostics': {},
              'scaling': lambda x: -1.0 * x  # Change to minimization problem, seeking eff = -1.0
              }
 
@@ -5,10 +5,15 @@ u""":mod:`rsopt` package
 :license: http://www.apache.org/licenses/LICENSE-2.0.html
 """
 from __future__ import absolute_import, division, print_function
-import pkg_resources
 
-try:
-    # We only have a version once the package is installed.
-    __version__ = pkg_resources.get_distribution('rsopt').version
-except pkg_resources.DistributionNotFound:
-    pass
+
+def __getattr__(name):
+    # pkg_resources is slow to import so the version is only looked up when requested
+    if name == '__version__':
+        import pkg_resources
+        try:
+            # We only have a version once the package is installed.
+            return pkg_resources.get_distribution('rsopt').version
+        except pkg_resources.DistributionNotFound:
+            pass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -36,7 +36,7 @@ def optimize_objective_k(lpx, lpy, lpz, pole_properties, pole_segmentation, pole
 
 def optimize_objective_km(lpx, lpy, lpz, pole_properties, pole_segmentation, pole_color,
                      lmx, lmz, magnet_properties, magnet_segmentation, magnet_color,
-                     gap, offset, period, period_number):
+                     gap, offset, period, period_number, km_mode='full', km_points=21, km_stride=4):
     """
     create objective function based on the maximum value of the kick maps
     arguments:
@@ -52,23 +52,43 @@ def optimize_objective_km(lpx, lpy, lpz, pole_properties, pole_segmentation, pol
       offset = vertical offset / mm of the magnet blocks w/rt the poles
       period = length of one undulator period / mm
       period_number = number of full periods of the undulator magnetic field
+      km_mode = kick map evaluation mode passed to km_max: 'full' or 'adaptive'
+      km_points = number of kick map grid points in each transverse direction
+      km_stride = coarse grid downsampling factor used when km_mode is 'adaptive'
     return: objective function
     """
+    objectives = optimize_objectives_km(lpx, lpy, lpz, pole_properties, pole_segmentation, pole_color,
+                     lmx, lmz, magnet_properties, magnet_segmentation, magnet_color,
+                     gap, offset, period, period_number, km_mode=km_mode, km_points=km_points, km_stride=km_stride)
+    result = objectives['k_deviation'] + 10000 * objectives['km_max']
+    print("objective: ", result)
+    return result
+
+
+def optimize_objectives_km(lpx, lpy, lpz, pole_properties, pole_segmentation, pole_color,
+                     lmx, lmz, magnet_properties, magnet_segmentation, magnet_color,
+                     gap, offset, period, period_number, km_mode='full', km_points=21, km_stride=4):
+    """
+    separate objectives of optimize_objective_km for multi-objective optimization (software nsga2)
+    arguments: see optimize_objective_km
+    return: dict with
+      k_deviation = |K - K0|
+      km_max = maximum value of the kick maps
+    """
     grp, pole, magnet = hybrid_undulator(lpx, lpy, lpz, pole_properties, pole_segmentation, pole_color,
                      lmx, lmz, magnet_properties, magnet_segmentation, magnet_color,
                      gap, offset, period, period_number)
     p0 = [0,-period*period_number/2,0]
     r1 = 0.75*gap
-    np1 = 21
+    np1 = km_points
     r2 = 0.75*gap
-    np2 = 21
+    np2 = km_points
     k_per_val = undulatorK_simple(grp, period)-2.112390751320377
-    km_val = km_max(grp,p0,period,period_number,r1,np1,r2,np2)
-    result = np.abs(k_per_val) + 10000 * km_val
-    print("lp: ",[lpx, lpy, lpz], ",k-k0 is: ", k_per_val, ",maximum kick map value is: ", km_val, "objective: ", result)
-    return result
+    km_val = km_max(grp,p0,period,period_number,r1,np1,r2,np2,mode=km_mode,stride=km_stride)
+    print("lp: ",[lpx, lpy, lpz], ",k-k0 is: ", k_per_val, ",maximum kick map value is: ", km_val)
+    return {'k_deviation': np.abs(k_per_val), 'km_max': km_val}
 
-def optimize_objective_km_appleII(period, period_number, gap, gapx, phase, phaseType, lx, lz, cx, cz, air, br, mu, nDiv, bs1_fac, bs2_fac, bs3_fac, s1_fac, s2_fac, s3_fac, bs2dz, indsMagDispQP, vertMagDispQP, _use_sym=False):
+def optimize_objective_km_appleII(period, period_number, gap, gapx, phase, phaseType, lx, lz, cx, cz, air, br, mu, nDiv, bs1_fac, bs2_fac, bs3_fac, s1_fac, s2_fac, s3_fac, bs2dz, indsMagDispQP, vertMagDispQP, _use_sym=False, km_mode='full', km_points=21, km_stride=4):
     """
     create objective function based on the maximum value of the kick maps of an appleII type undulator
     arguments:
@@ -95,6 +115,9 @@ def optimize_objective_km_appleII(period, period_number, gap, gapx, phase, phase
       bs2dz = vertical displacement of vertically-magnetised termination block
       indsMagDispQP = indexes of magnets counting from the central magnet of the structure, which has index 0.
       vertMagDispQP = 0
+      km_mode = kick map evaluation mode passed to km_max: 'full' or 'adaptive'
+      km_points = number of kick map grid points in each transverse direction
+      km_stride = coarse grid downsampling factor used when km_mode is 'adaptive'
     return: objective function
     """
     #Terminations
@@ -112,11 +135,11 @@ def optimize_objective_km_appleII(period, period_number, gap, gapx, phase, phase
     
     p0 = [0,-period*period_number/2,0]
     r1 = 0.75*gap
-    np1 = 21
+    np1 = km_points
     r2 = 0.75*gap
-    np2 = 21
+    np2 = km_points
     k_per_val = undulatorK_simple(grp, period)-4.579876009296463
-    km_val = km_max(grp,p0,period,period_number,r1,np1,r2,np2)
+    km_val = km_max(grp,p0,period,period_number,r1,np1,r2,np2,mode=km_mode,stride=km_stride)
     result = np.abs(k_per_val) + 100 * km_val
     print("(lx, lz, cx, cz): ",[lx, lz, cx, cz], ",k-k0 is: ", k_per_val, ",maximum kick map value is: ", km_val, "objective: ", result)#",k-k0 is: ", k_per_val, 
     return result
@@ -514,7 +537,7 @@ def undulatorK_simple(obj, per, pf_loc=None, prec=1e-5, maxIter=10000, lprint=Fa
               pf_loc, ")\nperiod is", per, "(given input)\nk is", k)
     return k
 
-def km_max(obj,p0,per,nper,r1,np1,r2,np2,vl=[0,1,0],vt=[1,0,0]):
+def km_max(obj,p0,per,nper,r1,np1,r2,np2,vl=[0,1,0],vt=[1,0,0],mode='full',stride=4):
     """
     compute the maximum value of kickmap
     arguments:
@@ -526,6 +549,8 @@ def km_max(obj,p0,per,nper,r1,np1,r2,np2,vl=[0,1,0],vt=[1,0,0]):
       np2 = number of points in transverse direction (vt cross vl, vertical)
       vl = longitudinal integration direction. Defaults to [0,1,0] if not given.
       vt = one of the transverse direction (horizontal). Defaults to [1,0,0] if not given.
+      mode = 'full' computes the kick map on the whole np1 x np2 grid, 'adaptive' uses km_max_adaptive
+      stride = coarse grid downsampling factor used when mode is 'adaptive'
     return:
       the maximum value of horizontal and vertical kick
     """
@@ -536,11 +561,116 @@ def km_max(obj,p0,per,nper,r1,np1,r2,np2,vl=[0,1,0],vt=[1,0,0]):
     en = 1     #eletron energy in GeV (required only if units are rad or microrad)
     oFormat = 'fix'     #the format of the output data string: fix or tab
 
+    if mode == 'adaptive':
+        return km_max_adaptive(obj,p0,per,nper,r1,np1,r2,np2,vl=vl,vt=vt,stride=stride)
+    elif mode != 'full':
+        raise ValueError("km_max mode must be one of {}. Received: {}".format(_KM_MODES, mode))
+
     km = rad.FldFocKickPer(obj,p0,vl,per,nper,vt,r1,np1,r2,np2)
+    km_max, _ = _kick_map_peak(km)
+    return km_max
+
+
+_KM_MODES = ('full', 'adaptive')
+# Location of the kick map maximum found by the last adaptive evaluation in this process (i.e. on this libEnsemble
+# worker). Neighbouring optimizer points usually share a maximum location so it is refined again on the next call.
+_KM_MAX_LOCATION = {}
+
+
+def _kick_map_peak(km):
+    """
+    find the maximum of the horizontal and vertical kick matrices returned by rad.FldFocKickPer
+    arguments:
+      km = output of rad.FldFocKickPer. Matrix rows run along the vertical direction (km[4]) and columns along vt (km[3]).
+    return:
+      maximum kick value, (row, column) index of the maximum
+    """
     km_h = np.round(np.array(km[0]),10)
     km_v = np.round(np.array(km[1]),10)
-    km_max = max(np.amax(km_h),np.amax(km_v))
-    return km_max
+    km_hv = np.maximum(km_h, km_v).reshape(km_h.shape[0], -1)
+    index = np.unravel_index(np.argmax(km_hv), km_hv.shape)
+    return km_hv[index], index
+
+
+def _grid_stride(npoints, stride):
+    # largest stride <= `stride` that keeps every coarse grid point on the full grid
+    stride = max(1, min(int(stride), npoints - 1))
+    while stride > 1 and (npoints - 1) % stride:
+        stride -= 1
+    return stride
+
+
+def _grid_spacing(r, npoints):
+    return r / (npoints - 1) if npoints > 1 else 0.
+
+
+def _km_window(obj,p0,per,nper,vl,vt,vn,center,r1,np1,r2,np2):
+    # kick map maximum on a grid centered at `center` = (horizontal, vertical) offset from p0
+    p_center = np.asarray(p0, dtype=float) + center[0] * vt + center[1] * vn
+    km = rad.FldFocKickPer(obj,p_center.tolist(),vl.tolist(),per,nper,vt.tolist(),r1,np1,r2,np2)
+    peak, (i, j) = _kick_map_peak(km)
+    # positions of the matrix columns (along vt) and rows (vertical) are returned by Radia. Rows run from the top of
+    # the grid down. The grid is centered on p_center so positions are taken relative to their mean.
+    horizontal, vertical = np.asarray(km[3], dtype=float), np.asarray(km[4], dtype=float)
+    location = (center[0] + horizontal[j] - np.mean(horizontal), center[1] + vertical[i] - np.mean(vertical))
+    return peak, location
+
+
+def km_max_adaptive(obj,p0,per,nper,r1,np1,r2,np2,vl=[0,1,0],vt=[1,0,0],stride=4):
+    """
+    compute the maximum value of kickmap from a downsampled grid with local refinement
+    The kick map is first computed on a coarse grid made of every `stride` point of the full np1 x np2 grid. The full
+    resolution grid is then computed within one coarse cell of the coarse maximum and of the maximum found by the
+    previous call on this worker. All evaluated points belong to the full grid, so the result never exceeds the full
+    grid maximum and is equal to it whenever the full grid maximum lies inside one of the refined windows.
+    For the default 21 x 21 grid and stride=4 this evaluates 117 (or 198 with a separate cached window) of 441 points.
+    arguments:
+      obj = undulator object
+      p0 = the starting point of longitudinal integration
+      r1 = range of the transverse grid along vt (horizontal)
+      np1 = number of points in transverse direction vt (horizontal)
+      r2 = range of the transverse grid along (vt cross vl, vertical)
+      np2 = number of points in transverse direction (vt cross vl, vertical)
+      vl = longitudinal integration direction. Defaults to [0,1,0] if not given.
+      vt = one of the transverse direction (horizontal). Defaults to [1,0,0] if not given.
+      stride = coarse grid downsampling factor. Reduced if needed so that coarse points lie on the full grid.
+    return:
+      the maximum value of horizontal and vertical kick
+    """
+    vl = np.asarray(vl, dtype=float)
+    vt = np.asarray(vt, dtype=float)
+    vn = np.cross(vt, vl)
+    s1, s2 = _grid_stride(np1, stride), _grid_stride(np2, stride)
+    h1, h2 = _grid_spacing(r1, np1), _grid_spacing(r2, np2)
+    if 2 * s1 + 1 > np1 or 2 * s2 + 1 > np2:
+        # grid is too small to downsample
+        return km_max(obj,p0,per,nper,r1,np1,r2,np2,vl=vl.tolist(),vt=vt.tolist(),mode='full')
+
+    # coarse pass over the whole grid
+    np1_c, np2_c = (np1 - 1) // s1 + 1, (np2 - 1) // s2 + 1
+    best, best_location = _km_window(obj,p0,per,nper,vl,vt,vn,(0., 0.),
+                                     (np1_c - 1) * s1 * h1,np1_c,(np2_c - 1) * s2 * h2,np2_c)
+
+    # refine around the coarse maximum and around the maximum from the previous call if it is elsewhere
+    cache_key = (r1, np1, r2, np2)
+    centers = [best_location]
+    previous = _KM_MAX_LOCATION.get(cache_key)
+    if previous is not None and (abs(previous[0] - best_location[0]) > s1 * h1 or
+                                 abs(previous[1] - best_location[1]) > s2 * h2):
+        centers.append(previous)
+
+    for center in centers:
+        # snap the window center to the full grid and keep the window inside the full grid range
+        i1 = np.clip(np.round((center[0] + r1 / 2.) / h1), s1, np1 - 1 - s1)
+        i2 = np.clip(np.round((center[1] + r2 / 2.) / h2), s2, np2 - 1 - s2)
+        peak, location = _km_window(obj,p0,per,nper,vl,vt,vn,(i1 * h1 - r1 / 2., i2 * h2 - r2 / 2.),
+                                    2 * s1 * h1,2 * s1 + 1,2 * s2 * h2,2 * s2 + 1)
+        if peak > best:
+            best, best_location = peak, location
+
+    _KM_MAX_LOCATION[cache_key] = best_location
+
+    return best
 
 def undulator_1st_int(obj, per, nper, prec=1e-5, maxIter=10000):
     """
@@ -0,0 +1,94 @@
+"""
+Execution of code run commands for the Runner.
+stdout and stderr of each code are written directly to log files in the active directory, so large outputs are never
+held in memory and a code cannot stall on a full pipe.
+"""
+import os
+import time
+import signal
+from subprocess import Popen
+
+_POLL_TIME = 0.1  # seconds
+
+
+class CodeProcess:
+    def __init__(self, run_command, directory, name, timeout=None):
+        """
+        :param run_command: (str) Shell command that runs the code
+        :param directory: (str) Directory the command is run in. Log files are written here.
+        :param name: (str) Code label. Output goes to log_{name}.log and error_{name}.log. Must be unique among codes
+                           run in the same directory at the same time.
+        :param timeout: (float) Seconds before the code is killed. No limit if None.
+        """
+        self.run_command = run_command
+        self.directory = directory
+        self.name = name
+        self.timeout = timeout
+        self.timed_out = False
+        self.returncode = None
+        self._process = None
+        self._start = None
+
+    @property
+    def log_file(self):
+        return os.path.join(self.directory, 'log_{code}.log'.format(code=self.name))
+
+    @property
+    def error_file(self):
+        return os.path.join(self.directory, 'error_{code}.log'.format(code=self.name))
+
+    def start(self):
+        with open(self.log_file, 'w') as stdout, open(self.error_file, 'w') as stderr:
+            # The code gets its own process group so everything started by the shell can be killed
+            self._process = Popen(self.run_command, shell=True, cwd=self.directory, stdout=stdout, stderr=stderr,
+                                  start_new_session=True)
+        self._start = time.time()
+
+    def poll(self):
+        """
+        Check if the code has finished. The code is killed if it has run past its timeout.
+        :return: (int or None) Return code or None if the code is still running
+        """
+        if self.returncode is not None:
+            return self.returncode
+        returncode = self._process.poll()
+        if returncode is None and self.timeout and time.time() - self._start > self.timeout:
+            self.kill()
+            self.timed_out = True
+            returncode = self._process.wait()
+        if returncode is not None:
+            self._finish(returncode)
+
+        return self.returncode
+
+    def kill(self):
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def wait(self):
+        while self.poll() is None:
+            time.sleep(_POLL_TIME)
+
+        return self.returncode
+
+    def _finish(self, returncode):
+        self.returncode = returncode
+        # Some codes write non-error messages to stderr (OPAL). The error log is only kept if there was output.
+        if os.path.getsize(self.error_file) == 0:
+            os.remove(self.error_file)
+
+
+def run_processes(processes):
+    """
+    Start codes and wait for all of them to finish. The codes run at the same time.
+    :param processes: (list) CodeProcess for each code
+    :return: (list) Return code of each code
+    """
+    for process in processes:
+        process.start()
+    while any(process.poll() is None for process in processes):
+        time.sleep(_POLL_TIME)
+
+    return [process.returncode for process in processes]
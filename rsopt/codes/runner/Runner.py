@@ -4,6 +4,7 @@ from uuid import uuid4
 from rsbeams.rsdata.switchyard import supported_codes as switchyard_supported
 from rsbeams.rsdata.switchyard import Switchyard
 from .Templates import code_templates
+from .Execution import run_processes
 from .Software import optimization_software
 from . import SUCCESS, HALT, ERROR
 # TODO: Make sure passing a null input to switchard doesn't break it so that we allow for codes generating their
@@ -53,6 +54,10 @@ class Runner:
          H: return back a modified species object
          code: Runner code 0: continue 1: halt and return output and species 2: critical failure
 
+        A code with `concurrent: true` in its setup is run at the same time as the code before it. It cannot use the
+        output of that code so it must set `input_distribution` in its setup. Post-processing and switchyard updates
+        for codes run together happen in schema order after all of them finish.
+
         There is currently no functionality to pre-process input for the first code in the chain.
         Parameter passing to the function is not supported.
 
@@ -78,10 +83,10 @@ class Runner:
         self.codes = []
         self.active_directory = None
 
-        self.H = {}
-
-        # Setup
+        # Setup. The compiled chain is not changed by `run` so one Runner can evaluate any number of points.
         self._set_codes_from_schema()
+        self.codes = tuple(self.codes)
+        self._groups = self._group_codes()
 
     def _set_codes_from_schema(self):
         for code in self.schema['codes']:
@@ -92,10 +97,20 @@ class Runner:
             name = list(code.keys())[0]  # There should be just one code name for each entry
             options = code[name]
             cd['code'] = code_templates[name](options)
+            if cd['code'].setup.get('concurrent'):
+                assert self.codes, "The first code cannot be concurrent"
+                assert cd['code'].setup.get('input_distribution'), \
+                    "{} runs concurrently and must set input_distribution".format(name)
             if self.processing:
                 cd['pre'], cd['post'] = self._check_for_processing(name)
             self.codes.append(cd)
 
+        # Codes of the same type would write the same input and log files. Their files are named by schema index.
+        names = [cd['code'].name for cd in self.codes]
+        for index, cd in enumerate(self.codes):
+            if names.count(cd['code'].name) > 1:
+                cd['code'].label = '{name}_{index}'.format(name=cd['code'].name, index=index)
+
         self._check_code_support()
 
     def _check_for_processing(self, code_name):
@@ -161,50 +176,71 @@ class Runner:
 
         return parameters
 
-    def _generate_switchyard_filename(self, switchyard, code):
+    def _generate_switchyard_filename(self, H, code):
+        switchyard = H['switchyard']
         name = '{input_format}_2_{output_format}'.format(input_format=switchyard.input_format, output_format=code['code'].name)
-        name = os.path.join(self.active_directory, name)
+        name = os.path.join(H['active_directory'], name)
         return name
 
-    def _update_distribution(self, code):
+    def _update_distribution(self, H, code):
         # Move distribution to appropriate format and run code
-        filename = self._generate_switchyard_filename(self.H['switchyard'], code)
         if code['code'].setup.get('input_distribution'):
             input_distribution = code['code'].setup['input_distribution']
         else:
-            input_distribution = self.H['switchyard'].write(filename, code['code'].name)
+            filename = self._generate_switchyard_filename(H, code)
+            input_distribution = H['switchyard'].write(filename, code['code'].name)
         
         # Python script is run in top level. Code commands are executed in their own directory.
         return os.path.split(input_distribution)[-1]
 
-    def _run_code(self, code, external_distribution=True):
-        # Run pre-processing
-        if code['pre']:
-            self.H, status = code['pre'](self.H)
-            if status > SUCCESS:
-                return self.H, status
-
-        # Move distribution to appropriate format and run code and then update switchyard
-        if external_distribution:
-            input_distribution = self._update_distribution(code)
-        else:
-            input_distribution = None
-
-        self.H, status = code['code'].run(self.H, input_distribution)
-        if status > SUCCESS:
-            return self.H, status
-
-        # Update switchyard
-        output_distribution = os.path.join(self.active_directory, code['code'].setup['output_distribution'])
-        if code['code'].name != 'genesis':
-            self.H['switchyard'] = Switchyard(output_distribution, code['code'].name)
-        else:
-            print("""Switchyard cannot load genesis output. H['switchyard'] will not be updated.""")
+    def _group_codes(self):
+        # Codes marked concurrent are run with the code before them
+        groups = []
+        for code in self.codes:
+            if code['code'].setup.get('concurrent'):
+                groups[-1].append(code)
+            else:
+                groups.append([code])
+        for group in groups:
+            labels = [code['code'].file_label for code in group]
+            assert len(set(labels)) == len(labels), "Concurrent codes must write different input and log files"
+
+        return groups
+
+    def _run_codes(self, H, codes, external_distribution=True):
+        processes = []
+        for code in codes:
+            # Run pre-processing
+            if code['pre']:
+                H, status = code['pre'](H)
+                if status > SUCCESS:
+                    return H, status
+
+            # Move distribution to appropriate format
+            if external_distribution or code['code'].setup.get('concurrent'):
+                input_distribution = self._update_distribution(H, code)
+            else:
+                input_distribution = None
+            code['code'].prepare(H, input_distribution)
+            processes.append(code['code'].create_process(H))
+
+        if any(returncode != 0 for returncode in run_processes(processes)):
+            return H, ERROR
+
+        for code in codes:
+            # Update switchyard
+            output_distribution = os.path.join(H['active_directory'], code['code'].setup['output_distribution'])
+            if code['code'].name != 'genesis':
+                H['switchyard'] = Switchyard(output_distribution, code['code'].name)
+            else:
+                print("""Switchyard cannot load genesis output. H['switchyard'] will not be updated.""")
 
-        if code['post']:
-            self.H, status = code['post'](self.H)
+            if code['post']:
+                H, status = code['post'](H)
+                if status > SUCCESS:
+                    return H, status
 
-        return self.H, status
+        return H, SUCCESS
 
     def run(self, input_parameters):
         # TODO: Another option here is to make run an iterable and just yield the appropriate next command
@@ -230,23 +266,21 @@ class Runner:
             the Software setting.
         :return: Output of `objective_function` if successful or (`H`, status_code) if halted early
         """
-        self.H['parameters'] = self._process_parameters(input_parameters)
+        # Everything set during an evaluation is kept in H. Nothing carries over to the next call.
+        H = {'parameters': self._process_parameters(input_parameters)}
         directory_name = self.schema['options'].get('directory')
-        self.H['active_directory'] = self.create_active_directory(name=directory_name)
+        H['active_directory'] = self.create_active_directory(name=directory_name)
 
         # Initialize switchyard
         if self.codes[0]['code'].setup.get('input_distribution'):
-            self.H['switchyard'] = Switchyard(self.codes[0]['code'].setup['input_distribution'],
-                                              self.codes[0]['code'].name)
+            H['switchyard'] = Switchyard(self.codes[0]['code'].setup['input_distribution'],
+                                         self.codes[0]['code'].name)
 
         # Run all codes and processors
-        for i, code in enumerate(self.codes):
-            if i == 0:
-                self.H, status = self._run_code(code, external_distribution=False)
-            else:
-                self.H, status = self._run_code(code, external_distribution=True)
+        for i, codes in enumerate(self._groups):
+            H, status = self._run_codes(H, codes, external_distribution=i > 0)
             if status > SUCCESS:
-                return self.H, status
+                return H, status
 
-        return self.objective_function(self.H)
+        return self.objective_function(H)
 
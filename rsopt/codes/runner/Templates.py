@@ -1,5 +1,5 @@
 import importlib, os, string
-from subprocess import Popen, PIPE
+from .Execution import CodeProcess, run_processes
 from . import SUCCESS, HALT, ERROR
 
 # TODO: Change supporting file naming scheme to follow variable name from import
@@ -10,6 +10,8 @@ from . import SUCCESS, HALT, ERROR
 class Template:
     def __init__(self, options):
         self.name = None
+        # Names the input and log files of the code. Set by the Runner if other codes of the same type are in the chain.
+        self.label = None
         self._options = options
         if options.get('settings'):
             self.settings = options['settings'].copy()
@@ -18,43 +20,44 @@ class Template:
         self.setup = options['setup'].copy()
         # parameters are taken in at run time (presumably from optimizer)
         self.parameters = {}
-        self.input_files = []
+        # Input file templates are never modified so the Template can be reused for every evaluation
+        self.input_files = ()
+        self.fields = ()
 
         self.import_input()
 
     def import_input(self):
         input_file = self.setup['input_file']
         input_file_module = importlib.import_module(input_file)
-        for key, val in input_file_module.__dict__.items():
-            if not key.startswith('_'):
-                self.input_files.append(val)
+        self.input_files = tuple(val for key, val in input_file_module.__dict__.items() if not key.startswith('_'))
+        # Format fields are parsed once
+        self.fields = tuple(formatter[1] for input_file in self.input_files
+                            for formatter in string.Formatter().parse(input_file) if formatter[1] is not None)
+        self._fixed_fields = {**self.settings, 'source_directory': self.setup['source_directory']}
 
     def _input_file_setup(self, H, distribution_name):
         """
         Load all settings, parameters, and filenames into the runfile strings
-        :return:
+        :return: (list) Text of each input file
         """
 
-        input_dict = {**self.settings, **H['parameters'],
-                      'source_directory': self.setup['source_directory'],
-                      'input_distribution': distribution_name}
+        input_dict = {**self._fixed_fields, **H['parameters'], 'input_distribution': distribution_name}
+
+        return [input_file.format_map(input_dict) for input_file in self.input_files]
 
-        for i, _ in enumerate(self.input_files):
-            self.input_files[i] = self.input_files[i].format(**input_dict)
+    @property
+    def file_label(self):
+        return self.label or self.name
 
-    def _write_input_files(self, H):
-        for i, input_file in enumerate(self.input_files):
-            write_path = os.path.join(H['active_directory'], '{name}_{index}.in'.format(name=self.name, index=i))
+    def _write_input_files(self, H, input_files):
+        for i, input_file in enumerate(input_files):
+            write_path = os.path.join(H['active_directory'], '{name}_{index}.in'.format(name=self.file_label, index=i))
             with open(write_path, 'w') as ff:
                 ff.write(input_file)
 
     def _validate_options(self):
-        required_keys = []
-        for input_file in self.input_files:
-            for formatter in string.Formatter().parse(input_file):
-                if formatter[1] is not None:
-                    assert formatter[1] != '', "{name} input files contain an unnamed Format field".format(name=self.name)
-                    required_keys.append(formatter[1])
+        required_keys = self.fields
+        assert '' not in required_keys, "{name} input files contain an unnamed Format field".format(name=self.name)
 
         # Check that all keys in input files are being defined in the options
         if self._options.get('settings'):
@@ -76,32 +79,39 @@ class Template:
         """
         return ''
 
+    def create_process(self, H):
+        """
+        Process running the code in the active directory. Output is written to log_{label}.log and error_{label}.log.
+        The code is killed if it runs longer than `timeout` seconds from setup.
+        :param H:
+        :return: CodeProcess
+        """
+        return CodeProcess(self.create_run_command(H), H['active_directory'], self.file_label, self.setup.get('timeout'))
+
     def _run_code(self, H):
-        run_command = self.create_run_command(H)
-        run = Popen(run_command, shell=True, stdout=PIPE, stderr=PIPE)
-        return_value = run.wait()
-        result, error = run.communicate()
-
-        if error:
-            # Some codes write non-error messages to stderr (OPAL)
-            # Separate completion check from error logging
-            with open(os.path.join(H['active_directory'], 'error_{code}.log'.format(code=self.name)), 'w') as ff:
-                ff.write(error.decode())
-        if return_value != 0:
+        returncode, = run_processes([self.create_process(H)])
+        if returncode != 0:
             return H, ERROR
 
         return H, SUCCESS
 
+    def prepare(self, H, distribution_name):
+        """
+        Handles parameter setup from optimizer, sets distribution name and writes the input files
+        :param H:
+        :param distribution_name:
+        :return:
+        """
+        self._write_input_files(H, self._input_file_setup(H, distribution_name))
+
     def run(self, H, distribution_name):
         """
-        Function that is called by Runner.run to execute each simulation.
-        Handles parameter setup from optimizer and sets distribution name
+        Prepare input files and execute the code.
         :param H:
         :param distribution_name:
         :return:
         """
-        self._input_file_setup(H, distribution_name)
-        self._write_input_files(H)
+        self.prepare(H, distribution_name)
         H, status = self._run_code(H)
 
         return H, status
@@ -119,9 +129,6 @@ class Elegant(Template):
         self._validate_options()
 
     def create_run_command(self, H):
-        active_directory = H['active_directory']
-        prefix = 'cd {dir};'.format(dir=active_directory)
-        suffix = '> log_{code}.log'.format(code=self.name)
         if self.setup['run_command'] in ['rsmpi', 'mpiexec', 'mpirun']:
             run_command = '{run_command}'.format(run_command=self.setup['run_command']) \
                           + ' -n {cores}'.format(cores=self.setup['cores'])
@@ -131,9 +138,8 @@ class Elegant(Template):
         else:
             run_command = 'elegant'
 
-        filename = '{code}_0.in'.format(code=self.name)
+        filename = '{code}_0.in'.format(code=self.file_label)
         run_command = run_command + ' {filename}'.format(filename=filename)
-        run_command = prefix + ' ' + run_command + ' ' + suffix
 
         return run_command
 
@@ -150,9 +156,6 @@ class Opal(Template):
         self._validate_options()
 
     def create_run_command(self, H):
-        active_directory = H['active_directory']
-        prefix = 'cd {dir};'.format(dir=active_directory)
-        suffix = '> log_{code}.log'.format(code=self.name)
         if self.setup['run_command'] in ['rsmpi', 'mpiexec', 'mpirun']:
             run_command = '{run_command}'.format(run_command=self.setup['run_command']) \
                           + ' -n {cores}'.format(cores=self.setup['cores'])
@@ -162,9 +165,8 @@ class Opal(Template):
         else:
             run_command = 'opal'
 
-        filename = '{code}_0.in'.format(code=self.name)
+        filename = '{code}_0.in'.format(code=self.file_label)
         run_command = run_command + ' {filename}'.format(filename=filename)
-        run_command = prefix + ' ' + run_command + ' ' + suffix
 
         return run_command
 
@@ -181,9 +183,6 @@ class Genesis(Template):
         self._validate_options()
 
     def create_run_command(self, H):
-        active_directory = H['active_directory']
-        prefix = 'cd {dir};'.format(dir=active_directory)
-        suffix = '> log_{code}.log'.format(code=self.name)
         if self.setup['run_command'] in ['rsmpi', 'mpiexec', 'mpirun']:
             run_command = '{run_command}'.format(run_command=self.setup['run_command']) \
                           + ' -n {cores}'.format(cores=self.setup['cores'])
@@ -193,9 +192,8 @@ class Genesis(Template):
         else:
             run_command = 'genesis'
 
-        filename = '{code}_0.in'.format(code=self.name)
+        filename = '{code}_0.in'.format(code=self.file_label)
         run_command = run_command + ' < {filename}'.format(filename=filename)
-        run_command = prefix + ' ' + run_command + ' ' + suffix
 
         return run_command
 
@@ -1,8 +1,24 @@
 from rsopt.codes.runner.Runner import Runner
 from libensemble.message_numbers import WORKER_DONE, WORKER_KILL, TASK_FAILED
+from rsopt.libe_tools.executors import LaunchLimiter
+from rsopt.codes.runner import ERROR
 import os, logging
 import numpy as np
-from time import sleep
+
+# Workers may run in their own directories so the ledger is kept in the directory the run was started from
+_RUN_DIRECTORY = os.getcwd()
+# rsmpi launches started too closely together have led to fatal errors. Possibly due to temporary files that are
+#   created in the same location.
+_LAUNCH_LIMITS = {'ledger': os.path.join(_RUN_DIRECTORY, 'rsopt_launches.json'),
+                  'min_interval': 5.,
+                  'max_attempts': 1}
+# Runners built by this worker process keyed by schema. Building a Runner parses the schema and imports templates.
+_RUNNERS = {}
+
+
+def _runner_failed(result):
+    # Runner returns (H, status) if the run stopped early. Only errors are tried again. A halt is a requested stop.
+    return isinstance(result, (tuple, list)) and result[1] == ERROR
 
 
 def sim_function_with_runner(H, persis_info, sim_specs, libE_info):
@@ -21,11 +37,10 @@ def sim_function_with_runner(H, persis_info, sim_specs, libE_info):
         persistant_worker_count = 1
         
     server_id = libE_info['workerID'] - persistant_worker_count
-    # Sleep time is used to make sure we do not start rsmpi jobs too closely together
-    # past experience has shown this leads to fatal errors. Possibly due to temporary files that are created in the same location?
-    st = server_id * 5.
-    sleep(st)
-    
+    # Launches from all workers are spaced through a shared ledger. See LaunchLimiter for keys.
+    launch_limits = {**_LAUNCH_LIMITS, **sim_specs['user'].get('launch_limits', {})}
+    limiter = LaunchLimiter(**launch_limits)
+
     x = H['x'][0]
     base_schema = sim_specs['user']['base_schema']
     objective_function = sim_specs['user']['objective_function']
@@ -35,8 +50,11 @@ def sim_function_with_runner(H, persis_info, sim_specs, libE_info):
         processing_funcs = None
 
     # Run Simulations
-    runner = Runner(base_schema.format(server_id), objective_function=objective_function, processing=processing_funcs)
-    result = runner.run(x)
+    schema = base_schema.format(server_id)
+    if schema not in _RUNNERS:
+        _RUNNERS[schema] = Runner(schema, objective_function=objective_function, processing=processing_funcs)
+    runner = _RUNNERS[schema]
+    result = limiter.launch(runner.run, x, failed=_runner_failed, release=False)
     print('result on {} is {}'.format(server_id, result))
     
     # Evaluate Result
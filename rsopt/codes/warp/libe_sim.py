@@ -1,10 +1,16 @@
 import os, time, uuid
 import numpy as np
-from rsopt.codes.warp.tec_utilities import get_efficiency, create_settings_file
+from rsopt.codes.warp.tec_utilities import read_diagnostics, create_settings_file, ResultNotWritten, ResultFailed, \
+    DEFAULT_PARAMETER_PATHS, DEFAULT_DIAGNOSTICS
 from libensemble.executors.executor import Executor
 from libensemble.message_numbers import WORKER_DONE, WORKER_KILL, TASK_FAILED, WORKER_KILL_ON_TIMEOUT
+from rsopt.libe_tools.monitor import Monitor
 import logging
 
+# The efficiency file may appear on a shared file system some time after the task finishes
+_READ_ATTEMPTS = 3
+_READ_DELAY = 2.  # seconds
+
 def simulate_tec_efficiency(H, persis_info, sim_specs, libE_info):
     logger = logging.getLogger('libensemble')
 
@@ -13,26 +19,30 @@ def simulate_tec_efficiency(H, persis_info, sim_specs, libE_info):
     base_path = sim_specs['user']['base_path']
     template_file = sim_specs['user']['template_file']
     sim_name, output_path = make_sim_name(base_path)
-    create_input_schema(H, base_path, sim_name, template_file)
+    create_input_schema(H, base_path, sim_name, template_file,
+                        sim_specs['user'].get('parameter_paths', DEFAULT_PARAMETER_PATHS))
     logger.info('base_path: ' + base_path)
     logger.info('output_path: ' + output_path)
     logger.info('sim_name: ' + sim_name)
 
-    calc_status = start_warp_task(H, sim_specs, sim_name+'.yaml',sim_name)
+    # Optional early termination from partial results. See rsopt.libe_tools.monitor
+    monitor = Monitor.from_setup(sim_specs['user']['monitor']) if sim_specs['user'].get('monitor') else None
+    calc_status = start_warp_task(H, sim_specs, sim_name+'.yaml',sim_name, monitor=monitor)
+    # Efficiency and any other diagnostics to record in sim_specs['out']. See tec_utilities.read_diagnostics.
+    diagnostics = {**DEFAULT_DIAGNOSTICS, **sim_specs['user'].get('diagnostics', {})}
+    values = {}
     if calc_status == WORKER_DONE:
         # There is an internal flag set in my Warp output if simulation hits a known failure mode
         # then failure_penalty is used. Otherwise read the calculated efficiency.
-        try:
-            efficiency = get_efficiency(output_path, sim_name, penalty=failure_penalty)
-        except:
-            print('Unknown error trying to read efficiency for Job {job} on Worker {worker}'.format(job=H['sim_id'],
-                                                                                                    worker=H['sim_worker']))
-            efficiency = failure_penalty
+        values, calc_status = read_task_diagnostics(output_path, sim_name, diagnostics, logger)
+        efficiency = values.pop('efficiency', failure_penalty)
+    elif calc_status == WORKER_KILL:
+        efficiency = monitor.get_result(failure_penalty)
     else:
         # Use same failure_penalty if libE says simulation did not complete
         efficiency = failure_penalty
 
-    output = create_output(sim_specs, efficiency)
+    output = create_output(sim_specs, efficiency, values)
 
     return output, persis_info, calc_status
 
@@ -74,7 +84,7 @@ def make_sim_name(base_path):
     return sim_name, output_path
 
 
-def start_warp_task(H, sim_specs, schema_file, sim_id):
+def start_warp_task(H, sim_specs, schema_file, sim_id, monitor=None):
 
     time_limit = sim_specs['user']['time_limit']
     cores = sim_specs['user']['cores']
@@ -94,10 +104,16 @@ def start_warp_task(H, sim_specs, schema_file, sim_id):
     while not job.finished:
         time.sleep(poll_interval)
         job.poll()
-        if job.runtime > time_limit:
+        if not job.finished and monitor and monitor.check(job):
+            job.kill()
+            print('Job #... terminated from partial result')
+            calc_status = WORKER_KILL
+            break
+        elif not job.finished and job.runtime > time_limit:
             job.kill()
             print('Job #... exceeded time limit')
             calc_status = WORKER_KILL_ON_TIMEOUT
+            break
 
         if job.finished:
             if job.state == 'FINISHED':
@@ -108,16 +124,41 @@ def start_warp_task(H, sim_specs, schema_file, sim_id):
     return calc_status
 
 
-def create_input_schema(H, path, sim_id, base_file):
+def create_input_schema(H, path, sim_id, base_file, parameter_paths=DEFAULT_PARAMETER_PATHS):
 
     x = H['x'][0]
-    create_settings_file(path, sim_id, base_file, x)
+    create_settings_file(path, sim_id, base_file, x, parameter_paths)
+
+
+def read_task_diagnostics(output_path, sim_name, diagnostics, logger):
+    """
+    Read the diagnostics of a finished task. A file that is not written yet is read again after a delay.
+    :return: (dict, int) Diagnostics, or an empty dict if they could not be read, and the calc status
+    :raises DiagnosticMissing: A location in `diagnostics` is not in the file. This is a configuration error.
+    """
+    for attempt in range(_READ_ATTEMPTS):
+        try:
+            return read_diagnostics(output_path, sim_name, diagnostics), WORKER_DONE
+        except ResultFailed as e:
+            # Known failure mode of the simulation. The failure penalty is recorded.
+            logger.warning(str(e))
+            return {}, WORKER_DONE
+        except ResultNotWritten as e:
+            logger.warning(f'Attempt {attempt + 1} to read diagnostics failed: {e}')
+            if attempt < _READ_ATTEMPTS - 1:
+                time.sleep(_READ_DELAY)
+
+    return {}, TASK_FAILED
 
 
-def create_output(sim_specs, efficiency):
+def create_output(sim_specs, efficiency, diagnostics=None):
     outspecs = sim_specs['out']
     output = np.zeros(1, dtype=outspecs)
     scaled_efficiency = sim_specs['user']['scaling'](efficiency)
     output['f'][0] = scaled_efficiency
+    # Other diagnostics are recorded if sim_specs['out'] has a field for them
+    for name, value in (diagnostics or {}).items():
+        if name in output.dtype.names:
+            output[name][0] = value
 
     return output
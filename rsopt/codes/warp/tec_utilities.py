@@ -3,27 +3,86 @@ import os, time, subprocess, uuid
 import numpy as np
 import h5py as h5
 
+# The C dumper is used if PyYAML was built with libyaml
+_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+# Settings set by the parameter vector if no paths are given: strut height and width
+DEFAULT_PARAMETER_PATHS = ('tec.strut_height', 'tec.strut_width')
+# TecSettings built by this worker process keyed by base file and parameter paths
+_TEC_SETTINGS = {}
+# Location of each diagnostic read from the efficiency file if no others are given. See read_diagnostics.
+DEFAULT_DIAGNOSTICS = {'efficiency': 'efficiency@eta'}
+# Values of the 'complete' flag in the efficiency file for simulations that gave a meaningful result
+_COMPLETE_FLAGS = (0, 3)
 
-def create_settings_file(path, sim_id, base_file, new_settings):
+
+class TecSettings:
     """
-    Make a new TEC description file based on new settings and the 'tec_start.yaml' base file.
-    Return the UUID generated, unique identifier for the file.
+    Generates TEC description files from a base file that is parsed once.
+    Each parameter is written to a setting given by a dotted path in the YAML, e.g. 'tec.strut_height'.
     """
-    print("I am in:", os.getcwd())
-    print('loading settings file', base_file)
-    base_file = yaml.safe_load(open(base_file, 'r'))
+    def __init__(self, base_file, parameter_paths=DEFAULT_PARAMETER_PATHS):
+        """
+        :param base_file: (str) Path to the base TEC YAML file
+        :param parameter_paths: (list) Dotted path of the setting for each parameter, in parameter order
+        """
+        with open(base_file, 'r') as ff:
+            self.template = yaml.safe_load(ff)
+        self.parameter_paths = tuple(tuple(path.split('.')) for path in parameter_paths)
+        for path in self.parameter_paths:
+            node = self.template
+            for key in path[:-1]:
+                assert isinstance(node.get(key), dict), f"{'.'.join(path)} is not a setting in {base_file}"
+                node = node[key]
+
+    def settings(self, x):
+        """
+        Settings for one point. Only the dicts on the parameter paths are copied, the template is not changed.
+        Values written to integer settings of the template are rounded to integers.
+        :param x: (array) Parameter values
+        :return: (dict)
+        """
+        assert len(x) == len(self.parameter_paths), \
+            f"Received {len(x)} parameters for {len(self.parameter_paths)} parameter paths"
+        settings = dict(self.template)
+        for path, value in zip(self.parameter_paths, x):
+            node = settings
+            for key in path[:-1]:
+                node[key] = dict(node[key])
+                node = node[key]
+            original = node.get(path[-1])
+            if isinstance(original, int) and not isinstance(original, bool):
+                node[path[-1]] = int(round(value))
+            else:
+                node[path[-1]] = float(value)
+
+        return settings
 
-    h, w = new_settings
+    def write(self, path, sim_id, x):
+        """
+        Write the TEC description file `sim_id`.yaml for one point.
+        :param path: (str) Directory to write in
+        :param sim_id: (str) Unique identifier of the point
+        :param x: (array) Parameter values
+        :return: None
+        """
+        with open(os.path.join(path, sim_id + '.yaml'), 'w') as ff:
+            yaml.dump(self.settings(x), ff, Dumper=_DUMPER)
 
-    base_file['tec']['strut_height'] = float(h)
-    base_file['tec']['strut_width'] = float(w)
 
-    new_file = sim_id + '.yaml'
-    yaml.dump(base_file, open(os.path.join(path, new_file), 'w'))
+def create_settings_file(path, sim_id, base_file, new_settings, parameter_paths=DEFAULT_PARAMETER_PATHS):
+    """
+    Make a new TEC description file based on new settings and the 'tec_start.yaml' base file.
+    The base file is only read the first time it is used by a worker.
+    """
+    key = (os.path.abspath(base_file), tuple(parameter_paths))
+    if key not in _TEC_SETTINGS:
+        _TEC_SETTINGS[key] = TecSettings(base_file, parameter_paths)
+    _TEC_SETTINGS[key].write(path, sim_id, new_settings)
 
 
 def get_optimization_parameters(path):
-    parameters = yaml.safe_load(open(path, 'r'))
+    with open(path, 'r') as ff:
+        parameters = yaml.safe_load(ff)
     # b = float(parameters['tec']['magnetic_field'])
     h = float(parameters['tec']['strut_height'])
     w = float(parameters['tec']['strut_width'])
@@ -31,6 +90,76 @@ def get_optimization_parameters(path):
     return h, w
 
 
+class ResultNotWritten(Exception):
+    """The efficiency file does not exist yet or is still open for writing"""
+
+
+class ResultFailed(Exception):
+    """The simulation wrote its efficiency file but did not run far enough to give a meaningful result"""
+
+
+class DiagnosticMissing(Exception):
+    """A diagnostic location given in the configuration is not in a completed efficiency file"""
+
+
+def _read_location(datafile, location):
+    # 'group/dataset' reads a dataset, 'group@name' reads an attribute
+    location, _, attribute = location.partition('@')
+    node = datafile[location] if location else datafile
+    if attribute:
+        return node.attrs[attribute]
+
+    return node[()]
+
+
+def read_diagnostics(path, sim_id, diagnostics=None):
+    """
+    Read diagnostics from the efficiency file of a simulation. The file is opened once for all of them.
+
+    Locations are HDF5 paths. A dataset is given by its path, e.g. 'efficiency/current', and an attribute by
+    'path@name', e.g. 'efficiency@eta'.
+
+    :param path: (str) Path to base output directory
+    :param sim_id: (str) Unique identifier of the simulation
+    :param diagnostics: (dict) Location of each diagnostic keyed by name. Defaults to `DEFAULT_DIAGNOSTICS`.
+    :return: (dict) Value of each diagnostic
+    :raises ResultNotWritten: The file does not exist or cannot be opened yet
+    :raises ResultFailed: The simulation flagged a failure
+    :raises DiagnosticMissing: A location in `diagnostics` is not in the file
+    """
+    diagnostics = diagnostics or DEFAULT_DIAGNOSTICS
+    file_path = os.path.join(path, 'efficiency_id_' + sim_id + '.h5')
+    try:
+        datafile = h5.File(file_path, 'r')
+    except OSError as e:
+        raise ResultNotWritten(f'{file_path} could not be opened: {e}')
+
+    with datafile:
+        if 'complete' not in datafile.attrs:
+            raise ResultNotWritten(f'{file_path} is still being written')
+        if datafile.attrs['complete'] not in _COMPLETE_FLAGS:
+            # Simulation did not go far enough to calculate a meaningful efficiency
+            raise ResultFailed(f'{file_path} was written with failure flag {datafile.attrs["complete"]}')
+        try:
+            return {name: _read_location(datafile, location) for name, location in diagnostics.items()}
+        except KeyError as e:
+            # The location is wrong rather than the simulation so this is not recorded as a failed point
+            raise DiagnosticMissing(f'{file_path} is missing a diagnostic: {e}')
+
+
+def read_partial_diagnostics(path, sim_id, diagnostics=None):
+    """
+    `read_diagnostics` for use by a monitor while the simulation runs.
+    :return: (dict or None) Value of each diagnostic or None if the file has not been written yet or the simulation
+        flagged a failure
+    """
+    try:
+        return read_diagnostics(path, sim_id, diagnostics)
+    except (ResultNotWritten, ResultFailed):
+        # A failed simulation has no partial result to check. The failure is handled when the task finishes.
+        return None
+
+
 def get_efficiency(path, sim_id, penalty=-10.):
     """
     Path to .h5 file with efficiency data. Will check for sufficiently completed simulation and
@@ -42,15 +171,8 @@ def get_efficiency(path, sim_id, penalty=-10.):
 
     Return (float) efficiency
     """
-    filename = 'efficiency_id_' + sim_id + '.h5'
-    file_path = os.path.join(path, filename)
-    datafile = h5.File(file_path, 'r')
-    if datafile.attrs['complete'] == 0 or datafile.attrs['complete'] == 3:
-        # Simulation returned a meaningful result
-        efficiency = datafile['efficiency'].attrs['eta']
-    else:
-        # Simulation did not go far enough to calculate a meaningful efficiency
+    try:
+        return read_diagnostics(path, sim_id)['efficiency']
+    except ResultFailed:
         # Supply large penalty
-        efficiency = penalty
-
-    return efficiency
\ No newline at end of file
+        return penalty
@@ -1,11 +1,18 @@
+import numpy as np
 from rsopt.configuration import Options
-from rsopt.configuration.setup import _EXECUTION_TYPES
+from rsopt.configuration.parameters import ParameterTable
+from rsopt.configuration.setup import get_executor
+from rsopt.constraints import Constraints, validate_constraints
 _EXECUTORS = {'parallel'}
 
 class Configuration:
     def __init__(self):
         self.jobs = []
         self._options = Options()
+        self._constraints = {}  # Nonlinear constraints on the parameters. See rsopt.constraints
+        # Parameters of all jobs and the job tables it was built from. See parameter_table.
+        self._parameter_table = None
+        self._job_tables = ()
 
     @property
     def options(self):
@@ -34,6 +41,29 @@ class Configuration:
             new_options.parse(name, value)
         self._options = new_options
 
+    @property
+    def constraints(self):
+        return self._constraints
+
+    @constraints.setter
+    def constraints(self, constraints):
+        assert validate_constraints(constraints), "constraints must give one of expression or function for each " \
+                                                  "history field and a valid type and action"
+        self._constraints = dict(constraints)
+
+    def get_constraints(self):
+        # Constraints are evaluated from points with the parameters and settings of all jobs
+        if not self._constraints:
+            return None
+        settings = {}
+        for job in self.jobs:
+            settings.update(job.settings)
+
+        table = self.parameter_table()
+
+        return Constraints(self._constraints, table.names, settings, start=table.start,
+                           parameters=self.get_parameters_list('get_parameters'))
+
     @property
     def method(self):
         return self._options.method
@@ -45,11 +75,32 @@ class Configuration:
             self.jobs.append(jobs)
 
     def get_dimension(self):
-        dim = 0
-        for job in self.jobs:
-            dim += len(job.parameters)
+        return len(self.parameter_table())
 
-        return dim
+    def get_fidelity_levels(self):
+        # Reduced fidelity levels declared by the jobs plus the full fidelity given by the job settings
+        levels = {len(job.fidelities) for job in self.jobs if job.fidelities}
+        assert len(levels) <= 1, "All jobs that declare fidelities must declare the same number of levels"
+
+        return levels.pop() + 1 if levels else 1
+
+    def get_parameter_types(self):
+        # None if every parameter is float so generators can skip the type transformations
+        types = self.parameter_table().types
+        return None if np.all(types == 'float') else types.tolist()
+
+    def parameter_table(self):
+        """
+        Parameters of all jobs in point order. Built again only if parameters of a job changed.
+        :return: (ParameterTable) Read-only arrays of the parameters
+        """
+        job_tables = tuple(job._parameters.table for job in self.jobs)
+        if len(job_tables) != len(self._job_tables) or \
+                any(new is not old for new, old in zip(job_tables, self._job_tables)):
+            self._parameter_table = ParameterTable.concatenate(job_tables)
+            self._job_tables = job_tables
+
+        return self._parameter_table
 
     def get_parameters_list(self, attribute, formatter=list):
         # get list attribute from all job parameters and return based on formatter
@@ -70,7 +121,7 @@ class Configuration:
             raise NotImplementedError("rsmpi is not supported in combination with other executors")
 
         # Right now we implicitly guarantee all executors will be same type
-        executor = _EXECUTION_TYPES[executors[0]]
+        executor = get_executor(executors[0])
 
         return executor(**executor_options)
 
@@ -92,3 +143,9 @@ class Configuration:
 
         return sym_link_files
 
+
+    def write_support_files(self):
+        # Files written to the run path by job setups. Used when the configuration is not parsed again.
+        for job in self.jobs:
+            if job._setup:
+                job._setup.write_support_files()
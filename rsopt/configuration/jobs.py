@@ -1,6 +1,8 @@
 from rsopt.configuration.parameters import _PARAMETER_READERS, Parameters
 from rsopt.configuration.settings import _SETTING_READERS, Settings
 from rsopt.configuration.setup import _SETUP_READERS, Setup, _PARALLEL_PYTHON_RUN_FILE
+from rsopt.libe_tools.monitor import Monitor, resolve_monitor_paths
+from rsopt.extraction import validate_results
 
 
 def get_reader(obj, category):
@@ -28,7 +30,7 @@ def create_executor_arguments(setup):
         # 'stderr': None, # Handled at optimizer setup
         # 'stage_inout': None,  # No used
         # 'dry_run': False, # Keep false for now
-        # 'extra_args': None  # Unused
+        'extra_args': None  # Arguments for the MPI runner
     }
 
     for key, value in args.items():
@@ -51,6 +53,8 @@ class Job:
 
         self._parameters = Parameters()
         self._settings = Settings()
+        self._fidelities = []  # Settings overrides for each reduced fidelity level, cheapest first
+        self._results = {}  # Values read from output files after the job runs. See rsopt.extraction
         self._setup = None
         self.full_path = None
         self.pre_process = None
@@ -66,6 +70,12 @@ class Job:
     def settings(self):
         return self._settings.settings
     @property
+    def fidelities(self):
+        return [fidelity.settings for fidelity in self._fidelities]
+    @property
+    def results(self):
+        return self._results
+    @property
     def setup(self):
         if self._setup:
             return self._setup.setup
@@ -75,6 +85,13 @@ class Job:
     def execute(self):
         return self._setup.function
 
+    @property
+    def monitor(self):
+        # A new Monitor is made for each task because it tracks the time of the last check
+        if self._setup and self._setup.setup.get('monitor'):
+            return Monitor.from_setup(self._setup.setup['monitor'])
+        return None
+
     @property
     def input_distribution(self):
         # Used by conversion: a Switchyard will write a file called 'input_distribution' for the job to use
@@ -97,6 +114,34 @@ class Job:
         for name, value in reader(settings):
             self._settings.parse(name, value)
 
+    @fidelities.setter
+    def fidelities(self, fidelities):
+        assert isinstance(fidelities, list), "fidelities must be a list of settings, one entry for each level"
+        self._fidelities = []
+        for overrides in fidelities:
+            reader = get_reader(overrides, 'settings')
+            self._fidelities.append(Settings())
+            for name, value in reader(overrides):
+                self._fidelities[-1].parse(name, value)
+
+    @results.setter
+    def results(self, results):
+        assert validate_results(results), "results must give a file and one of column, parameter, dataset or " \
+                                          "attribute for each history field"
+        self._results = dict(results)
+
+    def fidelity_settings(self, level=None):
+        """
+        Settings to run the job with at a fidelity level. Levels index `fidelities` and the level past the last entry
+        is the job settings without overrides.
+        :param level: (int) Fidelity level. If None the job settings are used.
+        :return: (dict) settings
+        """
+        if level is None or level >= len(self._fidelities):
+            return self.settings
+
+        return {**self.settings, **self._fidelities[level].settings}
+
     @setup.setter
     def setup(self, setup):
         # `code` must be set here if not set at Job instantiation,
@@ -111,9 +156,16 @@ class Job:
         self._setup = Setup.get_setup(setup, self.code)()
         for name, value in reader(setup):
             self._setup.parse(name, value)
+        if self._setup.setup.get('monitor'):
+            self._setup.setup['monitor'] = resolve_monitor_paths(self._setup.setup['monitor'])
 
         # Setup for Executor
         is_parallel = self.setup.get('cores', 1) > 1
+        # Serial jobs keep their serial run command, so borrowed cores would launch copies of the same job
+        assert is_parallel or not self.setup.get('max_cores'), \
+            "max_cores may only be set for parallel jobs (cores > 1)"
+        assert not self.setup.get('max_cores') or self.setup['max_cores'] >= self.setup.get('cores', 1), \
+            "max_cores must be at least cores"
         self.full_path = self._setup.get_run_command(is_parallel=is_parallel)
         self.executor_args = create_executor_arguments(self._setup.setup)
 
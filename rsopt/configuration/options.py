@@ -11,6 +11,21 @@ class Options:
         self.executor_options = {}
         self.method = ''
         self.sym_links = []
+        # Surrogate model prescreening of points before simulation. Disabled if empty.
+        #   See rsopt.libe_tools.surrogate.PRESCREEN_DEFAULTS for keys
+        self.prescreen = {}
+        # Default time limit in seconds for jobs run by an executor. Jobs may set their own `timeout` in setup.
+        #   No limit if 0.
+        self.timeout = 0.
+        # Allocation shared by executor tasks from all workers. Disabled if empty.
+        #   See rsopt.libe_tools.executors.read_allocation for keys
+        self.scheduler = {}
+        # Set nworkers from the scheduler allocation so every core can be used when the generator has enough work.
+        #   Cores of idle workers are free for jobs that set max_cores in setup.
+        self.elastic = False
+        # Throttling of executor task launches from all workers. Disabled if empty.
+        #   See rsopt.libe_tools.executors.LaunchLimiter for keys
+        self.launch_limits = {}
 
     @classmethod
     def get_option(cls, options):
@@ -43,6 +58,8 @@ class Options:
         # Check all other values defined in init
         else:
             expected_type = type(getattr(self, name))
+            # Integers are accepted where a float is expected
+            expected_type = (float, int) if expected_type is float else expected_type
             value_pass = isinstance(value, expected_type)
             if not value_pass:
                 received_type = type(value)
@@ -72,8 +89,9 @@ class Nlopt(Options):
     # Ordering of required keys matters to validate method assignment is correct
     REQUIRED_KEYS = ('method', 'exit_criteria')
     # Only can allow what aposmm_localopt_support handles right now
+    #   dfols and pounders are least-squares methods that need the objective as a vector of residuals
     ALLOWED_METHODS = ('LN_BOBYQA', 'LN_SBPLX', 'LN_COBYLA', 'LN_NEWUOA',
-                         'LN_NELDERMEAD', 'LD_MMA')
+                         'LN_NELDERMEAD', 'LD_MMA', 'dfols', 'pounders')
 
     @classmethod
     def _check_options(cls, options):
@@ -83,13 +101,24 @@ class Nlopt(Options):
         assert proposed_method in cls.ALLOWED_METHODS, \
             f"{proposed_method} not available for use in software {cls.NAME}"
 
+    def __init__(self):
+        super().__init__()
+        # Only one point is evaluated at a time unless the method needs gradients. The finite-difference points for
+        #   a gradient (n for forward and 2n for central differences) are evaluated in parallel.
+        self.nworkers = 2
+        # Number of independent local optimization runs sharing the workers. Start points past the parameter start
+        #   values are taken from software_options['starts'] or sampled uniformly.
+        self.nstarts = 1
+        # Length of the residual vector for least-squares methods. If 0 it is the number of results with a target.
+        self.components = 0
+
 
 class Aposmm(Options):
     NAME = 'aposmm'
     REQUIRED_KEYS = ('method', 'exit_criteria')
     # Only can allow what aposmm_localopt_support handles right now
     ALLOWED_METHODS = ('LN_BOBYQA', 'LN_SBPLX', 'LN_COBYLA', 'LN_NEWUOA',
-                         'LN_NELDERMEAD', 'LD_MMA')
+                         'LN_NELDERMEAD', 'LD_MMA', 'dfols', 'pounders')
     SOFTWARE_OPTIONS = {
         'high_priority_to_best_localopt_runs': True,
         'max_active_runs': 1,
@@ -100,6 +129,8 @@ class Aposmm(Options):
         super().__init__()
 
         self.nworkers = 2
+        # Length of the residual vector for least-squares methods. If 0 it is the number of results with a target.
+        self.components = 0
         for key, val in self.SOFTWARE_OPTIONS.items():
             self.__setattr__(key, val)
 
@@ -112,6 +143,64 @@ class Aposmm(Options):
 
 
 
+class Pso(Options):
+    NAME = 'pso'
+    REQUIRED_KEYS = ('exit_criteria',)
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = 2
+        # Swarm size. Each generation is sent out as one batch so nworkers - 1 should not exceed nparticles.
+        self.nparticles = 10
+
+
+class Cmaes(Options):
+    NAME = 'cmaes'
+    REQUIRED_KEYS = ('exit_criteria',)
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = 2
+        # Initial population size. If 0 the default CMA-ES population is rounded up to a multiple of nworkers - 1.
+        self.popsize = 0
+
+
+class Bayesian(Options):
+    NAME = 'bayesian'
+    REQUIRED_KEYS = ('exit_criteria',)
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = 2
+        # Number of uniformly sampled points evaluated before the model is used. If 0 uses max(2n + 1, nworkers - 1).
+        self.initial_design_size = 0
+
+
+class Multifidelity(Options):
+    NAME = 'multifidelity'
+    REQUIRED_KEYS = ('exit_criteria',)
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = 2
+        # About 1 / reduction_factor of the points evaluated at each fidelity level are promoted to the next level
+        self.reduction_factor = 3
+
+
+class Nsga2(Options):
+    NAME = 'nsga2'
+    REQUIRED_KEYS = ('exit_criteria', 'objectives')
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = 2
+        # Names of the objectives. The objective function, or a Python job, returns a dict with these keys or a
+        #   sequence in this order. Results with these names may be used instead.
+        self.objectives = []
+        # Population size. If 0 uses max(20, 4n) rounded up to a multiple of nworkers - 1.
+        self.popsize = 0
+
+
 class Mesh(Options):
     NAME = 'mesh_scan'
     REQUIRED_KEYS = ()
@@ -124,6 +213,11 @@ class Mesh(Options):
 option_classes = {
     'nlopt': Nlopt,
     'aposmm': Aposmm,
+    'pso': Pso,
+    'cmaes': Cmaes,
+    'bayesian': Bayesian,
+    'multifidelity': Multifidelity,
+    'nsga2': Nsga2,
     'mesh_scan': Mesh
 }
 
@@ -4,11 +4,91 @@ from pykern.pkcollections import PKDict
 
 _EXTERNAL_PARAMETER_CATEGORIES = ('min', 'max', 'start')
 _OPTIONAL_PARAMETER_CATEGORIES = ('samples', )
-
-
-def _validate_parameter(name, min, max, start):
+# Typed parameters also set `type` and, if categorical, the list of `values`. min and max are not used for categorical.
+#   float: continuous on [min, max]
+#   integer: integers on [min, max]. Every integer covers an equal part of the generator unit cube.
+#   log: continuous on [min, max] with 0 < min, uniform in log(value) on the generator unit cube
+#   categorical: one of `values`. Points hold the index of the value.
+PARAMETER_TYPES = ('float', 'integer', 'log', 'categorical')
+# Types that take a finite set of values. Points that round to the same values are only simulated once.
+DISCRETE_TYPES = ('integer', 'categorical')
+
+
+def _validate_parameter(name, min, max, start, type='float'):
+    assert type in PARAMETER_TYPES, f"Parameter {name} invalid: type must be one of {PARAMETER_TYPES}"
     assert min < max, f"Parameter {name} invalid: min > max"
     assert min <= start <= max, f"Parameter {name} invalid: start is not between [min,max]"
+    if type == 'log':
+        assert min > 0, f"Parameter {name} invalid: min must be > 0 for type log"
+    elif type == 'integer':
+        assert all(float(v).is_integer() for v in (min, max, start)), \
+            f"Parameter {name} invalid: min, max and start must be integers for type integer"
+
+
+def parameter_value(parameter, x):
+    """
+    Value passed to jobs for the entry `x` of a point.
+    :param parameter: (dict) Parsed parameter from `Parameters.parameters`
+    :param x: (float) Entry of the point for the parameter
+    :return: Parameter value. int for integer parameters and an entry of `values` for categorical parameters.
+    """
+    if parameter.get('type') == 'integer':
+        return int(np.round(x))
+    elif parameter.get('type') == 'categorical':
+        return parameter['values'][int(np.round(x))]
+
+    return x
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+class ParameterTable:
+    """
+    Parameters of one or more jobs in point order, stored as a structure of arrays.
+    Tables are built once and shared by every caller so the arrays are read-only. Copy an array before changing it.
+    """
+
+    def __init__(self, names, lb, ub, start, samples, types, offsets=None):
+        """
+        :param names: (list) Parameter names in point order
+        :param lb: (list) Lower bounds
+        :param ub: (list) Upper bounds
+        :param start: (list) Start values
+        :param samples: (list) Samples for each parameter or None if not set
+        :param types: (list) Parameter types. See PARAMETER_TYPES.
+        :param offsets: (list) First entry of each job in a point followed by the dimension. Defaults to one job.
+        """
+        self.names = tuple(names)
+        # Jobs may use the same parameter name. The first entry in a point is kept.
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+        self.lb = _read_only(np.array(lb, dtype=float))
+        self.ub = _read_only(np.array(ub, dtype=float))
+        self.start = _read_only(np.array(start, dtype=float))
+        self.samples = _read_only(np.array(samples, dtype=object))
+        self.types = _read_only(np.array(types, dtype=str))
+        # The entries of job i in a point are offsets[i]:offsets[i + 1]
+        self.offsets = _read_only(np.array([0, len(self.names)] if offsets is None else offsets, dtype=int))
+        self.job = _read_only(np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets)))
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        :param tables: (list) ParameterTable of each job in order
+        :return: (ParameterTable) Parameters of all jobs in point order
+        """
+        offsets = np.cumsum([0] + [len(table) for table in tables])
+        fields = [[value for table in tables for value in getattr(table, field)]
+                  for field in ('names', 'lb', 'ub', 'start', 'samples', 'types')]
+
+        return cls(*fields, offsets=offsets)
 
 
 def read_parameter_array(obj):
@@ -32,9 +112,12 @@ def read_parameter_dict(obj):
     for name, values in obj.items():
         output = []
         for key in _EXTERNAL_PARAMETER_CATEGORIES:
-            output.append(values[key])
+            # Bounds of categorical parameters are set from the number of values
+            output.append(values.get(key) if values.get('type') == 'categorical' else values[key])
         for key in _OPTIONAL_PARAMETER_CATEGORIES:
             output.append(values.get(key, None))
+        if 'type' in values:
+            output.extend([values['type'], values.get('values')])
         yield name, output
 
 
@@ -53,31 +136,59 @@ class Parameters:
         self._UPPER_BOUND = 'ub'
         self._START = 'start'
         self._SAMPLES = 'samples'
-        self.fields = (self._LOWER_BOUND, self._UPPER_BOUND, self._START, self._SAMPLES)
+        self._TYPE = 'type'
+        self._VALUES = 'values'
+        self.fields = (self._LOWER_BOUND, self._UPPER_BOUND, self._START, self._SAMPLES, self._TYPE, self._VALUES)
+        self._table = None
 
     def parse(self, name, values):
-        if name in self._NAMES:
+        if name in self.parameters:
             raise KeyError(f'Parameter {name} is defined multiple times')
-        _validate_parameter(name, *values[:3])
+        values = list(values) + [None] * (len(self.fields) - len(values))
+        values[4] = values[4] or 'float'
+        if values[4] == 'categorical':
+            assert values[5] and values[2] in values[5], \
+                f"Parameter {name} invalid: categorical parameters need a list of values that includes start"
+            # Categorical points hold the index of the value
+            values[:3] = [0, len(values[5]) - 1, list(values[5]).index(values[2])]
+            values[5] = list(values[5])
+        _validate_parameter(name, *values[:3], values[4])
         self._NAMES.append(name)
         self.parameters[name] = {}
         for field, value in zip(self.fields, values):
             self.parameters[name][field] = value
+        self._table = None
+
+    @property
+    def table(self):
+        # Built on first use after parameters change
+        if self._table is None:
+            self._table = ParameterTable(self._NAMES,
+                                         *[[self.parameters[name][field] for name in self._NAMES]
+                                           for field in (self._LOWER_BOUND, self._UPPER_BOUND, self._START,
+                                                         self._SAMPLES, self._TYPE)])
+        return self._table
 
     def get_parameter_names(self):
         return self._NAMES
 
     def get_lower_bound(self):
-        return np.array([self.parameters[name][self._LOWER_BOUND] for name in self._NAMES])
+        return self.table.lb
 
     def get_upper_bound(self):
-        return np.array([self.parameters[name][self._UPPER_BOUND] for name in self._NAMES])
+        return self.table.ub
 
     def get_start(self):
-        return np.array([self.parameters[name][self._START] for name in self._NAMES])
+        return self.table.start
+
+    def get_types(self):
+        return self.table.types.tolist()
+
+    def get_parameters(self):
+        return [self.parameters[name] for name in self._NAMES]
 
     def get_samples(self):
-        samples = [self.parameters[name][self._SAMPLES] for name in self._NAMES]
+        samples = self.table.samples.tolist()
 
         # Because samples is not required there are no prior validations
         vals = set(samples)
@@ -89,4 +200,4 @@ class Parameters:
             assert ValueError("Not all parameters had samples field set")
         else:
             # samples were properly set for all parameters
-            return samples
\ No newline at end of file
+            return samples
@@ -1,26 +1,44 @@
 import os
-import jinja2
 import pickle
 import subprocess
 from rsopt.codes import _TEMPLATED_CODES
 from copy import deepcopy
 from pykern import pkrunpy
 from pykern import pkio
-from pykern import pkresource
-from libensemble.executors.mpi_executor import MPIExecutor
-from rsopt.libe_tools.executors import register_rsmpi_executor
+from rsopt.libe_tools.monitor import validate_monitor
 
 
 _PARALLEL_PYTHON_TEMPLATE = 'run_parallel_python.py.jinja'
 _PARALLEL_PYTHON_RUN_FILE = 'run_parallel_python.py'
-_TEMPLATE_PATH = pkio.py_path(pkresource.filename(''))
-_SHIFTER_BASH_FILE = pkio.py_path(pkresource.filename('shifter_exec.sh'))
-_SHIFTER_SIREPO_SCRIPT = pkio.py_path(pkresource.filename('shifter_sirepo.py'))
 _SHIFTER_IMAGE = 'radiasoft/sirepo:prod'
-_EXECUTION_TYPES = {'serial': MPIExecutor,  # Serial jobs executed in the shell use the MPIExecutor for simplicity
-                    'parallel': MPIExecutor,
-                    'rsmpi': register_rsmpi_executor,
-                    'shifter': MPIExecutor}
+# Executor for each execution type. Values are resolved by get_executor so libEnsemble is only loaded when needed.
+_EXECUTION_TYPES = {'serial': 'MPIExecutor',  # Serial jobs executed in the shell use the MPIExecutor for simplicity
+                    'parallel': 'MPIExecutor',
+                    'rsmpi': 'register_rsmpi_executor',
+                    'shifter': 'MPIExecutor'}
+
+
+def get_executor(execution_type):
+    """
+    :param execution_type: (str) Key of _EXECUTION_TYPES
+    :return: (callable) Creates the libEnsemble executor for the execution type
+    """
+    if _EXECUTION_TYPES[execution_type] == 'register_rsmpi_executor':
+        from rsopt.libe_tools.executors import register_rsmpi_executor
+        return register_rsmpi_executor
+    from libensemble.executors.mpi_executor import MPIExecutor
+
+    return MPIExecutor
+
+
+def _package_data_path(filename):
+    # pkresource imports pkg_resources so package data paths are only found when needed
+    from pykern import pkresource
+    return pkio.py_path(pkresource.filename(filename))
+
+
+def _shifter_command():
+    return f'shifter --image={_SHIFTER_IMAGE} /bin/bash {_package_data_path("shifter_exec.sh")}'
 
 
 def read_setup_dict(input):
@@ -62,6 +80,21 @@ def _validate_execution_type(key):
     else:
         return False
 
+def _validate_placement(value):
+    # Node placement used by the resource scheduler
+    return value in ('pack', 'spread')
+
+
+def _validate_max_cores(value):
+    # Parallel jobs may use idle cores up to max_cores when run with the resource scheduler
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _validate_timeout(value):
+    # Time limit in seconds for the job. Only enforced for jobs run by an executor.
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
 _SETUP_READERS = {
     dict: read_setup_dict
 }
@@ -71,14 +104,17 @@ class Setup:
     __REQUIRED_KEYS = ('execution_type',)
     RUN_COMMAND = None
     NAME = None
-    SHIFTER_COMMAND = f'shifter --image={_SHIFTER_IMAGE} /bin/bash {_SHIFTER_BASH_FILE}'
 
     def __init__(self):
         self.setup = {
             'cores': 1
         }
         self.input_file_model = None
-        self.validators = {'execution_type': _validate_execution_type}
+        self.validators = {'execution_type': _validate_execution_type,
+                           'monitor': validate_monitor,
+                           'timeout': _validate_timeout,
+                           'placement': _validate_placement,
+                           'max_cores': _validate_max_cores}
 
     @classmethod
     def get_setup(cls, setup, code):
@@ -108,7 +144,8 @@ class Setup:
         if shifter:
             import shlex
             from subprocess import Popen, PIPE
-            run_string = f"shifter --image={_SHIFTER_IMAGE} /bin/bash {_SHIFTER_BASH_FILE} python {_SHIFTER_SIREPO_SCRIPT}"
+            run_string = f"shifter --image={_SHIFTER_IMAGE} /bin/bash {_package_data_path('shifter_exec.sh')} " \
+                         f"python {_package_data_path('shifter_sirepo.py')}"
             run_string = ' '.join([run_string, cls.NAME, input_file])
             cmd = Popen(shlex.split(run_string), stderr=PIPE, stdout=PIPE)
             out, err = cmd.communicate()
@@ -143,6 +180,11 @@ class Setup:
             else:
                 raise ValueError(f'{value} is not a recognized value for f{key}')
 
+    def write_support_files(self):
+        # Files the setup writes to the run path when it is configured. Written again when a compiled configuration
+        # is loaded.
+        pass
+
     def get_run_command(self, is_parallel):
         # There is an argument for making this a method of the Job class
         # if it continues to grow in complexity it is worth moving out to a higher level
@@ -153,7 +195,7 @@ class Setup:
             run_command = self.SERIAL_RUN_COMMAND
 
         if self.setup.get('execution_type') == 'shifter':
-            run_command = ' '.join([self.SHIFTER_COMMAND, run_command])
+            run_command = ' '.join([_shifter_command(), run_command])
 
         return run_command
 
@@ -184,7 +226,8 @@ class Python(Setup):
             return None
 
         assert self.setup.get('input_file'), "Input file must be provided to load Python function from"
-        template_loader = jinja2.FileSystemLoader(searchpath=_TEMPLATE_PATH)
+        import jinja2
+        template_loader = jinja2.FileSystemLoader(searchpath=_package_data_path(''))
         template_env = jinja2.Environment(loader=template_loader)
         template = template_env.get_template(_PARALLEL_PYTHON_TEMPLATE)
 
@@ -264,7 +307,7 @@ class User(Python):
             run_command = ' '.join([run_command, '<'])
 
         if self.setup.get('execution_type') == 'shifter':
-            run_command = ' '.join([self.SHIFTER_COMMAND, run_command])
+            run_command = ' '.join([_shifter_command(), run_command])
 
         return run_command
 
@@ -296,18 +339,21 @@ class Genesis(User):
         else:
             run_command = self.SERIAL_RUN_COMMAND
 
-        wrapper_file = "exec {cmd} < {input_file}".format(cmd=run_command, input_file=self.setup['input_file'])
-        pkio.write_text(self.WRAPPER_NAME, wrapper_file)
+        self._wrapper_file = "exec {cmd} < {input_file}".format(cmd=run_command, input_file=self.setup['input_file'])
+        self.write_support_files()
 
         # Overwrite input_file to wrapper name so it is copied into run directories
         self.setup['input_file'] = self.WRAPPER_NAME
         
         shell_command = "/bin/sh"
         if self.setup.get('execution_type') == 'shifter':
-            shell_command = ' '.join([self.SHIFTER_COMMAND, shell_command])
+            shell_command = ' '.join([_shifter_command(), shell_command])
 
         return shell_command
 
+    def write_support_files(self):
+        pkio.write_text(self.WRAPPER_NAME, self._wrapper_file)
+
 
 
 
@@ -0,0 +1,201 @@
+"""
+Nonlinear constraints on the parameters.
+
+Constraints are declared in the `constraints` section of the configuration. Each constraint is an expression or a
+Python function and a point is feasible when every constraint value is <= 0.
+
+    constraints:
+      pole_height:
+        expression: lpy - period / 2       # parameter and setting names of all jobs may be used
+      magnet_width:
+        function: [constraints.py, magnet_width]   # called with parameters and settings as keyword arguments
+        action: project                    # reject (default) or project
+      efficiency:
+        expression: 0.9 - eta              # results of the jobs may be used by expensive constraints
+        type: expensive
+
+Cheap constraints (the default type) only use parameters and settings. They are checked before a point is handed to
+a worker. Points that violate one are either rejected, and recorded with the failure penalty without being simulated,
+or, if every violated constraint has action `project`, moved along the line to the parameter start values until they
+are feasible. Projection is only used by methods whose generator takes the simulated point back from the history
+(pso, cmaes, bayesian, multifidelity, nsga2 and the samplers). Other methods, such as the local optimizers, keep the
+point they asked for, so for them projected points are rejected instead. Expensive constraints also use results and are evaluated after the simulation. Every constraint value is
+recorded in a history field of the same name.
+"""
+import numpy as np
+from pykern import pkrunpy
+
+CONSTRAINT_DEFAULTS = {'type': 'cheap',
+                       'action': 'reject',
+                       'tolerance': 0.}
+CONSTRAINT_TYPES = ('cheap', 'expensive')
+CONSTRAINT_ACTIONS = ('reject', 'project')
+_CONSTRAINT_KEYS = ('expression', 'function') + tuple(CONSTRAINT_DEFAULTS)
+# Names available to constraint expressions in addition to parameters, settings and results
+_EXPRESSION_NAMES = {name: getattr(np, name) for name in ('sqrt', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan',
+                                                          'arctan2', 'exp', 'log', 'log10', 'abs', 'hypot',
+                                                          'minimum', 'maximum', 'pi')}
+_EXPRESSION_NAMES.update({'min': min, 'max': max, '__builtins__': {}})
+# Bisection steps used to move a point back to the feasible region
+_PROJECTION_STEPS = 30
+
+
+def validate_constraints(constraints):
+    """
+    Check the `constraints` section of a configuration.
+    :param constraints: (dict) Constraint declarations keyed by history field name
+    :return: (bool) True if the declarations are valid
+    """
+    if not isinstance(constraints, dict):
+        return False
+    for constraint in constraints.values():
+        if not isinstance(constraint, dict) or set(constraint) - set(_CONSTRAINT_KEYS):
+            return False
+        if ('expression' in constraint) == ('function' in constraint):
+            return False
+        function = constraint.get('function')
+        if function is not None and not callable(function) and len(function) != 2:
+            return False
+        if constraint.get('type', CONSTRAINT_DEFAULTS['type']) not in CONSTRAINT_TYPES:
+            return False
+        if constraint.get('action', CONSTRAINT_DEFAULTS['action']) not in CONSTRAINT_ACTIONS:
+            return False
+
+    return True
+
+
+def _load_function(function):
+    # Functions may be given directly from the Python API or as [module_path, function_name] in a configuration file
+    if callable(function):
+        return function
+    module_path, name = function
+    module = pkrunpy.run_path_as_module(module_path)
+
+    return getattr(module, name)
+
+
+class Constraint:
+    def __init__(self, name, expression=None, function=None, type='cheap', action='reject', tolerance=0.):
+        """
+        :param name: (str) Name of the history field holding the constraint value
+        :param expression: (str) Python expression of parameters, settings and, if expensive, results
+        :param function: (callable or list) Called with parameters, settings and, if expensive, results as keyword
+                                            arguments
+        :param type: (str) 'cheap' to check before simulation or 'expensive' to evaluate after
+        :param action: (str) 'reject' or 'project' infeasible points. Only used by cheap constraints.
+        :param tolerance: (float) The constraint is violated if its value is above tolerance
+        """
+        self.name = name
+        self.expression = expression
+        self.function = _load_function(function) if function is not None else None
+        self.type = type
+        self.action = action
+        self.tolerance = tolerance
+        self._code = compile(expression, name, 'eval') if expression is not None else None
+
+    def __call__(self, values):
+        """
+        :param values: (dict) Parameter, setting and result values by name
+        :return: (float) Constraint value. The constraint is satisfied if it is <= 0.
+        """
+        if self._code is not None:
+            return float(eval(self._code, _EXPRESSION_NAMES, dict(values)))
+
+        return float(self.function(**values))
+
+    def __getstate__(self):
+        # Code objects cannot be pickled. The expression is compiled again when unpickled.
+        state = self.__dict__.copy()
+        state['_code'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.expression is not None:
+            self._code = compile(self.expression, self.name, 'eval')
+
+
+class Constraints:
+    """
+    All constraints of a configuration with the parameter names and settings needed to evaluate them from a point.
+    """
+
+    def __init__(self, constraints, parameter_names, settings, start=None, parameters=None):
+        """
+        :param constraints: (dict) Constraint declarations keyed by name
+        :param parameter_names: (list) Names of the entries of a point in order
+        :param settings: (dict) Settings of all jobs
+        :param start: (array) Feasible point used to project infeasible points. Required if any action is project.
+        :param parameters: (list) Parsed parameters in point order. Integer and categorical entries of a point are
+                                  passed to constraints as their values if set.
+        """
+        self.constraints = [Constraint(name, **{**CONSTRAINT_DEFAULTS, **constraint})
+                            for name, constraint in constraints.items()]
+        self.cheap = [c for c in self.constraints if c.type == 'cheap']
+        self.expensive = [c for c in self.constraints if c.type == 'expensive']
+        self.parameter_names = list(parameter_names)
+        self.settings = dict(settings)
+        self.start = None if start is None else np.array(start, dtype=float)
+        self.parameters = parameters
+        if any(c.action == 'project' for c in self.cheap):
+            assert self.start is not None and self.feasible(self.start), \
+                "Parameter start values must satisfy the cheap constraints to project infeasible points"
+
+    def __len__(self):
+        return len(self.constraints)
+
+    @property
+    def names(self):
+        return [c.name for c in self.constraints]
+
+    def _namespace(self, x):
+        if self.parameters is not None:
+            # rsopt.configuration imports this module
+            from rsopt.configuration.parameters import parameter_value
+            x = [parameter_value(parameter, value) for parameter, value in zip(self.parameters, x)]
+        return {**self.settings, **dict(zip(self.parameter_names, x))}
+
+    def values(self, x, results=None):
+        """
+        :param x: (array) Point in parameter space
+        :param results: (dict) Result values by name. Expensive constraints are NaN if not given.
+        :return: (dict) Value of each constraint by name
+        """
+        namespace = self._namespace(x)
+        values = {c.name: c(namespace) for c in self.cheap}
+        for c in self.expensive:
+            values[c.name] = c({**namespace, **results}) if results is not None else np.nan
+
+        return values
+
+    def cheap_values(self, x):
+        namespace = self._namespace(x)
+        return np.array([c(namespace) for c in self.cheap])
+
+    def violated(self, values, constraints=None):
+        """
+        :param values: (dict) Constraint values by name
+        :param constraints: (list) Constraints to check. Defaults to all.
+        :return: (list) Violated constraints
+        """
+        return [c for c in (constraints or self.constraints) if values.get(c.name, -np.inf) > c.tolerance]
+
+    def feasible(self, x):
+        return not self.violated(dict(zip([c.name for c in self.cheap], self.cheap_values(x))), self.cheap)
+
+    def project(self, x):
+        """
+        Move a point that violates cheap constraints toward the start point. The result is the point closest to `x`
+        on the line to the start point, up to the bisection tolerance, that satisfies the cheap constraints.
+        :param x: (array) Point in parameter space
+        :return: (array) Feasible point
+        """
+        feasible, infeasible = 0., 1.
+        for _ in range(_PROJECTION_STEPS):
+            step = (feasible + infeasible) / 2.
+            if self.feasible(self.start + step * (x - self.start)):
+                feasible = step
+            else:
+                infeasible = step
+
+        return self.start + feasible * (x - self.start)
@@ -0,0 +1,431 @@
+"""
+Extraction of results from simulation output files.
+
+A job may declare `results` in the configuration. Each result names a value in an SDDS or HDF5 file written by the
+job. Results are read after the job finishes. Only the requested SDDS columns and parameters, or HDF5 datasets, are
+read and every file is opened once for each evaluation.
+
+    results:
+      nux:
+        file: twiss_output.filename.sdds
+        parameter: nux              # SDDS parameter, or `column` for an SDDS column
+        page: -1                    # SDDS page. Default is the last page.
+        target: 0.25                # Adds weight * (value - target)**2 to f
+      betax_max:
+        file: twiss_output.filename.sdds
+        column: betax
+        reduction: max              # first, last, min, max, mean, sum, rms, std or an index
+      eta:
+        file: output.h5
+        attribute: efficiency@eta   # HDF5 attribute, or `dataset` for an HDF5 dataset path
+
+Every result is recorded in a history field of the same name. A result named `f` is used as the objective. Otherwise,
+if any results give a `target`, f is the weighted sum of squared differences from the targets. Results are also
+passed to the objective function in J['results']. Least-squares methods use the residuals from the targets.
+"""
+import os
+import re
+import mmap
+import shlex
+import numpy as np
+
+RESULT_DEFAULTS = {'page': -1,
+                   'reduction': 'last',
+                   'weight': 1.}
+REDUCTIONS = {'first': lambda value: value[0],
+              'last': lambda value: value[-1],
+              'min': np.min,
+              'max': np.max,
+              'mean': np.mean,
+              'sum': np.sum,
+              'rms': lambda value: np.sqrt(np.mean(np.square(value))),
+              'std': np.std}
+_SDDS_SOURCES = ('column', 'parameter')
+_HDF5_SOURCES = ('dataset', 'attribute')
+_RESULT_KEYS = ('file', 'page', 'reduction', 'target', 'weight') + _SDDS_SOURCES + _HDF5_SOURCES
+
+_SDDS_TYPES = {'double': 'f8',
+               'float': 'f4',
+               'long64': 'i8',
+               'ulong64': 'u8',
+               'long': 'i4',
+               'ulong': 'u4',
+               'short': 'i2',
+               'ushort': 'u2',
+               'character': 'S1',
+               'string': None}
+_INT32_MIN = -2**31
+
+
+def validate_results(results):
+    """
+    Check the `results` declared by a job.
+    :param results: (dict) Result declarations keyed by history field name
+    :return: (bool) True if the declarations are valid
+    """
+    if not isinstance(results, dict):
+        return False
+    for name, result in results.items():
+        if not isinstance(result, dict) or not result.get('file') or set(result) - set(_RESULT_KEYS):
+            return False
+        if len([key for key in _SDDS_SOURCES + _HDF5_SOURCES if key in result]) != 1:
+            return False
+        reduction = result.get('reduction', RESULT_DEFAULTS['reduction'])
+        if reduction not in REDUCTIONS and not isinstance(reduction, int):
+            return False
+
+    return True
+
+
+def results_objective(results, values):
+    """
+    Objective value from extracted results.
+    :param results: (dict) Result declarations
+    :param values: (dict) Extracted values
+    :return: (float or None) The result named f, the weighted sum of squared differences from the targets, or None if
+                             neither is declared
+    """
+    if 'f' in values:
+        return values['f']
+    targets = [name for name, result in results.items() if 'target' in result]
+    if not targets:
+        return None
+
+    return sum(results[name].get('weight', RESULT_DEFAULTS['weight']) * (values[name] - results[name]['target'])**2
+               for name in targets)
+
+
+def results_residuals(results, values):
+    """
+    Residual vector for least-squares methods from results with a target. The sum of squares equals
+    `results_objective`.
+    :param results: (dict) Result declarations
+    :param values: (dict) Extracted values
+    :return: (array) sqrt(weight) * (value - target) for each result with a target in declaration order
+    """
+    targets = [name for name, result in results.items() if 'target' in result]
+
+    return np.array([np.sqrt(results[name].get('weight', RESULT_DEFAULTS['weight'])) *
+                     (values[name] - results[name]['target']) for name in targets])
+
+
+def reduce(value, reduction):
+    """
+    :param value: (float or array) Value read from a file
+    :param reduction: (str or int) Name in REDUCTIONS or an index
+    :return: (float) Scalar value
+    """
+    value = np.asarray(value)
+    if value.ndim == 0:
+        return value[()]
+    if isinstance(reduction, int):
+        return value.flat[reduction]
+
+    return REDUCTIONS[reduction](value.ravel())
+
+
+class SDDSFile:
+    """
+    Reads parameters and columns from an SDDS file without loading the whole file.
+    The file is memory mapped. Pages are located from their row counts and only the requested values are copied.
+    Binary files may have string parameters and columns. ASCII files are supported without arrays.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: (str) Path to the SDDS file
+        """
+        self.path = path
+        self.parameters = []
+        self.columns = []
+        self.arrays = []
+        self.data = {}
+        self.byteorder = '<'
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pages = []
+        self._end = None
+        self._read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _read_header(self):
+        assert self._map[:5] == b'SDDS1' or self._map[:4] == b'SDDS', f'{self.path} is not an SDDS file'
+        position = self._map.find(b'\n') + 1
+        text = ''
+        while True:
+            end = self._map.find(b'\n', position)
+            assert end >= 0, f'{self.path} has no &data command'
+            line = self._map[position:end].decode(errors='replace')
+            position = end + 1
+            if line.startswith('!#'):
+                self.byteorder = '>' if 'big-endian' in line else '<'
+                continue
+            text += ' ' + line
+            if re.search(r'&data\b.*&end', text, re.S):
+                break
+
+        for command, body in re.findall(r'&(\w+)(.*?)&end', text, re.S):
+            fields = dict((key.lower(), value.strip('"'))
+                          for key, value in re.findall(r'(\w+)\s*=\s*("[^"]*"|[^,\s]+)', body))
+            if command == 'parameter':
+                self.parameters.append(fields)
+            elif command == 'column':
+                self.columns.append(fields)
+            elif command == 'array':
+                self.arrays.append(fields)
+            elif command == 'data':
+                self.data = fields
+
+        self.mode = self.data.get('mode', 'binary')
+        self.column_major = self.data.get('column_major_order', '0') == '1'
+        self._start = position
+        if self.mode == 'ascii':
+            assert not self.arrays, 'SDDS arrays are not supported in ascii files'
+            assert self.data.get('no_row_counts', '0') == '0', 'ascii files must have row counts'
+            self._ascii_lines = self._map[position:].decode(errors='replace').splitlines()
+
+    def _dtype(self, fields):
+        code = _SDDS_TYPES[fields.get('type', 'double')]
+        return None if code is None else np.dtype(code).newbyteorder(self.byteorder)
+
+    def _read_int(self, position, dtype='i4'):
+        return int(np.frombuffer(self._map, np.dtype(dtype).newbyteorder(self.byteorder), 1, position)[0])
+
+    def _read_values(self, position, fields, count):
+        # Returns (values, position after the values). Values are copied out of the memory map.
+        dtype = self._dtype(fields)
+        if dtype is not None:
+            values = np.frombuffer(self._map, dtype, count, position).copy()
+            return values, position + dtype.itemsize * count
+        values = []
+        for _ in range(count):
+            length = self._read_int(position)
+            values.append(self._map[position + 4:position + 4 + length].decode(errors='replace'))
+            position += 4 + length
+        return np.array(values), position
+
+    def _skip_values(self, position, fields, count):
+        dtype = self._dtype(fields)
+        if dtype is not None:
+            return position + dtype.itemsize * count
+        for _ in range(count):
+            position += 4 + self._read_int(position)
+        return position
+
+    def _page(self, page):
+        # Locate pages up to `page`. Each page is described by its position, row count and the offsets of its data.
+        while (page < 0 or len(self._pages) <= page) and self._end is None:
+            self._index_next_page()
+        if page < 0:
+            assert len(self._pages) >= -page, f'{self.path} has {len(self._pages)} pages'
+        else:
+            assert len(self._pages) > page, f'{self.path} has {len(self._pages)} pages'
+
+        return self._pages[page]
+
+    def _index_next_page(self):
+        if self.mode == 'ascii':
+            return self._index_next_ascii_page()
+        position = self._pages[-1]['next'] if self._pages else self._start
+        if position + 4 > len(self._map):
+            self._end = position
+            return
+        rows = self._read_int(position)
+        position += 4
+        if rows == _INT32_MIN:
+            rows = self._read_int(position, 'i8')
+            position += 8
+        page = {'rows': rows, 'parameters': {}, 'columns': {}}
+        for fields in self.parameters:
+            if 'fixed_value' in fields:
+                continue
+            page['parameters'][fields['name']] = position
+            position = self._skip_values(position, fields, 1)
+        for fields in self.arrays:
+            dimensions = int(fields.get('dimensions', 1))
+            shape = np.frombuffer(self._map, np.dtype('i4').newbyteorder(self.byteorder), dimensions, position)
+            position = self._skip_values(position + 4 * dimensions, fields, int(np.prod(shape)))
+        if self.column_major:
+            for fields in self.columns:
+                page['columns'][fields['name']] = position
+                position = self._skip_values(position, fields, rows)
+        else:
+            page['row_start'] = position
+            dtypes = [self._dtype(fields) for fields in self.columns]
+            if all(dtype is not None for dtype in dtypes):
+                position += rows * sum(dtype.itemsize for dtype in dtypes)
+            else:
+                for _ in range(rows):
+                    for fields in self.columns:
+                        position = self._skip_values(position, fields, 1)
+        page['next'] = position
+        self._pages.append(page)
+
+    def _index_next_ascii_page(self):
+        line = self._pages[-1]['next'] if self._pages else 0
+        lines = self._ascii_lines
+
+        def next_line(line):
+            while line < len(lines) and (not lines[line].strip() or lines[line].lstrip().startswith('!')):
+                line += 1
+            return line
+
+        line = next_line(line)
+        if line >= len(lines):
+            self._end = line
+            return
+        page = {'parameters': {}, 'columns': {}}
+        for fields in self.parameters:
+            if 'fixed_value' in fields:
+                continue
+            page['parameters'][fields['name']] = lines[line].strip()
+            line = next_line(line + 1)
+        if self.columns:
+            page['rows'] = int(lines[line].split()[0])
+            line = next_line(line + 1)
+            page['row_start'] = line
+            for _ in range(page['rows']):
+                line = next_line(line + 1)
+        page['next'] = line
+        self._pages.append(page)
+
+    def _fields(self, items, name):
+        for fields in items:
+            if fields['name'] == name:
+                return fields
+        raise KeyError(f'{name} is not in {self.path}')
+
+    def parameter(self, name, page=-1):
+        """
+        :param name: (str) Parameter name
+        :param page: (int) Page index. Negative values count from the last page.
+        :return: Parameter value
+        """
+        fields = self._fields(self.parameters, name)
+        dtype = self._dtype(fields)
+        if 'fixed_value' in fields:
+            value = fields['fixed_value']
+            return value if dtype is None else np.array(value).astype(dtype)[()]
+        location = self._page(page)['parameters'][name]
+        if self.mode == 'ascii':
+            return location.strip('"') if dtype is None else np.array(location).astype(dtype)[()]
+
+        return self._read_values(location, fields, 1)[0][0]
+
+    def column(self, name, page=-1):
+        """
+        :param name: (str) Column name
+        :param page: (int) Page index. Negative values count from the last page.
+        :return: (array) Column values
+        """
+        fields = self._fields(self.columns, name)
+        page = self._page(page)
+        if self.mode == 'ascii':
+            index = self.columns.index(fields)
+            rows = [shlex.split(self._ascii_lines[page['row_start'] + i]) for i in range(page['rows'])]
+            values = [row[index] for row in rows]
+            dtype = self._dtype(fields)
+            return np.array(values) if dtype is None else np.array(values).astype(dtype)
+        if self.column_major:
+            return self._read_values(page['columns'][name], fields, page['rows'])[0]
+
+        dtypes = [self._dtype(column) for column in self.columns]
+        if all(dtype is not None for dtype in dtypes):
+            row_dtype = np.dtype([(column['name'], dtype) for column, dtype in zip(self.columns, dtypes)])
+            rows = np.frombuffer(self._map, row_dtype, page['rows'], page['row_start'])
+            return rows[name].copy()
+        values = []
+        position = page['row_start']
+        for _ in range(page['rows']):
+            for column in self.columns:
+                if column is fields:
+                    value, position = self._read_values(position, column, 1)
+                    values.append(value[0])
+                else:
+                    position = self._skip_values(position, column, 1)
+
+        return np.array(values)
+
+    @property
+    def pages(self):
+        while self._end is None:
+            self._index_next_page()
+
+        return len(self._pages)
+
+
+class ResultReader:
+    """
+    Reads the results of one evaluation. Each file is opened once and all files are closed by `close`.
+    """
+
+    def __init__(self, directory='.'):
+        """
+        :param directory: (str) Directory that result file paths are relative to
+        """
+        self.directory = directory
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+    def _open(self, path, hdf5):
+        path = os.path.join(self.directory, path)
+        if path not in self._files:
+            if hdf5:
+                import h5py
+                self._files[path] = h5py.File(path, 'r')
+            else:
+                self._files[path] = SDDSFile(path)
+
+        return self._files[path]
+
+    def read(self, result):
+        """
+        :param result: (dict) Result declaration
+        :return: (float) Value after reduction
+        """
+        result = {**RESULT_DEFAULTS, **result}
+        if 'parameter' in result or 'column' in result:
+            sdds = self._open(result['file'], hdf5=False)
+            if 'parameter' in result:
+                value = sdds.parameter(result['parameter'], result['page'])
+            else:
+                value = sdds.column(result['column'], result['page'])
+        else:
+            datafile = self._open(result['file'], hdf5=True)
+            if 'attribute' in result:
+                location, _, attribute = result['attribute'].partition('@')
+                value = (datafile[location] if location else datafile).attrs[attribute]
+            else:
+                value = datafile[result['dataset']][()]
+
+        return reduce(value, result['reduction'])
+
+
+def extract_results(results, directory='.'):
+    """
+    Read every declared result.
+    :param results: (dict) Result declarations keyed by history field name
+    :param directory: (str) Directory that result file paths are relative to
+    :return: (dict) Values keyed by history field name
+    """
+    with ResultReader(directory) as reader:
+        return {name: reader.read(result) for name, result in results.items()}
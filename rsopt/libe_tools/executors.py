@@ -1,5 +1,12 @@
 import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import socket
 import logging
+import contextlib
 
 from libensemble.executors.mpi_executor import MPIExecutor
 from libensemble.executors.executor import Executor, Task, ExecutorException
@@ -10,6 +17,9 @@ logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
 
 _CONFIG_PATH = '/home/vagrant/jupyter/.rsmpi/ssh_config'
+_SCHEDULER_POLL_TIME = 0.5  # seconds
+_PLACEMENTS = ('pack', 'spread')
+_RSMPI_NODE_FILE = 'libe_nodes'
 
 
 def register_rsmpi_executor(hosts='auto', cores_on_node=None, **kwargs):
@@ -37,7 +47,7 @@ def register_rsmpi_executor(hosts='auto', cores_on_node=None, **kwargs):
     customizer = {'mpi_runner': 'mpich',
                   'runner_name': 'libensemble-rsmpi',
                   'cores_on_node': cores_on_node,
-                  'node_file': 'libe_nodes'}
+                  'node_file': _RSMPI_NODE_FILE}
 
     jobctrl = MPIExecutor(**kwargs, custom_info=customizer)
 
@@ -58,9 +68,134 @@ def _detect_rsmpi_resources():
 
 
 def _generate_rsmpi_node_file(nodes):
-    with open('libe_nodes', 'w') as ff:
-        for node in range(1, nodes+1):
-            ff.write(str(node)+'\n')
+    # libEnsemble reads the node file from the run directory. It is only written if the hosts changed.
+    content = ''.join(f'{node}\n' for node in range(1, nodes + 1))
+    if os.path.isfile(_RSMPI_NODE_FILE):
+        with open(_RSMPI_NODE_FILE, 'r') as ff:
+            if ff.read() == content:
+                return
+    with open(_RSMPI_NODE_FILE, 'w') as ff:
+        ff.write(content)
+
+
+class LaunchLimiter:
+    """
+    Throttles process launches from all workers. Launches wait until fewer than `max_concurrent` launches are in
+    progress and at least `min_interval` seconds have passed since the last launch started.
+    State is kept in a JSON ledger file guarded by a file lock. The ledger is started by the first launch if it does
+    not exist, so workers only need to agree on its path.
+    A launch is in progress until it is released or `hold` seconds have passed, whichever is first. Blocking launches,
+    like the Runner, are never released and hold their slot for `hold` seconds.
+    """
+    def __init__(self, ledger, max_concurrent=None, min_interval=0., hold=10., max_attempts=1, retry_delay=5.):
+        """
+        :param ledger: (str) Path to the ledger file. Must be reachable from every worker.
+        :param max_concurrent: (int) Most launches in progress at once. No limit if None.
+        :param min_interval: (float) Seconds between the start of consecutive launches
+        :param hold: (float) Seconds a launch is in progress if it is not released
+        :param max_attempts: (int) Number of times a failed launch is tried
+        :param retry_delay: (float) Seconds to wait after the first failed attempt. Increases with each attempt.
+        """
+        self.ledger = os.path.abspath(ledger)
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.hold = hold
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    @classmethod
+    def create(cls, ledger, **limits):
+        """
+        Start a new ledger. Launches recorded by an earlier run are forgotten.
+        :param ledger: (str) Path to the ledger file
+        :param limits: Any arguments of LaunchLimiter
+        :return: (LaunchLimiter)
+        """
+        with open(ledger, 'w') as ff:
+            json.dump({'last': 0., 'active': {}}, ff)
+
+        return cls(ledger, **limits)
+
+    @contextlib.contextmanager
+    def _state(self):
+        with open(self.ledger, 'a+') as ff:
+            fcntl.flock(ff, fcntl.LOCK_EX)
+            try:
+                ff.seek(0)
+                content = ff.read()
+                state = json.loads(content) if content else {'last': 0., 'active': {}}
+                yield state
+                ff.seek(0)
+                ff.truncate()
+                json.dump(state, ff)
+                ff.flush()
+            finally:
+                fcntl.flock(ff, fcntl.LOCK_UN)
+
+    def try_acquire(self):
+        """
+        Start a launch if the limits allow it.
+        :return: (str or None) Identifier of the launch
+        """
+        with self._state() as state:
+            now = time.time()
+            state['active'] = {i: start for i, start in state['active'].items() if now - start < self.hold}
+            if self.max_concurrent and len(state['active']) >= self.max_concurrent:
+                return None
+            if now - state['last'] < self.min_interval:
+                return None
+            launch_id = uuid.uuid4().hex[:12]
+            state['active'][launch_id] = now
+            state['last'] = now
+
+        return launch_id
+
+    def acquire(self):
+        """
+        Wait until a launch may start.
+        :return: (str) Identifier of the launch
+        """
+        while True:
+            launch_id = self.try_acquire()
+            if launch_id:
+                return launch_id
+            time.sleep(_SCHEDULER_POLL_TIME)
+
+    def release(self, launch_id):
+        """
+        End a launch so another may start.
+        :param launch_id: (str)
+        :return: None
+        """
+        with self._state() as state:
+            state['active'].pop(launch_id, None)
+
+    def launch(self, function, *args, failed=None, release=True, **kwargs):
+        """
+        Call `function` when the limits allow it. Attempts that raise an exception or give a result for which
+        `failed` returns True are tried again up to max_attempts times.
+        :param function: (callable) Starts the process
+        :param failed: (callable) Called with the result. Returns True if the launch failed.
+        :param release: (bool) Release the launch when `function` returns. Otherwise the launch is held for `hold`
+                               seconds.
+        :return: Result of the last attempt
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            launch_id = self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                logger.warning(f'Launch attempt {attempt} failed: {e}')
+            else:
+                if not (failed and failed(result)) or attempt == self.max_attempts:
+                    return result
+                logger.warning(f'Launch attempt {attempt} failed')
+            finally:
+                if release:
+                    self.release(launch_id)
+            time.sleep(self.retry_delay * attempt)
 
 
 # Not strictly needed (MPIExecutor with n=1 is currently used by rsopt to simplify setup)
@@ -115,3 +250,287 @@ class SerialExecutor(Executor):
                 task.submit_time = task.timer.tstart  # Time not date - may not need if using timer.
         self.list_of_tasks.append(task)
         return task
+
+
+def expand_slurm_nodelist(nodelist):
+    """
+    Expand a SLURM node list in compressed form, e.g. 'nid[001-003,007],login1'.
+    :param nodelist: (str) Compressed node list
+    :return: (list) Node names
+    """
+    nodes = []
+    for prefix, ranges, suffix in re.findall(r'([^,\[]+)(?:\[([^\]]+)\])?([^,\[]*)', nodelist):
+        if not ranges:
+            nodes.append(prefix + suffix)
+            continue
+        for r in ranges.split(','):
+            first, _, last = r.partition('-')
+            for i in range(int(first), int(last or first) + 1):
+                nodes.append(f'{prefix}{i:0{len(first)}d}{suffix}')
+
+    return nodes
+
+
+def expand_slurm_cpus(cpus_per_node):
+    """
+    Expand SLURM_JOB_CPUS_PER_NODE, e.g. '32(x2),16' -> [32, 32, 16].
+    :param cpus_per_node: (str)
+    :return: (list) Cores on each node
+    """
+    cores = []
+    for count, repeat in re.findall(r'(\d+)(?:\(x(\d+)\))?', cpus_per_node):
+        cores.extend([int(count)] * int(repeat or 1))
+
+    return cores
+
+
+def read_allocation(nodes='local', cores_per_node=None, node_file=None, nnodes=1, env=None):
+    """
+    Find the nodes and cores available to the run.
+    :param nodes: (str or list) 'slurm' to read the SLURM environment, 'local' for this host, or a list of node names
+    :param cores_per_node: (int) Cores on each node. Overrides the detected value.
+    :param node_file: (str) File with one node name per line. Used in place of `nodes` if given.
+    :param nnodes: (int) Number of nodes for a local allocation. More than one splits this host into fake nodes
+                         for testing.
+    :param env: (dict) Environment to read SLURM variables from. Defaults to os.environ.
+    :return: (dict) Cores on each node keyed by node name
+    """
+    env = os.environ if env is None else env
+    if node_file:
+        with open(node_file) as ff:
+            names = [line.strip() for line in ff if line.strip()]
+        return {name: cores_per_node or os.cpu_count() for name in names}
+    if nodes == 'slurm':
+        names = expand_slurm_nodelist(env['SLURM_JOB_NODELIST'])
+        if cores_per_node:
+            return {name: cores_per_node for name in names}
+        cores = expand_slurm_cpus(env.get('SLURM_JOB_CPUS_PER_NODE', env.get('SLURM_CPUS_ON_NODE', '')))
+        assert len(cores) == len(names), "Could not read cores on each node from the SLURM environment"
+        return dict(zip(names, cores))
+    if nodes == 'local':
+        # Fake nodes share this host and are all launched on localhost
+        cores = cores_per_node or os.cpu_count() // nnodes
+        if nnodes == 1:
+            return {socket.gethostname(): cores}
+        return {f'localhost:{i}': cores for i in range(nnodes)}
+
+    return {name: cores_per_node or os.cpu_count() for name in nodes}
+
+
+class Placement:
+    """
+    Cores given to one task. Converts to arguments for MPIExecutor.submit.
+    """
+    def __init__(self, task_id, nodes):
+        """
+        :param task_id: (str) Identifier in the scheduler ledger
+        :param nodes: (dict) Ranks on each node keyed by node name
+        """
+        self.task_id = task_id
+        self.nodes = nodes
+        self.machinefile = None
+
+    @property
+    def num_procs(self):
+        return sum(self.nodes.values())
+
+    def executor_args(self, directory='.', extra_args=None):
+        """
+        Write a machinefile for the task and return the arguments that place it.
+        libEnsemble drops num_procs, num_nodes and ranks_per_node when a machinefile is given so the rank count is
+        passed to the MPI runner directly.
+        :param directory: (str) Directory to write the machinefile in
+        :param extra_args: (str) Arguments for the MPI runner set by the job. Kept after the rank count.
+        :return: (dict) Arguments for MPIExecutor.submit
+        """
+        self.machinefile = os.path.join(directory, f'machinefile_{self.task_id}')
+        with open(self.machinefile, 'w') as ff:
+            for node, ranks in self.nodes.items():
+                # Fake local nodes are named localhost:<index>
+                ff.write((node.split(':')[0] + '\n') * ranks)
+
+        return {'num_procs': None,
+                'num_nodes': None,
+                'ranks_per_node': None,
+                'machinefile': self.machinefile,
+                'extra_args': ' '.join(filter(None, [f'-np {self.num_procs}', extra_args]))}
+
+    def remove_machinefile(self):
+        if self.machinefile and os.path.exists(self.machinefile):
+            os.remove(self.machinefile)
+        self.machinefile = None
+
+
+class ResourceScheduler:
+    """
+    Shares the cores of an allocation between tasks launched by all workers.
+    State is kept in a JSON ledger file guarded by a file lock so every worker process sees the same free cores.
+    Idle workers hold no cores. A task may borrow idle cores up to its `max_cores`.
+    Tasks with `placement: pack` (default) go to the fullest node they fit on to keep whole nodes free for large tasks.
+    Tasks with `placement: spread` go to the emptiest nodes. A task larger than `ranks_per_node`, or larger than a
+    node, is split over the fewest nodes that can hold it.
+    """
+    def __init__(self, ledger):
+        """
+        :param ledger: (str) Path to the ledger file. Must be reachable from every worker.
+        """
+        self.ledger = os.path.abspath(ledger)
+
+    @classmethod
+    def create(cls, ledger, allocation):
+        """
+        Start a new ledger.
+        :param ledger: (str) Path to the ledger file
+        :param allocation: (dict) Cores on each node. See `read_allocation`.
+        :return: (ResourceScheduler)
+        """
+        state = {'start': time.time(), 'nodes': allocation, 'busy': {node: 0. for node in allocation}, 'tasks': {},
+                 'waiting': {}}
+        with open(ledger, 'w') as ff:
+            json.dump(state, ff)
+
+        return cls(ledger)
+
+    @contextlib.contextmanager
+    def _state(self):
+        with open(self.ledger, 'r+') as ff:
+            fcntl.flock(ff, fcntl.LOCK_EX)
+            try:
+                state = json.load(ff)
+                yield state
+                ff.seek(0)
+                ff.truncate()
+                json.dump(state, ff)
+                # Write before the lock is released
+                ff.flush()
+            finally:
+                fcntl.flock(ff, fcntl.LOCK_UN)
+
+    def check(self, cores, ranks_per_node=None):
+        """
+        Check that a task could be placed if the allocation were empty.
+        :param cores: (int) Number of cores
+        :param ranks_per_node: (int) Most ranks on one node
+        :return: None
+        """
+        with self._state() as state:
+            if place(state['nodes'], state['nodes'], cores, ranks_per_node) is None:
+                raise ValueError(f'A task with {cores} cores cannot be placed on allocation {state["nodes"]}')
+
+    def try_acquire(self, cores, ranks_per_node=None, placement='pack', max_cores=None, request_id=None):
+        """
+        Reserve cores for a task if they are free.
+        :param cores: (int) Number of cores
+        :param ranks_per_node: (int) Most ranks on one node. Defaults to filling nodes.
+        :param placement: (str) 'pack' or 'spread'
+        :param max_cores: (int) The task may borrow idle cores up to this many. Cores needed by waiting tasks are
+                                never borrowed.
+        :param request_id: (str) Waiting request made by `acquire`. Removed if cores are reserved.
+        :return: (Placement or None)
+        """
+        with self._state() as state:
+            free = dict(state['nodes'])
+            for task in state['tasks'].values():
+                for node, ranks in task['nodes'].items():
+                    free[node] -= ranks
+            waiting = sum(c for i, c in state['waiting'].items() if i != request_id)
+            # A max_cores below cores only means nothing is borrowed
+            target = min(max(max_cores or cores, cores), max(sum(free.values()) - waiting, cores))
+            nodes = None
+            for request in range(target, cores - 1, -1):
+                nodes = place(state['nodes'], free, request, ranks_per_node, placement)
+                if nodes is not None:
+                    break
+            if nodes is None:
+                return None
+            task_id = uuid.uuid4().hex[:12]
+            state['tasks'][task_id] = {'nodes': nodes, 'start': time.time()}
+            state['waiting'].pop(request_id, None)
+
+        return Placement(task_id, nodes)
+
+    def acquire(self, cores, ranks_per_node=None, placement='pack', max_cores=None):
+        """
+        Wait until cores are free and reserve them for a task. While waiting the request is recorded so that other
+        tasks do not borrow the cores it needs.
+        :return: (Placement)
+        """
+        request_id = uuid.uuid4().hex[:12]
+        if max_cores and max_cores > cores:
+            # Give tasks submitted at the same time a chance to register before cores are borrowed
+            with self._state() as state:
+                state['waiting'][request_id] = cores
+            time.sleep(_SCHEDULER_POLL_TIME)
+        while True:
+            reserved = self.try_acquire(cores, ranks_per_node, placement, max_cores, request_id)
+            if reserved:
+                return reserved
+            with self._state() as state:
+                state['waiting'][request_id] = cores
+            time.sleep(_SCHEDULER_POLL_TIME)
+
+    def release(self, reserved):
+        """
+        Return the cores of a finished task and remove its machinefile.
+        :param reserved: (Placement)
+        :return: None
+        """
+        reserved.remove_machinefile()
+        with self._state() as state:
+            task = state['tasks'].pop(reserved.task_id)
+            elapsed = time.time() - task['start']
+            for node, ranks in task['nodes'].items():
+                state['busy'][node] += ranks * elapsed
+
+    def utilization(self):
+        """
+        Fraction of core time used on each node since the ledger was created. Running tasks are included.
+        :return: (dict) Utilization keyed by node name
+        """
+        with self._state() as state:
+            now = time.time()
+            busy = dict(state['busy'])
+            for task in state['tasks'].values():
+                for node, ranks in task['nodes'].items():
+                    busy[node] += ranks * (now - task['start'])
+            elapsed = max(now - state['start'], 1e-12)
+
+            return {node: busy[node] / (cores * elapsed) for node, cores in state['nodes'].items()}
+
+
+def place(nodes, free, cores, ranks_per_node=None, placement='pack'):
+    """
+    Choose nodes for a task.
+    :param nodes: (dict) Cores on each node
+    :param free: (dict) Free cores on each node
+    :param cores: (int) Number of cores for the task
+    :param ranks_per_node: (int) Ranks on each node. If not set the task is put on one node if it fits, otherwise
+                                 it fills the nodes with the most free cores.
+    :param placement: (str) 'pack' prefers the fullest nodes that fit, 'spread' the emptiest
+    :return: (dict or None) Ranks on each node or None if the task does not fit
+    """
+    assert placement in _PLACEMENTS, f"placement must be one of {_PLACEMENTS}"
+    order = sorted(free, key=lambda node: free[node], reverse=placement == 'spread')
+
+    if ranks_per_node:
+        ranks_per_node = min(ranks_per_node, cores)
+        nnodes = -(-cores // ranks_per_node)
+        candidates = [node for node in order if free[node] >= ranks_per_node]
+        if len(candidates) < nnodes:
+            return None
+        ranks = [ranks_per_node] * (nnodes - 1) + [cores - ranks_per_node * (nnodes - 1)]
+        return dict(zip(candidates[:nnodes], ranks))
+
+    for node in order:
+        if free[node] >= cores:
+            return {node: cores}
+
+    # Split over the fewest nodes
+    chosen, remaining = {}, cores
+    for node in sorted(free, key=lambda node: free[node], reverse=True):
+        if remaining == 0 or free[node] == 0:
+            break
+        chosen[node] = min(free[node], remaining)
+        remaining -= chosen[node]
+
+    return chosen if remaining == 0 else None
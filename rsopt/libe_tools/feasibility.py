@@ -0,0 +1,161 @@
+"""
+Feasibility filtering of generated points before simulation.
+
+The allocation function is wrapped so the manager checks the cheap constraints of every new point before it is handed
+to a worker. Infeasible points are either projected back to the feasible region in the history or completed in the
+history with the failure penalty and given back to the generator without being simulated. Rejected points do not
+count toward sim_max. Points are only projected if alloc_specs['user']['project'] is set, which the optimizer does when
+its generator reads the simulated x back from the values it is given. Otherwise the generator would pair f at the
+projected point with the point it asked for, so the point is rejected instead.
+
+If there are integer or categorical parameters the entries of every new point are rounded first. A point that rounds
+to the same values as an earlier point is not simulated. It is completed with the results of the earlier point once
+they return.
+"""
+import time
+import numpy as np
+from libensemble.message_numbers import EVAL_SIM_TAG
+from rsopt.configuration.parameters import DISCRETE_TYPES
+from rsopt.libe_tools.generator_functions.local_opt_generator import x_to_cube
+from rsopt.simulation import format_evaluation, _PENALTY
+
+# Field added to sim_specs['out'] when constraints are used
+FEASIBILITY_FIELDS = [('rejected', bool)]
+# Field added to sim_specs['out'] when there are integer or categorical parameters
+DUPLICATE_FIELDS = [('duplicate', bool)]
+
+
+def feasibility_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+    """
+    Wraps the allocation function given in alloc_specs['user']['alloc_f']. New rows of H are rounded to the integer
+    and categorical values in alloc_specs['user']['parameter_types'] and checked against the cheap constraints in
+    alloc_specs['user']['constraints'] before the wrapped allocation function hands out work.
+    """
+    user_specs = alloc_specs['user']
+    constraints = user_specs.get('constraints')
+    discrete = _discrete_parameters(user_specs)
+    checked = persis_info.get('feasibility_checked', 0)
+    persis_info.setdefault('projected', 0)
+    # First row of each distinct point and the rows waiting on the results of an earlier row
+    points = persis_info.setdefault('points', {})
+    duplicates = persis_info.setdefault('duplicates', {})
+
+    for row in range(checked, len(H)):
+        if H['given'][row]:
+            continue
+        if discrete is not None:
+            H['x'][row][discrete] = _round(H['x'][row], user_specs, discrete)
+        if constraints and constraints.cheap and not check(H, row, sim_specs, user_specs, persis_info, discrete):
+            continue
+        if discrete is not None:
+            key = H['x'][row].tobytes()
+            if key in points:
+                duplicates[row] = points[key]
+                H['duplicate'][row] = True
+                H['given'][row] = True
+            else:
+                points[key] = row
+    persis_info['feasibility_checked'] = len(H)
+
+    for row, original in list(duplicates.items()):
+        if H['returned'][original]:
+            copy_results(H, row, original, sim_specs)
+            duplicates.pop(row)
+
+    skipped = np.zeros(len(H), dtype=bool)
+    for name, _ in FEASIBILITY_FIELDS + DUPLICATE_FIELDS:
+        if name in H.dtype.names:
+            skipped |= H[name]
+    while True:
+        Work, persis_info, *flag = user_specs['alloc_f'](W, H, sim_specs, gen_specs, alloc_specs, persis_info)
+        # Allocation functions that hand out rows in order may still give a skipped row to a worker
+        dropped = [i for i, work in Work.items()
+                   if work['tag'] == EVAL_SIM_TAG and np.all(skipped[work['libE_info']['H_rows']])]
+        for i in dropped:
+            Work.pop(i)
+        # The manager expects work if every worker is idle. Allocate again past the skipped rows.
+        if Work or not dropped or flag:
+            break
+
+    return (Work, persis_info, *flag)
+
+
+def _discrete_parameters(user_specs):
+    # Mask of integer and categorical entries of a point. None if there are none.
+    if user_specs.get('parameter_types') is None:
+        return None
+    discrete = np.isin(user_specs['parameter_types'], DISCRETE_TYPES)
+    return discrete if np.any(discrete) else None
+
+
+def _round(x, user_specs, discrete):
+    return np.clip(np.round(x[discrete]), user_specs['lb'][discrete], user_specs['ub'][discrete])
+
+
+def check(H, row, sim_specs, user_specs, persis_info, discrete=None):
+    """
+    Check a row of H against the cheap constraints. The point is projected or the row is rejected if infeasible.
+    :param H: (numpy structured array) libEnsemble history
+    :param row: (int) Row of H
+    :param sim_specs: (dict) libEnsemble simulation specification
+    :param user_specs: (dict) alloc_specs['user'] with 'constraints', 'lb' and 'ub'. Points are only projected if
+        'project' is set.
+    :param persis_info: (dict) Counts projected points in 'projected'
+    :param discrete: (array) Mask of integer and categorical entries of a point. These are rounded after projection.
+    :return: (bool) True if the point is feasible or was projected
+    """
+    constraints = user_specs['constraints']
+    values = dict(zip([c.name for c in constraints.cheap], constraints.cheap_values(H['x'][row])))
+    violated = constraints.violated(values, constraints.cheap)
+    if not violated:
+        return True
+    if user_specs.get('project') and all(c.action == 'project' for c in violated):
+        x = constraints.project(H['x'][row])
+        if discrete is not None:
+            x[discrete] = _round(x, user_specs, discrete)
+        if constraints.feasible(x):
+            H['x'][row] = x
+            if 'x_on_cube' in H.dtype.names:
+                H['x_on_cube'][row] = x_to_cube(x, user_specs)
+            persis_info['projected'] += 1
+            return True
+    # Expensive constraints are never evaluated for rejected points
+    reject(H, row, sim_specs, {**values, **{c.name: np.nan for c in constraints.expensive}})
+
+    return False
+
+
+def reject(H, row, sim_specs, values):
+    """
+    Complete a row of H with the failure penalty without simulating it.
+    :param H: (numpy structured array) libEnsemble history
+    :param row: (int) Row of H
+    :param sim_specs: (dict) libEnsemble simulation specification
+    :param values: (dict) Constraint values by name
+    :return: None
+    """
+    output = format_evaluation(sim_specs, _PENALTY)
+    for name in output.dtype.names:
+        H[name][row] = output[name][0]
+    for name, value in values.items():
+        H[name][row] = value
+    H['rejected'][row] = True
+    H['given'][row] = True
+    H['returned'][row] = True
+    H['given_time'][row] = time.time()
+
+
+def copy_results(H, row, original, sim_specs):
+    """
+    Complete a row of H with the results of an earlier row at the same point.
+    :param H: (numpy structured array) libEnsemble history
+    :param row: (int) Row of H to complete
+    :param original: (int) Row of H that was simulated
+    :param sim_specs: (dict) libEnsemble simulation specification
+    :return: None
+    """
+    for name, *_ in sim_specs['out']:
+        if name != 'duplicate':
+            H[name][row] = H[name][original]
+    H['returned'][row] = True
+    H['given_time'][row] = time.time()
@@ -0,0 +1,209 @@
+"""
+Batch Bayesian optimization run as a persistent generator.
+A Gaussian process is fit to every returned evaluation. New points are chosen by expected improvement. Points that
+are still being evaluated are given a fake result, the model prediction but no better than the current best value,
+so a batch of distinct points can be proposed at once. A new point is proposed each time an evaluation returns so the number of points in
+evaluation stays at batch_size.
+"""
+import copy
+import math
+import numpy as np
+
+from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
+from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.local_opt_generator import add_to_local_H, x_to_cube
+from rsopt.libe_tools.surrogate import GaussianProcess
+from rsopt.simulation import _PENALTY
+
+# ncandidates: Number of random points the acquisition function is maximized over, half are drawn near the best point
+# local_scale: Standard deviation, on the unit cube, of the candidates drawn near the best point
+# nugget: Variance added to the kernel diagonal, relative to the variance of the values. Small so that differences
+#         near the minimum are resolved.
+BAYESIAN_DEFAULTS = {'batch_size': 1,
+                     'initial_design_size': 0,
+                     'ncandidates': 2000,
+                     'local_scale': 0.05,
+                     'nugget': 1e-10,
+                     'xi': 0.}
+
+_REFINEMENT_STEPS = 4
+_REFINEMENT_SIZE = 200
+
+_normal_cdf = np.vectorize(lambda z: 0.5 * (1. + math.erf(z / math.sqrt(2.))))
+
+
+def persistent_bayesian_optimization(H, persis_info, gen_specs, libE_info):
+    """
+    Persistent generator running batch Bayesian optimization.
+
+    gen_specs['out'] should contain:
+
+    - ``'x' [n floats]``: Parameters being optimized over
+    - ``'x_on_cube' [n floats]``: Parameters scaled to the unit cube
+    - ``'sim_id' [int]``: Row number of entry in history
+    - ``'local_pt' [bool]``: Always False. Required by the persistent_aposmm_alloc allocation function.
+
+    gen_specs['user'] should supply the following:
+
+    lb: lower bound of the search domain
+    ub: upper bound of the search domain
+
+    optionally the user may supply:
+
+    xstart: Included in the initial design
+    batch_size: Number of points kept in evaluation. Should be the number of simulation workers.
+    initial_design_size: Number of uniformly sampled points evaluated before the model is used.
+        Defaults to max(2n + 1, batch_size).
+    ncandidates, local_scale, nugget: See `BAYESIAN_DEFAULTS`
+    xi: Expected improvement is computed against best value - xi * (standard deviation of the values)
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+    """
+    user_specs = {**BAYESIAN_DEFAULTS, **gen_specs['user']}
+    n = len(user_specs['ub'])
+    comm = libE_info['comm']
+    rand_stream = persis_info['rand_stream']
+    out_fields = [i[0] for i in gen_specs['out']]
+
+    local_H = initialize_local_H(H, n)
+    gp = GaussianProcess(n, nugget=user_specs['nugget'])
+
+    design = rand_stream.uniform(0, 1, (user_specs['initial_design_size'] or max(2 * n + 1, user_specs['batch_size']),
+                                        n))
+    if user_specs.get('xstart') is not None:
+        design[0] = x_to_cube(user_specs['xstart'], user_specs)
+    add_to_local_H(local_H, design, user_specs, local_flag=0, on_cube=True)
+    send_mgr_worker_msg(comm, local_H[-len(design):][out_fields])
+
+    while True:
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            break
+
+        sim_ids = calc_in['sim_id']
+        # The manager may have projected the point onto the feasible region before it was simulated
+        local_H['x'][sim_ids] = calc_in['x']
+        local_H['x_on_cube'][sim_ids] = calc_in['x_on_cube']
+        local_H['f'][sim_ids] = calc_in['f']
+        local_H['returned'][sim_ids] = True
+        # Failed simulations are given a penalty value and would distort the model
+        valid = np.isfinite(calc_in['f']) & (calc_in['f'] < _PENALTY)
+        if np.any(valid):
+            gp.add(local_H['x_on_cube'][sim_ids[valid]], calc_in['f'][valid])
+
+        pending = np.flatnonzero(~local_H['returned'])
+        nproposals = max(user_specs['batch_size'] - pending.size, 0)
+        if len(gp):
+            proposals = propose_batch(gp, local_H['x_on_cube'][pending], nproposals, user_specs, rand_stream)
+        else:
+            # Every evaluation so far failed. Keep sampling uniformly until the model has a point.
+            proposals = rand_stream.uniform(0, 1, (nproposals, n))
+        if len(proposals):
+            add_to_local_H(local_H, proposals, user_specs, local_flag=0, on_cube=True)
+        # Always reply, even without new points, so the manager keeps giving back results
+        send_mgr_worker_msg(comm, local_H[len(local_H) - len(proposals):][out_fields])
+
+    returned = np.flatnonzero(local_H['returned'] & (local_H['f'] < _PENALTY))
+    if returned.size:
+        best = returned[np.nanargmin(local_H['f'][returned])]
+        persis_info['best_x'] = local_H['x'][best]
+        persis_info['best_f'] = local_H['f'][best]
+
+    return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+
+def propose_batch(gp, pending, nproposals, user_specs, rand_stream):
+    """
+    Choose points by expected improvement. Pending points and each new proposal are added to a copy of the model
+    before the next point is chosen. Their result is the prediction of the model, raised to the best observed value
+    so a pending point has no expected improvement and is not proposed again.
+    :param gp: (GaussianProcess) Model of the returned evaluations
+    :param pending: (array) Points on the unit cube that are still being evaluated
+    :param nproposals: (int) Number of points to propose
+    :param user_specs: (dict) gen_specs['user'] with BAYESIAN_DEFAULTS applied
+    :param rand_stream: (numpy.random.RandomState) Random stream from persis_info
+    :return: (array) nproposals x n points on the unit cube
+    """
+    n = gp.x.shape[1]
+    proposals = np.zeros((0, n))
+    if nproposals == 0:
+        return proposals
+
+    f_best = np.min(gp.f)
+    x_best = gp.x[np.argmin(gp.f)]
+    liar = copy.deepcopy(gp)
+    if pending.size:
+        liar.add(pending, np.maximum(liar.predict(pending)[0], f_best), refit=False)
+
+    f_target = f_best - user_specs['xi'] * np.std(gp.f)
+    for _ in range(nproposals):
+        proposal = maximize_acquisition(liar, f_target, x_best, user_specs, rand_stream)
+        proposals = np.vstack([proposals, proposal])
+        liar.add(proposal, np.maximum(liar.predict(proposal)[0], f_best), refit=False)
+
+    return proposals
+
+
+def maximize_acquisition(gp, f_target, x_best, user_specs, rand_stream):
+    """
+    Maximize expected improvement over random candidates, then refine around the maximum with shrinking steps.
+    :return: (array) Point on the unit cube
+    """
+    n = x_best.size
+    nlocal = user_specs['ncandidates'] // 2
+    candidates = np.vstack([rand_stream.uniform(0, 1, (user_specs['ncandidates'] - nlocal, n)),
+                            sample_near(x_best, user_specs['local_scale'], nlocal, rand_stream)])
+    ei = expected_improvement(*gp.predict(candidates), f_target)
+    x, best = candidates[np.argmax(ei)], np.max(ei)
+
+    scale = user_specs['local_scale']
+    for _ in range(_REFINEMENT_STEPS):
+        scale /= 4.
+        candidates = sample_near(x, scale, _REFINEMENT_SIZE, rand_stream)
+        ei = expected_improvement(*gp.predict(candidates), f_target)
+        if np.max(ei) > best:
+            x, best = candidates[np.argmax(ei)], np.max(ei)
+
+    return x
+
+
+def sample_near(x, scale, size, rand_stream):
+    return np.clip(x + scale * rand_stream.standard_normal((size, x.size)), 0., 1.)
+
+
+def expected_improvement(mean, std, f_best):
+    """
+    Expected improvement for minimization.
+    :param mean: (array) Predicted values
+    :param std: (array) Standard deviation of the predictions
+    :param f_best: (float) Value to improve on
+    :return: (array) Expected improvement. Points with no uncertainty have an improvement of max(f_best - mean, 0).
+    """
+    improvement = f_best - mean
+    ei = np.maximum(improvement, 0.)
+    uncertain = std > 0.
+    z = improvement[uncertain] / std[uncertain]
+    ei[uncertain] = improvement[uncertain] * _normal_cdf(z) + std[uncertain] * np.exp(-0.5 * z**2) / np.sqrt(2. * np.pi)
+
+    return np.maximum(ei, 0.)
+
+
+def initialize_local_H(H, n):
+    local_H_fields = [('f', float),
+                      ('x', float, n),
+                      ('x_on_cube', float, n),
+                      ('local_pt', bool),
+                      ('sim_id', int),
+                      ('returned', bool)
+                      ]
+    local_H = np.zeros(len(H), dtype=local_H_fields)
+
+    for field in H.dtype.names:
+        if field in local_H.dtype.names:
+            local_H[field][:len(H)] = H[field]
+
+    return local_H
@@ -0,0 +1,259 @@
+"""
+Covariance matrix adaptation evolution strategy (CMA-ES) run as a persistent generator.
+The strategy follows N. Hansen, "The CMA Evolution Strategy: A Tutorial", arXiv:1604.00772.
+
+Evaluations are handled asynchronously. Every returned evaluation is immediately replaced by a new sample from the
+current search distribution so that all workers stay busy. Returned points are collected until a full population is
+available and are then used to update the distribution. Points sampled from an earlier distribution are treated as
+injected solutions (N. Hansen, "Injecting External Solutions Into CMA-ES", arXiv:1110.4181): their steps are
+recomputed from the current mean and their Mahalanobis length is clipped before they enter the update.
+
+When the search stagnates the strategy is restarted with a population twice as large (IPOP-CMA-ES,
+A. Auger and N. Hansen, CEC 2005).
+"""
+import numpy as np
+
+from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
+from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.local_opt_generator import add_to_local_H, x_to_cube
+
+# sigma0 is the initial step size on the unit cube
+CMAES_DEFAULTS = {'sigma0': 0.3,
+                  'max_restarts': 9,
+                  'popsize_factor': 2,
+                  'tolx': 1e-11,
+                  'tolfun': 1e-12,
+                  'max_condition': 1e14}
+
+
+def default_popsize(n):
+    return 4 + int(3 * np.log(n))
+
+
+class CMAES:
+    """
+    CMA-ES search distribution on the unit cube with batch ask/tell.
+    """
+    def __init__(self, mean, sigma, popsize, rand_stream, tolx=1e-11, tolfun=1e-12, max_condition=1e14):
+        """
+        :param mean: (array) Initial mean on the unit cube
+        :param sigma: (float) Initial step size
+        :param popsize: (int) Number of evaluations used for each update
+        :param rand_stream: (numpy.random.RandomState) Random stream used for sampling
+        :param tolx: (float) Stop when sigma times the largest axis of the distribution falls below tolx
+        :param tolfun: (float) Stop when the recent best values and the current population span less than tolfun
+        :param max_condition: (float) Stop when the condition number of the covariance matrix exceeds max_condition
+        """
+        self.n = n = len(mean)
+        self.mean = np.array(mean, dtype=float)
+        self.sigma = sigma
+        self.popsize = popsize
+        self.rand_stream = rand_stream
+        self.tolx, self.tolfun, self.max_condition = tolx, tolfun, max_condition
+
+        # Selection and recombination
+        self.mu = popsize // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / np.sum(weights)
+        self.mueff = 1. / np.sum(self.weights**2)
+
+        # Adaptation
+        self.cc = (4. + self.mueff / n) / (n + 4. + 2. * self.mueff / n)
+        self.cs = (self.mueff + 2.) / (n + self.mueff + 5.)
+        self.c1 = 2. / ((n + 1.3)**2 + self.mueff)
+        self.cmu = min(1. - self.c1, 2. * (self.mueff - 2. + 1. / self.mueff) / ((n + 2.)**2 + self.mueff))
+        self.damps = 1. + 2. * max(0., np.sqrt((self.mueff - 1.) / (n + 1.)) - 1.) + self.cs
+        self.chin = np.sqrt(n) * (1. - 1. / (4. * n) + 1. / (21. * n**2))
+        # Clipping length for injected steps
+        self.max_step = np.sqrt(n) + 2. * n / (n + 2.)
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.invsqrtC = np.eye(n)
+        self.generation = 0
+        self.best_history = []
+
+    def ask(self, k):
+        """
+        Sample `k` points from the current distribution. Points are clipped to the unit cube.
+        :param k: (int) Number of points
+        :return: (array) k x n points on the unit cube
+        """
+        z = self.rand_stream.standard_normal((k, self.n))
+        y = (z * self.D) @ self.B.T
+        return np.clip(self.mean + self.sigma * y, 0., 1.)
+
+    def tell(self, x, f):
+        """
+        Update the distribution from evaluated points. Points do not need to come from the current distribution.
+        :param x: (array) popsize x n evaluated points on the unit cube
+        :param f: (array) Objective values. NaN values are ranked last.
+        :return: None
+        """
+        n = self.n
+        f = np.where(np.isnan(f), np.inf, f)
+        order = np.argsort(f)
+        self.best_history.append(f[order[0]])
+        self._last_f_range = f[order[-1]] - f[order[0]]
+
+        y = (x[order[:self.mu]] - self.mean) / self.sigma
+        # Clip the Mahalanobis length of each step. Has no effect on typical samples from the current distribution.
+        lengths = np.linalg.norm(y @ self.invsqrtC.T, axis=1)
+        y *= np.minimum(1., self.max_step / np.maximum(lengths, 1e-300))[:, np.newaxis]
+        y_w = self.weights @ y
+
+        self.mean = self.mean + self.sigma * y_w
+
+        self.ps = (1. - self.cs) * self.ps + np.sqrt(self.cs * (2. - self.cs) * self.mueff) * (self.invsqrtC @ y_w)
+        ps_norm = np.linalg.norm(self.ps)
+        hsig = ps_norm / np.sqrt(1. - (1. - self.cs)**(2 * (self.generation + 1))) < (1.4 + 2. / (n + 1.)) * self.chin
+        self.pc = (1. - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2. - self.cc) * self.mueff) * y_w
+
+        rank_mu = (y.T * self.weights) @ y
+        self.C = (1. - self.c1 - self.cmu + (1. - hsig) * self.c1 * self.cc * (2. - self.cc)) * self.C \
+            + self.c1 * np.outer(self.pc, self.pc) + self.cmu * rank_mu
+        self.sigma *= np.exp((self.cs / self.damps) * (ps_norm / self.chin - 1.))
+        self.generation += 1
+
+        self._update_eigensystem()
+
+    def _update_eigensystem(self):
+        self.C = (self.C + self.C.T) / 2.
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-300))
+        self.invsqrtC = (self.B / self.D) @ self.B.T
+
+    def stop(self):
+        """
+        Check if the search has stagnated.
+        :return: (bool) True if the search should be restarted
+        """
+        if self.generation == 0:
+            return False
+        if self.sigma * np.max(self.D) < self.tolx:
+            return True
+        if (np.max(self.D) / np.min(self.D))**2 > self.max_condition:
+            return True
+        history_length = 10 + int(np.ceil(30. * self.n / self.popsize))
+        if len(self.best_history) >= history_length:
+            recent = self.best_history[-history_length:]
+            if max(max(recent) - min(recent), self._last_f_range) < self.tolfun:
+                return True
+
+        return False
+
+
+def persistent_cmaes(H, persis_info, gen_specs, libE_info):
+    """
+    Persistent generator running IPOP-CMA-ES.
+
+    gen_specs['out'] should contain:
+
+    - ``'x' [n floats]``: Parameters being optimized over
+    - ``'x_on_cube' [n floats]``: Parameters scaled to the unit cube
+    - ``'sim_id' [int]``: Row number of entry in history
+    - ``'local_pt' [bool]``: Always False. Required by the persistent_aposmm_alloc allocation function.
+
+    gen_specs['user'] should supply the following:
+
+    lb: lower bound of the search domain
+    ub: upper bound of the search domain
+
+    optionally the user may supply:
+
+    xstart: Initial mean of the search distribution. Defaults to the center of the domain.
+    popsize: Initial population size. Defaults to 4 + 3 ln(n). This is also the number of points kept in evaluation.
+    sigma0, max_restarts, popsize_factor, tolx, tolfun, max_condition: See `CMAES_DEFAULTS`
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+    """
+    user_specs = {**CMAES_DEFAULTS, **gen_specs['user']}
+    n = len(user_specs['ub'])
+    comm = libE_info['comm']
+    rand_stream = persis_info['rand_stream']
+    out_fields = [i[0] for i in gen_specs['out']]
+
+    popsize = user_specs.get('popsize') or default_popsize(n)
+    if user_specs.get('xstart') is not None:
+        mean = x_to_cube(user_specs['xstart'], user_specs)
+    else:
+        mean = np.full(n, 0.5)
+    stopping_criteria = {key: user_specs[key] for key in ['tolx', 'tolfun', 'max_condition']}
+    es = CMAES(mean, user_specs['sigma0'], popsize, rand_stream, **stopping_criteria)
+
+    local_H = initialize_local_H(H, n)
+    restart = 0
+    pool_x, pool_f = [], []
+
+    add_samples_to_local_H(local_H, es.ask(popsize), restart, user_specs)
+    send_mgr_worker_msg(comm, local_H[-popsize:][out_fields])
+
+    while True:
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            break
+
+        sim_ids = calc_in['sim_id']
+        # The manager may have projected the point onto the feasible region before it was simulated
+        local_H['x'][sim_ids] = calc_in['x']
+        local_H['x_on_cube'][sim_ids] = calc_in['x_on_cube']
+        local_H['f'][sim_ids] = calc_in['f']
+        local_H['returned'][sim_ids] = True
+
+        # Points sampled before the last restart are not used by the new search
+        current = local_H['restart'][sim_ids] == restart
+        pool_x.extend(local_H['x_on_cube'][sim_ids[current]])
+        pool_f.extend(calc_in['f'][current])
+
+        while len(pool_f) >= es.popsize:
+            es.tell(np.array(pool_x[:es.popsize]), np.array(pool_f[:es.popsize]))
+            pool_x, pool_f = pool_x[es.popsize:], pool_f[es.popsize:]
+
+            if es.stop() and restart < user_specs['max_restarts']:
+                restart += 1
+                popsize = es.popsize * user_specs['popsize_factor']
+                es = CMAES(rand_stream.uniform(0, 1, n), user_specs['sigma0'], popsize, rand_stream,
+                           **stopping_criteria)
+                pool_x, pool_f = [], []
+
+        # Keep the number of points in evaluation constant
+        add_samples_to_local_H(local_H, es.ask(sim_ids.size), restart, user_specs)
+        send_mgr_worker_msg(comm, local_H[-sim_ids.size:][out_fields])
+
+    best = np.nanargmin(np.where(local_H['returned'], local_H['f'], np.nan)) if np.any(local_H['returned']) else None
+    if best is not None:
+        persis_info['best_x'] = local_H['x'][best]
+        persis_info['best_f'] = local_H['f'][best]
+    persis_info['restarts'] = restart
+
+    return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+
+def initialize_local_H(H, n):
+    local_H_fields = [('f', float),
+                      ('x', float, n),
+                      ('x_on_cube', float, n),
+                      ('local_pt', bool),
+                      ('sim_id', int),
+                      ('returned', bool),
+                      ('restart', int)
+                      ]
+    local_H = np.zeros(len(H), dtype=local_H_fields)
+
+    for field in H.dtype.names:
+        if field in local_H.dtype.names:
+            local_H[field][:len(H)] = H[field]
+
+    return local_H
+
+
+def add_samples_to_local_H(local_H, x_on_cube, restart, user_specs):
+    add_to_local_H(local_H, x_on_cube, user_specs, local_flag=0, on_cube=True)
+    local_H['restart'][-len(x_on_cube):] = restart
@@ -0,0 +1,125 @@
+"""
+NLopt local optimization with nonlinear inequality constraints for `persistent_local_opt`.
+
+The optimizer runs in a child process through the same handshake as libEnsemble's APOSMM LocalOptInterfacer. This
+module imports the APOSMM local optimizer support, so it is only loaded after
+rsopt.libe_tools.interface.set_aposmm_optimizers has been called.
+"""
+import nlopt
+import numpy as np
+from multiprocessing import Event, Process, Queue
+from libensemble.gen_funcs.aposmm_localopt_support import LocalOptInterfacer, ConvergedMsg, ErrorMsg, \
+    APOSMMException, opt_runner, put_set_wait_get, finish_queue
+from rsopt.libe_tools.generator_functions.local_opt_generator import cube_to_x
+from rsopt.simulation import _PENALTY
+
+
+class ConstrainedLocalOptInterfacer(LocalOptInterfacer):
+    """
+    LocalOptInterfacer for NLopt methods with nonlinear inequality constraints. user_specs['constraints'] holds the
+    rsopt.constraints.Constraints. Values of the expensive constraints are sent to the optimizer with f.
+    """
+
+    def __init__(self, user_specs, x0, f0, grad0=None):
+        # Same handshake as LocalOptInterfacer with run_local_constrained_nlopt in the child process
+        self.parent_can_read = Event()
+        self.comm_queue = Queue()
+        self.child_can_read = Event()
+
+        self.x0 = x0.copy()
+        self.f0 = f0.copy()
+        self.grad0 = None
+        self.expensive = [c.name for c in user_specs['constraints'].expensive]
+
+        self.parent_can_read.clear()
+        self.process = Process(target=opt_runner, args=(run_local_constrained_nlopt, user_specs,
+                               self.comm_queue, x0, f0, self.child_can_read,
+                               self.parent_can_read))
+
+        self.process.start()
+        self.is_running = True
+        self.parent_can_read.wait()
+        x_new = self.comm_queue.get()
+        if isinstance(x_new, ErrorMsg):
+            raise APOSMMException(x_new.x)
+
+        assert np.allclose(x_new, x0, rtol=1e-15, atol=1e-15), \
+            "The first point requested by this run does not match the starting point. Exiting"
+
+    def iterate(self, data):
+        self.parent_can_read.clear()
+
+        # Constraints of failed simulations are treated as violated
+        constraints = np.array([data[name] for name in self.expensive], dtype=float)
+        self.comm_queue.put((data['x_on_cube'], data['f'], np.nan_to_num(constraints, nan=_PENALTY)))
+
+        self.child_can_read.set()
+        self.parent_can_read.wait()
+
+        x_new = self.comm_queue.get()
+        if isinstance(x_new, ErrorMsg):
+            raise APOSMMException(x_new.x)
+        elif isinstance(x_new, ConvergedMsg):
+            self.close()
+        else:
+            x_new = np.atleast_2d(x_new)
+
+        return x_new
+
+
+def run_local_constrained_nlopt(user_specs, comm_queue, x0, f0, child_can_read, parent_can_read):
+    """
+    Runs an NLopt local optimization with the constraints in user_specs['constraints']. Follows run_local_nlopt of the
+    APOSMM local optimizer interface. Cheap constraints are evaluated in this process. Once a feasible point has been
+    evaluated, points that violate a cheap constraint are not sent for simulation and are given the objective and
+    expensive constraint values of the best feasible point so far.
+    """
+    n = len(user_specs['ub'])
+    constraints = user_specs['constraints']
+
+    opt = nlopt.opt(getattr(nlopt, user_specs['localopt_method']), n)
+    opt.set_lower_bounds(np.zeros(n))
+    opt.set_upper_bounds(np.ones(n))
+
+    # Care must be taken here because a too-large initial step causes nlopt to move the starting point!
+    dist_to_bound = min(min(1. - x0), min(x0))
+    assert dist_to_bound > np.finfo(np.float32).eps, "The distance to the boundary is too small for NLopt to handle"
+    opt.set_initial_step(dist_to_bound * user_specs.get('dist_to_bound_multiple', 1.))
+    opt.set_maxeval(user_specs.get('run_max_eval', 1000 * n))
+
+    # Expensive constraint values of each point sent for evaluation. NLopt asks for the objective before the
+    #   constraints at every point.
+    evaluated = {}
+    best = {}
+
+    def objective(x, grad):
+        if best and not constraints.feasible(cube_to_x(x, user_specs)):
+            evaluated[x.tobytes()] = best['constraints']
+            return best['f']
+        _, f, values = put_set_wait_get(x, comm_queue, parent_can_read, child_can_read, user_specs)
+        evaluated[x.tobytes()] = values
+        feasible = all(v <= c.tolerance for v, c in zip(values, constraints.expensive)) and \
+            constraints.feasible(cube_to_x(x, user_specs))
+        if feasible and f < best.get('f', np.inf):
+            best.update({'f': f, 'constraints': values})
+        return f
+
+    opt.set_min_objective(objective)
+    for i, c in enumerate(constraints.cheap):
+        opt.add_inequality_constraint(
+            lambda x, grad, i=i: constraints.cheap_values(cube_to_x(x, user_specs))[i] - constraints.cheap[i].tolerance,
+            0.)
+    for i, c in enumerate(constraints.expensive):
+        opt.add_inequality_constraint(lambda x, grad, i=i: evaluated[x.tobytes()][i] - constraints.expensive[i].tolerance,
+                                      0.)
+
+    for tolerance in ['xtol_rel', 'ftol_rel', 'xtol_abs', 'ftol_abs']:
+        if tolerance in user_specs:
+            getattr(opt, 'set_' + tolerance)(user_specs[tolerance])
+
+    x_opt = opt.optimize(x0)
+    return_val = opt.last_optimize_result()
+    # Return values 1 to 4 mean an optimum was identified
+    opt_flag = int(1 <= return_val <= 4)
+
+    finish_queue(x_opt, opt_flag, comm_queue, parent_can_read, user_specs)
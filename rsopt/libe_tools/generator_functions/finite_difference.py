@@ -0,0 +1,56 @@
+"""
+Finite-difference gradient estimates for gradient based local optimization methods.
+All points are on the unit cube. The stencil for an iterate is built so every perturbed point can be evaluated in a
+single batch.
+"""
+import numpy as np
+
+# fd_step is the step on the unit cube. It may be a single value or one value per parameter.
+FINITE_DIFFERENCE_DEFAULTS = {'fd_scheme': 'forward',
+                              'fd_step': 1e-6}
+FINITE_DIFFERENCE_SCHEMES = ('forward', 'central')
+
+
+def gradient_stencil(x, step, scheme):
+    """
+    Points needed to estimate the gradient at `x`. The derivative along parameter i is
+    (f(upper[i]) - f(lower[i])) / (upper[i, i] - lower[i, i]).
+    Steps that would leave the unit cube are reversed (forward) or shortened to the boundary (central).
+    :param x: (array) Iterate on the unit cube
+    :param step: (float or array) Step on the unit cube
+    :param scheme: (str) 'forward' uses n extra points, 'central' uses 2n extra points
+    :return: (array, array) upper and lower points, each n x n
+    """
+    assert scheme in FINITE_DIFFERENCE_SCHEMES, f"fd_scheme must be one of {FINITE_DIFFERENCE_SCHEMES}"
+    n = x.size
+    step = np.broadcast_to(np.asarray(step, dtype=float), (n,))
+    upper = np.tile(x, (n, 1))
+    lower = np.tile(x, (n, 1))
+    diagonal = np.arange(n)
+
+    if scheme == 'forward':
+        forward = x + step <= 1.
+        upper[diagonal, diagonal] = np.where(forward, x + step, x)
+        lower[diagonal, diagonal] = np.where(forward, x, x - step)
+    else:
+        upper[diagonal, diagonal] = np.minimum(x + step, 1.)
+        lower[diagonal, diagonal] = np.maximum(x - step, 0.)
+
+    return upper, lower
+
+
+def assemble_gradient(f_upper, f_lower, upper, lower):
+    """
+    Combine stencil evaluations into a gradient estimate.
+    :param f_upper: (array) Objective values at the upper points
+    :param f_lower: (array) Objective values at the lower points
+    :param upper: (array) Upper points from `gradient_stencil`
+    :param lower: (array) Lower points from `gradient_stencil`
+    :return: (array) Gradient on the unit cube
+    """
+    return (f_upper - f_lower) / (np.diag(upper) - np.diag(lower))
+
+
+def point_key(x):
+    # Rounding lets points that differ only by floating point noise share a cached evaluation
+    return tuple(np.round(x, 12))
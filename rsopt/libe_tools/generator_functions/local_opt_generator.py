@@ -5,71 +5,53 @@ in this module was adapted from the persistent APOSMM generator as defined in:
 https://github.com/Libensemble/libensemble/blob/a870bd4beffccbc863f79dfd7ab3940f2a57a269/libensemble/gen_funcs/persistent_aposmm.py
 """
 
-from importlib import util
-# TODO: If libEnsemble is updated can import optimizer list
-# from libensemble.gen_funcs import aposmm_optimizer_list
-aposmm_optimizer_list = ['nlopt', 'dfols', 'scipy', 'external']
-available_opt = []
-for optimizer in aposmm_optimizer_list:
-    if optimizer == 'external':
-        continue
-    if util.find_spec(optimizer):
-        print('found', optimizer)
-        available_opt.append(optimizer)
-    else:
-        print(f'Package {optimizer} not installed. Will not be available.')
-
-import libensemble.gen_funcs
-libensemble.gen_funcs.rc.aposmm_optimizers = available_opt
-
 import numpy as np
-from libensemble.gen_funcs.aposmm_localopt_support import LocalOptInterfacer, ConvergedMsg, simulate_recv_from_manager
-
 from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
 from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.finite_difference import FINITE_DIFFERENCE_DEFAULTS, gradient_stencil, \
+    assemble_gradient, point_key
+from rsopt.configuration.parameters import DISCRETE_TYPES
+from rsopt.libe_tools.interface import set_aposmm_optimizers
+
+MULTISTART_DEFAULTS = {'stall_evaluations': None,
+                       'stall_tolerance': 1e-8}
 
 
 def persistent_local_opt(H, persis_info, gen_specs, libE_info):
     try:
         # Setup
-        user_specs = gen_specs['user']
+        user_specs = {**FINITE_DIFFERENCE_DEFAULTS, **gen_specs['user']}
+        ConvergedMsg = local_opt_support().ConvergedMsg
         n, n_s, comm, local_H = initialize_local_opt(H, user_specs, libE_info)
-        x_start = (user_specs['xstart']-user_specs['lb'])/(user_specs['ub']-user_specs['lb'])
+        x_start = x_to_cube(user_specs['xstart'], user_specs)
         x_start = x_start.reshape(1, n)  # x_start will be iterated over, should contain single row
         _, _, run_order, run_pts, total_runs, fields_to_pass = initialize_children(user_specs)
+        # Evaluations already requested, keyed by point on the cube. Values are rows in local_H.
+        evaluated = {}
 
         # Intialize first point
-        add_to_local_H(local_H, x_start, user_specs, local_flag=0, on_cube=True)
-        # pass list of points in H (just one in our case)
-        send_mgr_worker_msg(comm, local_H[[-1]][[i[0] for i in gen_specs['out']]])
-        tag, Work, calc_in = get_mgr_worker_msg(comm)
-        n_s, n_r = update_local_H_after_receiving(local_H, n, n_s, user_specs, Work, calc_in, fields_to_pass)
+        data = evaluate_point(local_H, x_start[0], 0, user_specs, gen_specs, comm, fields_to_pass, evaluated)
+        if data is None:
+            persis_info['run_order'] = run_order
+            return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
 
         # Start the local optimizer
-        local_opter = LocalOptInterfacer(user_specs, x_start[0],
+        local_opter = create_local_opter(user_specs, x_start[0],
                                          local_H['f'] if 'f' in fields_to_pass else local_H['fvec'],
                                          local_H['grad'] if 'grad' in fields_to_pass else None)
-        pass_to_local_opter = local_H[0][fields_to_pass]
-        x_new = local_opter.iterate(pass_to_local_opter)
-        add_to_local_H(local_H, x_new, user_specs, local_flag=1, on_cube=True)
-        send_mgr_worker_msg(comm, local_H[[-1]][[i[0] for i in gen_specs['out']]])
 
         while True:
-            tag, Work, calc_in = get_mgr_worker_msg(comm)
-            if tag in [STOP_TAG, PERSIS_STOP]:
+            x_new = local_opter.iterate(data)
+            if isinstance(x_new, ConvergedMsg):
                 clean_up_and_stop(local_opter)
                 persis_info['run_order'] = run_order
                 break
-            n_s, n_r = update_local_H_after_receiving(local_H, n, n_s, user_specs, Work, calc_in, fields_to_pass)
-            for row in calc_in:
-                x_new = local_opter.iterate(row[fields_to_pass])
-            if isinstance(x_new, ConvergedMsg):
+
+            data = evaluate_point(local_H, x_new[0], 1, user_specs, gen_specs, comm, fields_to_pass, evaluated)
+            if data is None:
                 clean_up_and_stop(local_opter)
                 persis_info['run_order'] = run_order
                 break
-            else:
-                add_to_local_H(local_H, x_new, user_specs, local_flag=1, on_cube=True)
-                send_mgr_worker_msg(comm, local_H[[-1]][[i[0] for i in gen_specs['out']]])
 
         return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
 
@@ -80,6 +62,203 @@ def persistent_local_opt(H, persis_info, gen_specs, libE_info):
             pass
 
 
+def persistent_multistart_local_opt(H, persis_info, gen_specs, libE_info):
+    """
+    Persistent generator running several independent local optimization runs at once. Each run has one point, or
+    one finite-difference batch, in evaluation at a time so the runs share the simulation workers.
+
+    gen_specs['user'] should supply the same keys as `persistent_local_opt` and optionally:
+
+    nstarts: Number of runs. Defaults to 1 + number of rows in starts.
+    starts: Array of start points in the original domain. Sampled uniformly if fewer than nstarts are given.
+        xstart, if given, is always used as the first start.
+    stall_evaluations: Stop all runs if the best value found has not improved by more than stall_tolerance
+        over this many returned evaluations. Defaults to 20 * (n + 1) * nstarts.
+    stall_tolerance: See stall_evaluations
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+    """
+    local_opters = {}
+    try:
+        user_specs = {**FINITE_DIFFERENCE_DEFAULTS, **MULTISTART_DEFAULTS, **gen_specs['user']}
+        ConvergedMsg = local_opt_support().ConvergedMsg
+        n, n_s, comm, local_H = initialize_local_opt(H, user_specs, libE_info)
+        _, _, run_order, run_pts, total_runs, fields_to_pass = initialize_children(user_specs)
+        out_fields = [i[0] for i in gen_specs['out']]
+        starts = initialize_starts(user_specs, n, persis_info['rand_stream'])
+        stall_evaluations = user_specs['stall_evaluations'] or 20 * (n + 1) * len(starts)
+        evaluated = {}
+
+        # Requested point and rows for each active run
+        runs = {}
+        new_rows = []
+        for run, x_start in enumerate(starts):
+            rows, run_new_rows = request_point(local_H, x_start, 0, user_specs, fields_to_pass, evaluated)
+            runs[run] = (x_start, rows)
+            run_order[run] = rows[:1]
+            new_rows += run_new_rows
+        send_mgr_worker_msg(comm, local_H[new_rows][out_fields])
+
+        best_f, since_improvement = np.inf, 0
+        while runs:
+            tag, Work, calc_in = get_mgr_worker_msg(comm)
+            if tag in [STOP_TAG, PERSIS_STOP]:
+                break
+            update_local_H_after_receiving(local_H, n, n_s, user_specs, Work, calc_in, received_fields(fields_to_pass))
+
+            # Stall check on the evaluations in the order they returned
+            for f in calc_in['f']:
+                if f < best_f - user_specs['stall_tolerance']:
+                    best_f, since_improvement = f, 0
+                else:
+                    since_improvement += 1
+            if since_improvement >= stall_evaluations:
+                persis_info['stalled'] = True
+                break
+
+            new_rows = []
+            # A run may request a point that was already evaluated so keep iterating until every run is waiting
+            ready = [run for run, (x, rows) in runs.items() if np.all(local_H['returned'][rows])]
+            while ready:
+                for run in ready:
+                    x, rows = runs[run]
+                    data = point_data(local_H, x, rows, fields_to_pass)
+                    if run not in local_opters:
+                        f0 = local_H['f'] if 'f' in fields_to_pass else local_H['fvec']
+                        grad0 = local_H['grad'] if 'grad' in fields_to_pass else None
+                        local_opters[run] = create_local_opter(user_specs, x, f0, grad0)
+                    x_new = local_opters[run].iterate(data)
+                    if isinstance(x_new, ConvergedMsg):
+                        clean_up_and_stop(local_opters.pop(run))
+                        runs.pop(run)
+                        continue
+                    rows, run_new_rows = request_point(local_H, x_new[0], 1, user_specs, fields_to_pass, evaluated)
+                    runs[run] = (x_new[0], rows)
+                    run_order[run].append(rows[0])
+                    new_rows += run_new_rows
+                ready = [run for run, (x, rows) in runs.items() if np.all(local_H['returned'][rows])]
+
+            if runs:
+                # Always reply so the manager keeps giving back results, even if no run has a new point yet
+                send_mgr_worker_msg(comm, local_H[new_rows][out_fields])
+
+        persis_info['run_order'] = run_order
+        returned = np.where(local_H['returned'])[0]
+        if returned.size:
+            best = returned[np.nanargmin(local_H['f'][returned])]
+            persis_info['best_x'] = local_H['x'][best]
+            persis_info['best_f'] = local_H['f'][best]
+
+        return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+    finally:
+        for local_opter in local_opters.values():
+            clean_up_and_stop(local_opter)
+
+
+def initialize_starts(user_specs, n, rand_stream):
+    """
+    Start points on the unit cube for `persistent_multistart_local_opt`.
+    :return: (array) nstarts x n start points
+    """
+    starts = []
+    if user_specs.get('xstart') is not None:
+        starts.append(user_specs['xstart'])
+    if user_specs.get('starts') is not None:
+        starts.extend(np.atleast_2d(user_specs['starts']))
+    starts = x_to_cube(np.array(starts).reshape(-1, n), user_specs)
+
+    nstarts = user_specs.get('nstarts') or len(starts) + 1
+    if nstarts > len(starts):
+        starts = np.vstack([starts, rand_stream.uniform(0, 1, (nstarts - len(starts), n))])
+
+    return starts[:nstarts]
+
+
+def evaluate_point(local_H, x, local_flag, user_specs, gen_specs, comm, fields_to_pass, evaluated):
+    """
+    Request evaluation of a point and wait for the result. If the local optimization method needs 'grad' the
+    finite-difference stencil is requested in the same batch and the gradient is assembled once all points return.
+    Points that were evaluated before are not sent again.
+    :param local_H: (numpy structured array) Local history
+    :param x: (array) Point on the unit cube
+    :param local_flag: (int) Value of 'local_pt' for the point
+    :param user_specs: (dict) gen_specs['user'] with FINITE_DIFFERENCE_DEFAULTS applied
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param comm: libEnsemble communicator
+    :param fields_to_pass: (list) Fields the local optimization method needs
+    :param evaluated: (dict) Rows of local_H keyed by `point_key`. Updated with new requests.
+    :return: (numpy structured array) Single row of `fields_to_pass` for the point or None if the generator was stopped
+    """
+    rows, new_rows = request_point(local_H, x, local_flag, user_specs, fields_to_pass, evaluated)
+
+    out_fields = [i[0] for i in gen_specs['out']]
+    if new_rows:
+        send_mgr_worker_msg(comm, local_H[new_rows][out_fields])
+
+    while not np.all(local_H['returned'][rows]):
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            return None
+        update_local_H_after_receiving(local_H, len(x), 0, user_specs, Work, calc_in, received_fields(fields_to_pass))
+        if not np.all(local_H['returned'][rows]):
+            # The manager only gives back more results after the generator replies. Reply with no new points.
+            send_mgr_worker_msg(comm, local_H[[]][out_fields])
+
+    return point_data(local_H, x, rows, fields_to_pass)
+
+
+def request_point(local_H, x, local_flag, user_specs, fields_to_pass, evaluated):
+    """
+    Add a point, and its finite-difference stencil if 'grad' is needed, to local_H. Points in `evaluated` are reused.
+    :return: (list, list) Rows needed for the point with the point first and rows that must be sent for evaluation
+    """
+    points = [(x, local_flag)]
+    if 'grad' in fields_to_pass:
+        upper, lower = gradient_stencil(x, user_specs['fd_step'], user_specs['fd_scheme'])
+        points += [(p, 0) for p in np.vstack([upper, lower])]
+
+    new_rows = []
+    for point, flag in points:
+        key = point_key(point)
+        if key in evaluated:
+            continue
+        add_to_local_H(local_H, point.reshape(1, -1), user_specs, local_flag=flag, on_cube=True)
+        evaluated[key] = len(local_H) - 1
+        new_rows.append(len(local_H) - 1)
+
+    rows = [evaluated[point_key(point)] for point, _ in points]
+
+    return rows, new_rows
+
+
+def point_data(local_H, x, rows, fields_to_pass):
+    """
+    Collect the data for a point requested with `request_point` once all of its rows have returned.
+    :return: (numpy structured array) Single row of `fields_to_pass` for the point
+    """
+    if 'grad' in fields_to_pass:
+        n = len(x)
+        upper, lower = rows[1:n + 1], rows[n + 1:]
+        local_H['grad'][rows[0]] = assemble_gradient(local_H['f'][upper], local_H['f'][lower],
+                                                     local_H['x_on_cube'][upper], local_H['x_on_cube'][lower])
+
+    data = local_H[rows[0]][fields_to_pass].copy()
+    # A cached evaluation may differ from the requested point by rounding. The local optimizer expects its own point.
+    data['x_on_cube'] = x
+
+    return data
+
+
+def received_fields(fields_to_pass):
+    # 'grad' is never returned by the simulation. It is estimated by finite differences.
+    return [f for f in fields_to_pass if f != 'grad']
+
+
 def initialize_children(user_specs):
     """ Initialize stuff for localopt children """
     local_opters = {}
@@ -99,6 +278,8 @@ def initialize_children(user_specs):
         fields_to_pass = ['x_on_cube', 'fvec']
     else:
         raise NotImplementedError("Unknown local optimization method " "'{}'.".format(user_specs['localopt_method']))
+    if user_specs.get('constraints'):
+        fields_to_pass += [c.name for c in user_specs['constraints'].expensive]
 
     return local_opters, sim_id_to_child_inds, run_order, run_pts, total_runs, fields_to_pass
 
@@ -111,18 +292,15 @@ def add_to_local_H(local_H, pts, user_specs, local_flag=0, on_cube=True):
 
     len_local_H = len(local_H)
 
-    ub = user_specs['ub']
-    lb = user_specs['lb']
-
     num_pts = len(pts)
 
     local_H.resize(len(local_H)+num_pts, refcheck=False)  # Adds num_pts rows of zeros to O
 
     if on_cube:
         local_H['x_on_cube'][-num_pts:] = pts
-        local_H['x'][-num_pts:] = pts*(ub-lb)+lb
+        local_H['x'][-num_pts:] = cube_to_x(pts, user_specs)
     else:
-        local_H['x_on_cube'][-num_pts:] = (pts-lb)/(ub-lb)
+        local_H['x_on_cube'][-num_pts:] = x_to_cube(pts, user_specs)
         local_H['x'][-num_pts:] = pts
 
     if user_specs.get('periodic'):
@@ -132,6 +310,52 @@ def add_to_local_H(local_H, pts, user_specs, local_flag=0, on_cube=True):
     local_H['local_pt'][-num_pts:] = local_flag
 
 
+def cube_to_x(pts, user_specs):
+    """
+    Map points on the generator unit cube to parameter space. user_specs['parameter_types'] sets the type of each
+    parameter if any are not float, see rsopt.configuration.parameters. Integer and categorical entries are rounded.
+    :param pts: (array) Points on the unit cube
+    :param user_specs: (dict) Must contain 'lb' and 'ub'
+    :return: (array) Points in parameter space
+    """
+    lb, ub = np.asarray(user_specs['lb'], dtype=float), np.asarray(user_specs['ub'], dtype=float)
+    pts = np.asarray(pts, dtype=float)
+    x = pts * (ub - lb) + lb
+    if user_specs.get('parameter_types') is None:
+        return x
+    types = np.asarray(user_specs['parameter_types'])
+    log = types == 'log'
+    x[..., log] = lb[log] * (ub[log] / lb[log])**pts[..., log]
+    # Every integer in [lb, ub] covers an equal width of the cube
+    discrete = np.isin(types, DISCRETE_TYPES)
+    x[..., discrete] = np.clip(np.floor(lb[discrete] + pts[..., discrete] * (ub[discrete] - lb[discrete] + 1.)),
+                               lb[discrete], ub[discrete])
+
+    return x
+
+
+def x_to_cube(x, user_specs):
+    """
+    Map points in parameter space to the generator unit cube. Inverse of `cube_to_x`. Integer and categorical entries
+    are placed at the center of the part of the cube that rounds to them.
+    :param x: (array) Points in parameter space
+    :param user_specs: (dict) Must contain 'lb' and 'ub'
+    :return: (array) Points on the unit cube
+    """
+    lb, ub = np.asarray(user_specs['lb'], dtype=float), np.asarray(user_specs['ub'], dtype=float)
+    x = np.asarray(x, dtype=float)
+    pts = (x - lb) / (ub - lb)
+    if user_specs.get('parameter_types') is None:
+        return pts
+    types = np.asarray(user_specs['parameter_types'])
+    log = types == 'log'
+    pts[..., log] = np.log(x[..., log] / lb[log]) / np.log(ub[log] / lb[log])
+    discrete = np.isin(types, DISCRETE_TYPES)
+    pts[..., discrete] = (x[..., discrete] - lb[discrete] + 0.5) / (ub[discrete] - lb[discrete] + 1.)
+
+    return pts
+
+
 def update_local_H_after_receiving(local_H, n, n_s, user_specs, Work, calc_in, fields_to_pass):
 
     for name in ['f', 'x_on_cube', 'grad', 'fvec']:
@@ -148,6 +372,28 @@ def update_local_H_after_receiving(local_H, n, n_s, user_specs, Work, calc_in, f
     return n_s, n_r
 
 
+def create_local_opter(user_specs, x0, f0, grad0=None):
+    # Constraints are only passed to the method if the optimizer configuration put them in user_specs
+    if user_specs.get('constraints'):
+        set_aposmm_optimizers()
+        from rsopt.libe_tools.generator_functions.constrained_nlopt import ConstrainedLocalOptInterfacer
+        return ConstrainedLocalOptInterfacer(user_specs, x0, f0, grad0)
+
+    return local_opt_support().LocalOptInterfacer(user_specs, x0, f0, grad0)
+
+
+def local_opt_support():
+    """
+    libEnsemble's APOSMM local optimizer support imports every optimization package it is configured for when it is
+    first loaded. It is only loaded once a local optimization runs.
+    :return: (module) libensemble.gen_funcs.aposmm_localopt_support
+    """
+    set_aposmm_optimizers()
+    from libensemble.gen_funcs import aposmm_localopt_support
+
+    return aposmm_localopt_support
+
+
 def clean_up_and_stop(local_opter):
     local_opter.destroy()
 
@@ -181,6 +427,9 @@ def initialize_local_opt(H, user_specs, libE_info):
     if 'components' in user_specs:
         local_H_fields += [('fvec', float, user_specs['components'])]
 
+    if user_specs.get('constraints'):
+        local_H_fields += [(name, float) for name in user_specs['constraints'].names]
+
     local_H = np.zeros(len(H), dtype=local_H_fields)
 
     if len(H):
@@ -0,0 +1,173 @@
+"""
+Multi-fidelity optimization run as a persistent generator.
+Points are explored at the lowest fidelity and the most promising are promoted one level at a time by asynchronous
+successive halving (L. Li et al., "A System for Massively Parallel Hyperparameter Tuning", MLSys 2020). Each time an
+evaluation returns the worker is given a point ranked in the top 1 / reduction_factor of the results at its level that
+has not yet been promoted, searching from the highest level down. If there is no such point a new point is started at
+the lowest fidelity. About 1 / reduction_factor of the points at each level are evaluated at the next level.
+
+New points are drawn uniformly from the domain or, with probability local_fraction, near the best point at the highest
+fidelity evaluated so far.
+"""
+import numpy as np
+
+from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
+from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.local_opt_generator import add_to_local_H, x_to_cube
+
+# local_scale: Standard deviation, on the unit cube, of new points drawn near the best point
+MULTIFIDELITY_DEFAULTS = {'batch_size': 1,
+                          'reduction_factor': 3,
+                          'local_fraction': 0.5,
+                          'local_scale': 0.05}
+
+
+def persistent_multifidelity(H, persis_info, gen_specs, libE_info):
+    """
+    Persistent generator running asynchronous successive halving over fidelity levels.
+
+    gen_specs['out'] should contain:
+
+    - ``'x' [n floats]``: Parameters being optimized over
+    - ``'x_on_cube' [n floats]``: Parameters scaled to the unit cube
+    - ``'fidelity' [int]``: Fidelity level to evaluate the point at. 0 is the cheapest.
+    - ``'sim_id' [int]``: Row number of entry in history
+    - ``'local_pt' [bool]``: Always False. Required by the persistent_aposmm_alloc allocation function.
+
+    gen_specs['user'] should supply the following:
+
+    lb: lower bound of the search domain
+    ub: upper bound of the search domain
+    fidelity_levels: Number of fidelity levels. The highest level, fidelity_levels - 1, is the full simulation.
+
+    optionally the user may supply:
+
+    xstart: First point evaluated
+    batch_size: Number of points kept in evaluation. Should be the number of simulation workers.
+    reduction_factor, local_fraction, local_scale: See `MULTIFIDELITY_DEFAULTS`
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+    """
+    user_specs = {**MULTIFIDELITY_DEFAULTS, **gen_specs['user']}
+    n = len(user_specs['ub'])
+    levels = user_specs['fidelity_levels']
+    comm = libE_info['comm']
+    rand_stream = persis_info['rand_stream']
+    out_fields = [i[0] for i in gen_specs['out']]
+
+    local_H = initialize_local_H(H, n)
+
+    start = rand_stream.uniform(0, 1, (user_specs['batch_size'], n))
+    if user_specs.get('xstart') is not None:
+        start[0] = x_to_cube(user_specs['xstart'], user_specs)
+    add_points_to_local_H(local_H, start, 0, user_specs)
+    send_mgr_worker_msg(comm, local_H[-len(start):][out_fields])
+
+    while True:
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            break
+
+        sim_ids = calc_in['sim_id']
+        # The manager may have projected the point onto the feasible region before it was simulated
+        local_H['x'][sim_ids] = calc_in['x']
+        local_H['x_on_cube'][sim_ids] = calc_in['x_on_cube']
+        local_H['f'][sim_ids] = calc_in['f']
+        local_H['returned'][sim_ids] = True
+
+        # Replace every returned evaluation so the number of points in evaluation stays constant
+        for _ in sim_ids:
+            row = next_promotion(local_H, levels, user_specs['reduction_factor'])
+            if row is not None:
+                local_H['promoted'][row] = True
+                add_points_to_local_H(local_H, local_H['x_on_cube'][row:row + 1], local_H['fidelity'][row] + 1,
+                                      user_specs)
+            else:
+                add_points_to_local_H(local_H, sample_new_point(local_H, user_specs, rand_stream), 0, user_specs)
+        send_mgr_worker_msg(comm, local_H[-sim_ids.size:][out_fields])
+
+    best = best_at_highest_fidelity(local_H)
+    if best is not None:
+        persis_info['best_x'] = local_H['x'][best]
+        persis_info['best_f'] = local_H['f'][best]
+        persis_info['best_fidelity'] = local_H['fidelity'][best]
+
+    return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+
+def next_promotion(local_H, levels, reduction_factor):
+    """
+    Find a returned point that ranks in the top 1 / reduction_factor of its level and has not been promoted.
+    Higher levels are searched first so that points reach the full simulation as soon as possible.
+    :param local_H: (numpy structured array) Generator history
+    :param levels: (int) Number of fidelity levels
+    :param reduction_factor: (int) Fraction of points kept at each level is 1 / reduction_factor
+    :return: (int or None) Row of the point to evaluate at the next level
+    """
+    for level in range(levels - 2, -1, -1):
+        rows = np.flatnonzero(local_H['returned'] & (local_H['fidelity'] == level))
+        ntop = rows.size // reduction_factor
+        if ntop == 0:
+            continue
+        f = np.where(np.isnan(local_H['f'][rows]), np.inf, local_H['f'][rows])
+        top = rows[np.argsort(f, kind='stable')[:ntop]]
+        candidates = top[~local_H['promoted'][top]]
+        if candidates.size:
+            return candidates[0]
+
+    return None
+
+
+def sample_new_point(local_H, user_specs, rand_stream):
+    """
+    Draw a point to start at the lowest fidelity.
+    :return: (array) 1 x n point on the unit cube
+    """
+    n = local_H['x_on_cube'].shape[1]
+    best = best_at_highest_fidelity(local_H)
+    if best is not None and rand_stream.uniform() < user_specs['local_fraction']:
+        x = local_H['x_on_cube'][best] + user_specs['local_scale'] * rand_stream.standard_normal(n)
+        return np.clip(x, 0., 1.)[np.newaxis, :]
+
+    return rand_stream.uniform(0, 1, (1, n))
+
+
+def best_at_highest_fidelity(local_H):
+    """
+    :return: (int or None) Row of the best returned point at the highest fidelity level with a returned point
+    """
+    returned = np.flatnonzero(local_H['returned'])
+    if returned.size == 0:
+        return None
+    rows = returned[local_H['fidelity'][returned] == np.max(local_H['fidelity'][returned])]
+    f = np.where(np.isnan(local_H['f'][rows]), np.inf, local_H['f'][rows])
+
+    return rows[np.argmin(f)]
+
+
+def initialize_local_H(H, n):
+    local_H_fields = [('f', float),
+                      ('x', float, n),
+                      ('x_on_cube', float, n),
+                      ('fidelity', int),
+                      ('local_pt', bool),
+                      ('sim_id', int),
+                      ('returned', bool),
+                      ('promoted', bool)
+                      ]
+    local_H = np.zeros(len(H), dtype=local_H_fields)
+
+    for field in H.dtype.names:
+        if field in local_H.dtype.names:
+            local_H[field][:len(H)] = H[field]
+
+    return local_H
+
+
+def add_points_to_local_H(local_H, x_on_cube, fidelity, user_specs):
+    add_to_local_H(local_H, x_on_cube, user_specs, local_flag=0, on_cube=True)
+    local_H['fidelity'][-len(x_on_cube):] = fidelity
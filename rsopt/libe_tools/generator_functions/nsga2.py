@@ -0,0 +1,355 @@
+"""
+Multi-objective optimization with NSGA-II run as a persistent generator.
+Selection follows K. Deb et al., "A fast and elitist multiobjective genetic algorithm: NSGA-II",
+IEEE Trans. Evol. Comput. 6, 182 (2002): non-dominated sorting with crowding distance, binary tournaments, simulated
+binary crossover and polynomial mutation on the unit cube.
+
+Evaluations are handled asynchronously (steady-state NSGA-II). Returned evaluations are merged into the population
+by (mu + lambda) selection as soon as they arrive and each one is replaced by a new offspring, so no worker waits on
+a full generation. Every returned evaluation is also offered to a `ParetoFront` archive that holds all non-dominated
+points found so far.
+"""
+import numpy as np
+
+from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
+from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.local_opt_generator import add_to_local_H, x_to_cube
+
+# eta_crossover and eta_mutation are the distribution indices of SBX and polynomial mutation
+# mutation_probability is per parameter. If None it is 1 / n.
+NSGA2_DEFAULTS = {'crossover_probability': 0.9,
+                  'eta_crossover': 15.,
+                  'eta_mutation': 20.,
+                  'mutation_probability': None}
+
+
+def default_popsize(n):
+    return max(20, 4 * n)
+
+
+def dominates(a, b):
+    """
+    :param a: (array) Objective values of one point
+    :param b: (array) Objective values of another point
+    :return: (bool) True if `a` is no worse than `b` in every objective and better in at least one
+    """
+    return bool(np.all(a <= b) and np.any(a < b))
+
+
+def non_dominated_sort(F):
+    """
+    Rank points by non-domination. Rank 0 is the non-dominated front, rank 1 is the front once rank 0 is removed...
+    :param F: (array) N x m objective values. NaN values are treated as infinitely bad.
+    :return: (array) Rank of each point
+    """
+    F = np.where(np.isnan(F), np.inf, F)
+    no_worse = np.all(F[:, np.newaxis, :] <= F[np.newaxis, :, :], axis=-1)
+    better = np.any(F[:, np.newaxis, :] < F[np.newaxis, :, :], axis=-1)
+    # dominated_by[i, j] is True if j dominates i
+    dominated_by = (no_worse & better).T
+    count = np.sum(dominated_by, axis=1)
+
+    ranks = np.full(len(F), -1)
+    rank = 0
+    current = np.flatnonzero(count == 0)
+    while current.size:
+        ranks[current] = rank
+        count -= np.sum(dominated_by[:, current], axis=1)
+        count[ranks >= 0] = -1
+        current = np.flatnonzero(count == 0)
+        rank += 1
+
+    return ranks
+
+
+def crowding_distance(F):
+    """
+    :param F: (array) N x m objective values of one front
+    :return: (array) Crowding distance of each point. Boundary points of every objective have infinite distance.
+    """
+    N, m = F.shape
+    distance = np.zeros(N)
+    if N <= 2:
+        return np.full(N, np.inf)
+    for k in range(m):
+        order = np.argsort(F[:, k])
+        span = F[order[-1], k] - F[order[0], k]
+        distance[order[[0, -1]]] = np.inf
+        if span > 0. and np.isfinite(span):
+            distance[order[1:-1]] += (F[order[2:], k] - F[order[:-2], k]) / span
+
+    return distance
+
+
+def select(F, size):
+    """
+    NSGA-II environmental selection. Whole fronts are kept in rank order and the last front that fits partially is
+    cut by crowding distance.
+    :param F: (array) N x m objective values
+    :param size: (int) Number of points to keep
+    :return: (tuple) Indices of the kept points, their ranks and crowding distances
+    """
+    ranks = non_dominated_sort(F)
+    F = np.where(np.isnan(F), np.inf, F)
+    crowding = np.zeros(len(F))
+    for rank in np.unique(ranks):
+        front = np.flatnonzero(ranks == rank)
+        crowding[front] = crowding_distance(F[front])
+    # Sort by rank, then by decreasing crowding distance
+    order = np.lexsort((-crowding, ranks))[:size]
+
+    return order, ranks[order], crowding[order]
+
+
+class ParetoFront:
+    """
+    Archive of the non-dominated points seen so far. Points are added one at a time.
+    For two objectives the front is kept sorted by the first objective, so the second objective is decreasing. A new
+    point is checked against its neighbour by binary search and the points it dominates are a contiguous run after it.
+    For more objectives the new point is compared against the whole front with array operations.
+    """
+
+    def __init__(self, nobjectives):
+        self.F = np.zeros((0, nobjectives))
+        self.ids = np.zeros(0, dtype=int)
+
+    def __len__(self):
+        return self.ids.size
+
+    def add(self, f, index):
+        """
+        :param f: (array) Objective values of the point
+        :param index: (int) Identifier of the point, usually the sim_id
+        :return: (bool) True if the point is on the front
+        """
+        f = np.asarray(f, dtype=float)
+        if not np.all(np.isfinite(f)):
+            return False
+        if f.size == 2:
+            return self._add_sorted(f, index)
+
+        # Equal points are only kept once
+        if np.any(np.all(self.F <= f, axis=1)):
+            return False
+        keep = ~np.all(f <= self.F, axis=1)
+        self.F = np.vstack([self.F[keep], f])
+        self.ids = np.append(self.ids[keep], index)
+
+        return True
+
+    def _add_sorted(self, f, index):
+        start = np.searchsorted(self.F[:, 0], f[0], side='left')
+        end = np.searchsorted(self.F[:, 0], f[0], side='right')
+        # The last point with a first objective no larger than f[0] has the smallest second objective of those points
+        if end > 0 and self.F[end - 1, 1] <= f[1]:
+            return False
+        # Points from start on have a first objective no smaller than f[0]. Those with a second objective no smaller
+        #   than f[1] are dominated and come first since the second objective is decreasing.
+        stop = start + np.searchsorted(-self.F[start:, 1], -f[1], side='right')
+        self.F = np.concatenate([self.F[:start], f[np.newaxis, :], self.F[stop:]])
+        self.ids = np.concatenate([self.ids[:start], [index], self.ids[stop:]])
+
+        return True
+
+
+def pareto_front(H, objectives):
+    """
+    Non-dominated points of a history array.
+    :param H: (numpy structured array) libEnsemble history
+    :param objectives: (list) Names of the objective fields
+    :return: (numpy structured array) Rows of H on the front ordered by the first objective
+    """
+    front = ParetoFront(len(objectives))
+    returned = np.flatnonzero(H['returned'])
+    F = np.column_stack([H[name][returned] for name in objectives])
+    for row, f in zip(returned, F):
+        front.add(f, row)
+    rows = front.ids[np.lexsort(front.F.T[::-1])]
+
+    return H[rows]
+
+
+class NSGA2:
+    """
+    NSGA-II population on the unit cube with asynchronous ask/tell.
+    """
+
+    def __init__(self, n, popsize, rand_stream, crossover_probability=0.9, eta_crossover=15., eta_mutation=20.,
+                 mutation_probability=None):
+        """
+        :param n: (int) Number of parameters
+        :param popsize: (int) Number of points kept in the population
+        :param rand_stream: (numpy.random.RandomState) Random stream used for sampling
+        :param crossover_probability: (float) Probability that a pair of parents is recombined
+        :param eta_crossover: (float) Distribution index of simulated binary crossover
+        :param eta_mutation: (float) Distribution index of polynomial mutation
+        :param mutation_probability: (float) Probability that each parameter is mutated. If None it is 1 / n.
+        """
+        self.n = n
+        self.popsize = popsize
+        self.rand_stream = rand_stream
+        self.crossover_probability = crossover_probability
+        self.eta_crossover = eta_crossover
+        self.eta_mutation = eta_mutation
+        self.mutation_probability = mutation_probability or 1. / n
+
+        self.x = np.zeros((0, n))
+        self.F = None
+        self.ranks = np.zeros(0, dtype=int)
+        self.crowding = np.zeros(0)
+
+    @property
+    def full(self):
+        return len(self.x) >= self.popsize
+
+    def ask(self, k):
+        """
+        Create `k` offspring from the current population. Points are sampled uniformly until the population is full.
+        :param k: (int) Number of points
+        :return: (array) k x n points on the unit cube
+        """
+        if not self.full:
+            return self.rand_stream.uniform(0., 1., (k, self.n))
+
+        offspring = []
+        while len(offspring) < k:
+            parent_1, parent_2 = self.x[self._tournament()], self.x[self._tournament()]
+            if self.rand_stream.uniform() < self.crossover_probability:
+                parent_1, parent_2 = self._crossover(parent_1, parent_2)
+            offspring.extend([self._mutate(parent_1), self._mutate(parent_2)])
+
+        return np.array(offspring[:k])
+
+    def tell(self, x, F):
+        """
+        Merge evaluated points into the population.
+        :param x: (array) k x n evaluated points on the unit cube
+        :param F: (array) k x m objective values. NaN values are ranked last.
+        :return: None
+        """
+        x, F = np.atleast_2d(x), np.atleast_2d(F)
+        if self.F is None:
+            self.F = np.zeros((0, F.shape[1]))
+        x, F = np.vstack([self.x, x]), np.vstack([self.F, F])
+        keep, self.ranks, self.crowding = select(F, self.popsize)
+        self.x, self.F = x[keep], F[keep]
+
+    def _tournament(self):
+        # Binary tournament on rank with crowding distance breaking ties
+        i, j = self.rand_stream.randint(len(self.x), size=2)
+        if (self.ranks[i], -self.crowding[i]) <= (self.ranks[j], -self.crowding[j]):
+            return i
+        return j
+
+    def _crossover(self, parent_1, parent_2):
+        # Simulated binary crossover. Each parameter is recombined with probability 0.5.
+        u = self.rand_stream.uniform(size=self.n)
+        beta = np.where(u <= 0.5, (2. * u)**(1. / (self.eta_crossover + 1.)),
+                        (1. / (2. * (1. - u)))**(1. / (self.eta_crossover + 1.)))
+        beta = np.where(self.rand_stream.uniform(size=self.n) < 0.5, beta, 1.)
+        child_1 = 0.5 * ((1. + beta) * parent_1 + (1. - beta) * parent_2)
+        child_2 = 0.5 * ((1. - beta) * parent_1 + (1. + beta) * parent_2)
+
+        return np.clip(child_1, 0., 1.), np.clip(child_2, 0., 1.)
+
+    def _mutate(self, x):
+        # Polynomial mutation on the unit cube
+        mutate = self.rand_stream.uniform(size=self.n) < self.mutation_probability
+        u = self.rand_stream.uniform(size=self.n)
+        power = 1. / (self.eta_mutation + 1.)
+        delta = np.where(u < 0.5,
+                         (2. * u + (1. - 2. * u) * (1. - x)**(self.eta_mutation + 1.))**power - 1.,
+                         1. - (2. * (1. - u) + 2. * (u - 0.5) * x**(self.eta_mutation + 1.))**power)
+
+        return np.clip(np.where(mutate, x + delta, x), 0., 1.)
+
+
+def persistent_nsga2(H, persis_info, gen_specs, libE_info):
+    """
+    Persistent generator running asynchronous NSGA-II.
+
+    gen_specs['out'] should contain:
+
+    - ``'x' [n floats]``: Parameters being optimized over
+    - ``'x_on_cube' [n floats]``: Parameters scaled to the unit cube
+    - ``'sim_id' [int]``: Row number of entry in history
+    - ``'local_pt' [bool]``: Always False. Required by the persistent_aposmm_alloc allocation function.
+
+    gen_specs['user'] should supply the following:
+
+    lb: lower bound of the search domain
+    ub: upper bound of the search domain
+    objectives: Names of the objective fields returned by the simulation. All objectives are minimized.
+
+    optionally the user may supply:
+
+    xstart: A point included in the initial population
+    popsize: Number of points kept in the population and sent out in the first batch. Defaults to max(20, 4n).
+    crossover_probability, eta_crossover, eta_mutation, mutation_probability: See `NSGA2_DEFAULTS`
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+    """
+    user_specs = {**NSGA2_DEFAULTS, **gen_specs['user']}
+    n = len(user_specs['ub'])
+    objectives = user_specs['objectives']
+    comm = libE_info['comm']
+    rand_stream = persis_info['rand_stream']
+    out_fields = [i[0] for i in gen_specs['out']]
+
+    popsize = user_specs.get('popsize') or default_popsize(n)
+    variation = {key: user_specs[key] for key in NSGA2_DEFAULTS}
+    population = NSGA2(n, popsize, rand_stream, **variation)
+    front = ParetoFront(len(objectives))
+
+    local_H = initialize_local_H(H, n)
+    x_start = population.ask(popsize)
+    if user_specs.get('xstart') is not None:
+        x_start[0] = x_to_cube(user_specs['xstart'], user_specs)
+    add_to_local_H(local_H, x_start, user_specs, local_flag=0, on_cube=True)
+    send_mgr_worker_msg(comm, local_H[-popsize:][out_fields])
+
+    while True:
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            break
+
+        sim_ids = calc_in['sim_id']
+        F = np.column_stack([calc_in[name] for name in objectives])
+        # The manager may have projected the point onto the feasible region before it was simulated
+        local_H['x'][sim_ids] = calc_in['x']
+        local_H['x_on_cube'][sim_ids] = calc_in['x_on_cube']
+        local_H['f'][sim_ids] = calc_in['f']
+        local_H['returned'][sim_ids] = True
+
+        population.tell(local_H['x_on_cube'][sim_ids], F)
+        for sim_id, f in zip(sim_ids, F):
+            front.add(f, sim_id)
+
+        # Keep the number of points in evaluation constant
+        add_to_local_H(local_H, population.ask(sim_ids.size), user_specs, local_flag=0, on_cube=True)
+        send_mgr_worker_msg(comm, local_H[-sim_ids.size:][out_fields])
+
+    persis_info['pareto_front'] = front.ids
+
+    return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+
+def initialize_local_H(H, n):
+    local_H_fields = [('f', float),
+                      ('x', float, n),
+                      ('x_on_cube', float, n),
+                      ('local_pt', bool),
+                      ('sim_id', int),
+                      ('returned', bool)
+                      ]
+    local_H = np.zeros(len(H), dtype=local_H_fields)
+
+    for field in H.dtype.names:
+        if field in local_H.dtype.names:
+            local_H[field][:len(H)] = H[field]
+
+    return local_H
@@ -1,36 +1,33 @@
+"""
+Particle swarm optimization (PSO) run as a persistent generator.
+The swarm state is held as arrays and every update is applied to all particles in a batch at once. The first
+generation is sent as a single batch. After that the swarm is updated asynchronously: each time evaluations return
+only the particles that were evaluated are moved and sent back out, so slow evaluations never hold up the swarm.
+"""
 import numpy as np
-import logging
 
 from libensemble.message_numbers import STOP_TAG, PERSIS_STOP, FINISHED_PERSISTENT_GEN_TAG
-from libensemble.tools.gen_support import send_mgr_worker_msg
-from libensemble.tools.gen_support import get_mgr_worker_msg
-"""
-    def run_pso(self, function, searchspace, target, nparticles, maxiter, precision, domain, verbose=True):
-
-        Performs a PSO for the given function in the searchspace, looking for the target, which is in the output space.
-        
-        function - the function to be optimized. Its domain must include the seachspace and its output must be in the space of target.
-        searchspace - np.array((ssdim, 2)) 
-        target - np.array((tdim, ))
-        nparticles - number of particles to use in the optimization
-        maxiter - maximum number of iterations to the optimization routine
-        precision - how close to the target to attemp to get
-        domain - absolute boundaries on the trial solutions/particles
-"""
+from libensemble.tools.gen_support import send_mgr_worker_msg, get_mgr_worker_msg
+from rsopt.libe_tools.generator_functions.local_opt_generator import add_to_local_H, x_to_cube
+
+# Constriction coefficients from Clerc and Kennedy, IEEE Trans. Evol. Comput. 6, 58 (2002)
+# max_velocity is the maximum step per iteration in each dimension on the unit cube
+SWARM_DEFAULTS = {'inertia': 0.7298,
+                  'cognitive': 1.49618,
+                  'social': 1.49618,
+                  'max_velocity': 0.2}
 
 
 def persistant_pso(H, persis_info, gen_specs, libE_info):
     """
+    Persistent generator running a particle swarm optimization.
 
+    gen_specs['out'] should contain:
 
     - ``'x' [n floats]``: Parameters being optimized over
     - ``'x_on_cube' [n floats]``: Parameters scaled to the unit cube
-    - ``'f' [float]``: Objective function being minimized
-
-
-    - ``'num_active_runs' [int]``: Number of active local runs point is in
-
     - ``'sim_id' [int]``: Row number of entry in history
+    - ``'local_pt' [bool]``: Always False. Required by the persistent_aposmm_alloc allocation function.
 
     gen_specs['user'] should supply the following:
 
@@ -41,47 +38,150 @@ def persistant_pso(H, persis_info, gen_specs, libE_info):
     optionally the user may supply:
 
     initial_sample_points: A set of points to start the particles. initial_sample_points must be <= nparticles if given.
-
-    :param H:
-    :param persis_info:
-    :param gen_specs:
-    :param libE_info:
-    :return:
+    inertia, cognitive, social: Velocity update coefficients. See `SWARM_DEFAULTS`.
+    max_velocity: Maximum velocity of a particle in each dimension on the unit cube.
+
+    :param H: (numpy structured array) History rows given to the generator when it is started
+    :param persis_info: (dict) Must contain 'rand_stream'
+    :param gen_specs: (dict) libEnsemble generator specification
+    :param libE_info: (dict) libEnsemble information for the generator, must contain 'comm'
+    :return: local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
     """
 
-    user_specs = gen_specs['user']
+    user_specs = {**SWARM_DEFAULTS, **gen_specs['user']}
+    n = len(user_specs['ub'])
+    comm = libE_info['comm']
+    rand_stream = persis_info['rand_stream']
+    out_fields = [i[0] for i in gen_specs['out']]
 
-    try:
-        assert user_specs['initial_sample_points'].shape[0] <= user_specs['nparticles'], \
+    initial_sample_points = user_specs.get('initial_sample_points')
+    if initial_sample_points is not None:
+        assert initial_sample_points.shape[0] <= user_specs['nparticles'], \
             "initial_sample_points must be <= nparticles"
-    except KeyError:
-        user_specs['initial_sample_points'] = 0
 
-    if user_specs['initial_sample_points'] != 0:
-        # Send our initial sample. We don't need to check that n_s is large enough:
-        # the alloc_func only returns when the initial sample has function values.
-        persis_info = add_k_sample_points_to_local_H(user_specs['initial_sample_points'], user_specs,
-                                                     persis_info, n, local_H)
-        send_mgr_worker_msg(comm, local_H[-user_specs['initial_sample_size']:][[i[0] for i in gen_specs['out']]])
-        something_sent = True
-    else:
-        something_sent = False
+    local_H = initialize_local_H(H, n)
+    swarm = initialize_swarm(user_specs, n, rand_stream)
+
+    # The first generation goes out as one batch
+    particles = np.arange(user_specs['nparticles'])
+    add_particles_to_local_H(local_H, swarm, particles, user_specs)
+    send_mgr_worker_msg(comm, local_H[-particles.size:][out_fields])
+
+    while True:
+        tag, Work, calc_in = get_mgr_worker_msg(comm)
+        if tag in [STOP_TAG, PERSIS_STOP]:
+            break
+
+        sim_ids = calc_in['sim_id']
+        # The manager may have projected the point onto the feasible region before it was simulated
+        local_H['x'][sim_ids] = calc_in['x']
+        local_H['x_on_cube'][sim_ids] = calc_in['x_on_cube']
+        local_H['f'][sim_ids] = calc_in['f']
+        local_H['returned'][sim_ids] = True
+        particles = local_H['particle'][sim_ids]
+
+        update_best(swarm, particles, local_H['x_on_cube'][sim_ids], calc_in['f'])
+        move_particles(swarm, particles, user_specs, rand_stream)
+        add_particles_to_local_H(local_H, swarm, particles, user_specs)
+        send_mgr_worker_msg(comm, local_H[-particles.size:][out_fields])
+
+    persis_info['best_x_on_cube'] = swarm['global_x']
+    persis_info['best_f'] = swarm['global_f']
+
+    return local_H, persis_info, FINISHED_PERSISTENT_GEN_TAG
+
+
+def initialize_local_H(H, n):
+    local_H_fields = [('f', float),
+                      ('x', float, n),
+                      ('x_on_cube', float, n),
+                      ('local_pt', bool),
+                      ('sim_id', int),
+                      ('returned', bool),
+                      ('particle', int)
+                      ]
+    local_H = np.zeros(len(H), dtype=local_H_fields)
 
+    for field in H.dtype.names:
+        if field in local_H.dtype.names:
+            local_H[field][:len(H)] = H[field]
 
-def add_k_sample_points_to_local_H(k, user_specs, persis_info, n, local_H):
+    return local_H
+
+
+def initialize_swarm(user_specs, n, rand_stream):
+    """
+    Create the swarm state. Positions and velocities are on the unit cube.
+    :param user_specs: (dict) gen_specs['user'] with SWARM_DEFAULTS applied
+    :param n: (int) Problem dimension
+    :param rand_stream: (numpy.random.RandomState) Random stream from persis_info
+    :return: (dict) swarm state
+    """
+    nparticles = user_specs['nparticles']
+    v_max = user_specs['max_velocity']
+
+    x = rand_stream.uniform(0, 1, (nparticles, n))
+    if user_specs.get('initial_sample_points') is not None:
+        points = np.atleast_2d(user_specs['initial_sample_points'])
+        x[:points.shape[0]] = x_to_cube(points, user_specs)
+
+    swarm = {'x': x,
+             'v': rand_stream.uniform(-v_max, v_max, (nparticles, n)),
+             'best_x': x.copy(),
+             'best_f': np.full(nparticles, np.inf),
+             'global_x': x[0].copy(),
+             'global_f': np.inf}
+
+    return swarm
+
+
+def update_best(swarm, particles, x_on_cube, f):
+    """
+    Update personal and global best positions for a batch of evaluated particles.
+    :param swarm: (dict) swarm state
+    :param particles: (array of ints) Particle index for each evaluation
+    :param x_on_cube: (array) Evaluated positions on the unit cube
+    :param f: (array) Objective values. NaN is treated as no improvement.
+    :return: None
+    """
+    f = np.where(np.isnan(f), np.inf, f)
+    improved = f < swarm['best_f'][particles]
+    swarm['best_f'][particles[improved]] = f[improved]
+    swarm['best_x'][particles[improved]] = x_on_cube[improved]
+
+    best = np.argmin(f)
+    if f[best] < swarm['global_f']:
+        swarm['global_f'] = f[best]
+        swarm['global_x'] = x_on_cube[best].copy()
+
+
+def move_particles(swarm, particles, user_specs, rand_stream):
+    """
+    Apply the PSO velocity and position update to a batch of particles. Particles that would leave the unit cube are
+    stopped at the boundary and the velocity component normal to that boundary is set to zero.
+    :param swarm: (dict) swarm state
+    :param particles: (array of ints) Particles to move
+    :param user_specs: (dict) gen_specs['user'] with SWARM_DEFAULTS applied
+    :param rand_stream: (numpy.random.RandomState) Random stream from persis_info
+    :return: None
+    """
+    x, v = swarm['x'][particles], swarm['v'][particles]
+    r_cognitive = rand_stream.uniform(0, 1, x.shape)
+    r_social = rand_stream.uniform(0, 1, x.shape)
 
-    if 'sample_points' in user_specs:
-        v = np.sum(~local_H['local_pt'])  # Number of sample points so far
-        sampled_points = user_specs['sample_points'][v:v+k]
-        on_cube = False  # Assume points are on original domain, not unit cube
-        if len(sampled_points):
-            add_to_local_H(local_H, sampled_points, user_specs, on_cube=on_cube)
-        k = k-len(sampled_points)
+    v = user_specs['inertia'] * v \
+        + user_specs['cognitive'] * r_cognitive * (swarm['best_x'][particles] - x) \
+        + user_specs['social'] * r_social * (swarm['global_x'] - x)
+    v = np.clip(v, -user_specs['max_velocity'], user_specs['max_velocity'])
 
-    if k > 0:
-        sampled_points = persis_info['rand_stream'].uniform(0, 1, (k, n))
-        add_to_local_H(local_H, sampled_points, user_specs, on_cube=True)
+    x = x + v
+    out_of_bounds = (x < 0.) | (x > 1.)
+    v[out_of_bounds] = 0.
 
-    return persis_info
+    swarm['x'][particles] = np.clip(x, 0., 1.)
+    swarm['v'][particles] = v
 
 
+def add_particles_to_local_H(local_H, swarm, particles, user_specs):
+    add_to_local_H(local_H, swarm['x'][particles], user_specs, local_flag=0, on_cube=True)
+    local_H['particle'][-particles.size:] = particles
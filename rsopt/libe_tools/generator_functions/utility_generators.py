@@ -13,7 +13,8 @@ def generate_mesh(H, persis_info, gen_specs, libE_info):
     if not exact_mesh:
         mesh_1d = []
         for dim in mesh_specs:
-            mesh_1d.append(np.linspace(*dim))
+            # Values of each parameter on the mesh
+            mesh_1d.append(np.asarray(dim))
         mesh = np.meshgrid(*mesh_1d)
         mesh = np.array([ar.flatten() for ar in mesh]).T
     else:
@@ -1,13 +1,47 @@
 import importlib
+import importlib.util
+import logging
 
 # FUTURE: This will probably be moved to interface specific modules if more than nlopt are supported
 #   and the method check and return abstracted
 
 
+# Least-squares methods take the objective as a vector of residuals, fvec. Values are the package each method needs.
+LEAST_SQUARES_METHODS = {'dfols': 'dfols',
+                         'pounders': 'petsc4py'}
+
+# Methods that take nonlinear inequality constraints. Other methods see the failure penalty at infeasible points.
+CONSTRAINED_METHODS = ('LN_COBYLA',)
+# libEnsemble's APOSMM optimizer names and the package each one needs
+_APOSMM_OPTIMIZER_PACKAGES = {'petsc': 'petsc4py',
+                              'nlopt': 'nlopt',
+                              'dfols': 'dfols',
+                              'scipy': 'scipy'}
+
+
 def get_local_optimizer_method(method, package_name):
+    if method in LEAST_SQUARES_METHODS:
+        assert importlib.util.find_spec(LEAST_SQUARES_METHODS[method]), \
+            f'{method} requires {LEAST_SQUARES_METHODS[method]} to be installed'
+        return method
     package = importlib.import_module(package_name)
 
     assert hasattr(package, method), f'{method} is not a valid optimization method in {package_name}'
 
     return method
 
+
+def set_aposmm_optimizers():
+    """
+    Restrict libEnsemble's APOSMM local optimizer support to the optimization packages that are installed. APOSMM
+    imports every package in rc.aposmm_optimizers when its support module is first loaded, so this must be called
+    before loading libensemble.gen_funcs.aposmm_localopt_support or libensemble.gen_funcs.persistent_aposmm.
+    :return: (list) Names of the available optimizers
+    """
+    import libensemble.gen_funcs
+    if libensemble.gen_funcs.rc.aposmm_optimizers is None:
+        available = [name for name, package in _APOSMM_OPTIMIZER_PACKAGES.items() if importlib.util.find_spec(package)]
+        logging.getLogger('libensemble').debug(f'Local optimization packages available to APOSMM: {available}')
+        libensemble.gen_funcs.rc.aposmm_optimizers = available
+
+    return libensemble.gen_funcs.rc.aposmm_optimizers
@@ -0,0 +1,119 @@
+"""
+Early termination of running simulations.
+
+A job may set `monitor` in its setup. While the job's task runs, a user function reads a partial result from the
+output files at a fixed interval and a second user function decides if the point is not worth finishing. If it is
+not, the task is killed so the cores can be used for the next point. Only jobs run through an executor can be
+monitored. Serial Python jobs run inside the worker and cannot be stopped.
+
+    setup:
+      monitor:
+        partial_result: [monitor.py, read_efficiency]   # called with the libEnsemble Task, returns a value or None
+        terminate: [monitor.py, efficiency_too_low]      # called with the partial result, returns True to kill the task
+        interval: 60                                     # seconds between checks
+        result: partial                                  # record the partial result or the failure penalty
+"""
+import os
+import time
+from pykern import pkrunpy
+
+# Field added to sim_specs['out'] when any job is monitored
+MONITOR_FIELDS = [('terminated', bool)]
+
+MONITOR_DEFAULTS = {'interval': 10.,
+                    'result': 'penalty'}
+MONITOR_RESULTS = ('penalty', 'partial')
+_MONITOR_FUNCTIONS = ('partial_result', 'terminate')
+
+
+def validate_monitor(monitor):
+    """
+    Check the `monitor` setup of a job.
+    :param monitor: (dict) Monitor setup
+    :return: (bool) True if the setup is valid
+    """
+    if not isinstance(monitor, dict):
+        return False
+    for key in _MONITOR_FUNCTIONS:
+        if not callable(monitor.get(key)) and len(monitor.get(key) or []) != 2:
+            return False
+
+    return monitor.get('result', MONITOR_DEFAULTS['result']) in MONITOR_RESULTS
+
+
+def resolve_monitor_paths(monitor):
+    """
+    Make module paths absolute. Monitor functions are loaded from the simulation directories.
+    :param monitor: (dict) Monitor setup
+    :return: (dict) Monitor setup with absolute module paths
+    """
+    monitor = monitor.copy()
+    for key in _MONITOR_FUNCTIONS:
+        if not callable(monitor[key]):
+            module_path, name = monitor[key]
+            monitor[key] = [os.path.abspath(module_path), name]
+
+    return monitor
+
+
+def _load_function(function):
+    # Functions may be given directly from the Python API or as [module_path, function_name] in a configuration file
+    if callable(function):
+        return function
+    module_path, name = function
+    module = pkrunpy.run_path_as_module(module_path)
+
+    return getattr(module, name)
+
+
+class Monitor:
+    """
+    Periodically checks the partial result of a running task.
+    """
+
+    def __init__(self, partial_result, terminate, interval=10., result='penalty'):
+        """
+        :param partial_result: (callable or list) Called with the running libEnsemble Task. Returns a partial result
+                                                  or None if there is nothing to check yet.
+        :param terminate: (callable or list) Called with the partial result. Returns True if the task should be killed.
+        :param interval: (float) Seconds between checks
+        :param result: (str) 'penalty' to record the failure penalty for killed tasks or 'partial' to record the last
+                             partial result
+        """
+        self.partial_result = _load_function(partial_result)
+        self.terminate = _load_function(terminate)
+        self.interval = interval
+        self.result = result
+        self.value = None
+        self._last_check = time.time()
+
+    @classmethod
+    def from_setup(cls, monitor):
+        return cls(**{**MONITOR_DEFAULTS, **monitor})
+
+    def check(self, task):
+        """
+        Check the task if the interval has passed since the last check.
+        :param task: (libensemble.executors.executor.Task) Running task
+        :return: (bool) True if the task should be killed
+        """
+        if time.time() - self._last_check < self.interval:
+            return False
+        self._last_check = time.time()
+
+        value = self.partial_result(task)
+        if value is None:
+            return False
+        self.value = value
+
+        return bool(self.terminate(value))
+
+    def get_result(self, penalty):
+        """
+        :param penalty: (float) Value recorded for failed simulations
+        :return: (float) Value to record for a killed task
+        """
+        if self.result == 'partial' and self.value is not None:
+            return self.value
+
+        return penalty
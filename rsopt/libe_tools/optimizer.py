@@ -1,12 +1,19 @@
 from libensemble.libE import libE
-from rsopt.libe_tools.generator_functions.local_opt_generator import persistent_local_opt
-from libensemble.alloc_funcs.persistent_aposmm_alloc import persistent_aposmm_alloc
+from rsopt.libe_tools.generator_functions.local_opt_generator import persistent_local_opt, \
+    persistent_multistart_local_opt
+from libensemble.alloc_funcs import defaults as alloc_defaults
 from libensemble.executors.mpi_executor import MPIExecutor
-from rsopt.libe_tools.executors import SerialExecutor, register_rsmpi_executor
+from rsopt.libe_tools.executors import SerialExecutor, register_rsmpi_executor, read_allocation, ResourceScheduler, \
+    LaunchLimiter
 from libensemble.tools import add_unique_random_streams
 from rsopt.optimizer import Optimizer, OPTIONS_ALLOWED
-from rsopt.libe_tools.interface import get_local_optimizer_method
-from rsopt.simulation import SimulationFunction
+from rsopt.libe_tools.interface import get_local_optimizer_method, LEAST_SQUARES_METHODS, CONSTRAINED_METHODS
+from rsopt.simulation import SimulationFunction, STATUS_FIELDS
+from rsopt.libe_tools.surrogate import prescreen_alloc, PRESCREEN_FIELDS
+from rsopt.libe_tools.monitor import MONITOR_FIELDS
+from rsopt.libe_tools.feasibility import feasibility_alloc, FEASIBILITY_FIELDS, DUPLICATE_FIELDS
+from rsopt.configuration.parameters import DISCRETE_TYPES
+from rsopt.libe_tools.tools import persistent_give_back_alloc
 
 
 # dimension for x needs to be set
@@ -24,6 +31,8 @@ LIBE_SPECS_ALLOWED = {'record_interval': 'save_every_k_sims',
 # These codes normally need separate working directories or input files will overwrite
 _USE_WORKER_DIRS_DEFAULT = ['elegant', 'opal', 'python']
 _LIBENSEMBLE_DIRECTORY = './ensemble'
+_SCHEDULER_LEDGER = 'rsopt_scheduler.json'
+_LAUNCH_LEDGER = 'rsopt_launches.json'
 
 def _configure_executor(job, name, executor):
     executor.register_calc(full_path=job.full_path, app_name=name, calc_type='sim')
@@ -50,12 +59,16 @@ class libEnsembleOptimizer(Optimizer):
     # Just sets up a local optimizer for now
     _NAME = 'libEnsemble'
     _SPECIFICATION_DICTS = ['gen_specs', 'libE_specs', 'sim_specs', 'alloc_specs']
+    # True if the generator takes x back from the evaluations it is given so projected points stay paired with f
+    _PROJECT_POINTS = False
 
     def __init__(self):
         super(libEnsembleOptimizer, self).__init__()
         self.options = []
         self.executor = None  # Set by method
-        self.nworkers = 2  # Always 2 for local optimizer (1 for sim worker and 1 for persis generator)
+        self.scheduler = None  # Set if options.scheduler describes an allocation
+        self.launcher = None  # Set if options.launch_limits is used
+        self.nworkers = 2  # Default for local optimizer (1 for sim worker and 1 for persis generator)
         self.working_directory = _LIBENSEMBLE_DIRECTORY
         for spec in self._SPECIFICATION_DICTS:
             self.__setattr__(spec, {})
@@ -127,6 +140,8 @@ class libEnsembleOptimizer(Optimizer):
 
         H, persis_info, flag = libE(self.sim_specs, self.gen_specs, self.exit_criteria, self.persis_info,
                                     self.alloc_specs, self.libE_specs)
+        if self.scheduler:
+            persis_info['node_utilization'] = self.scheduler.utilization()
 
         return H, persis_info, flag
 
@@ -140,24 +155,42 @@ class libEnsembleOptimizer(Optimizer):
                      'localopt_method': get_local_optimizer_method(self._config.method, 'nlopt'),
                      **self._config.options.software_options}
 
+        gen_f = persistent_local_opt
+        nstarts = getattr(self._config.options, 'nstarts', 1)
+        if nstarts > 1:
+            # Independent runs share the simulation workers. Results go back to the runs as soon as they return.
+            gen_f = persistent_multistart_local_opt
+            user_keys.update({'nstarts': nstarts, 'initial_sample_size': 0})
+
+        if self._config.constraints and self._config.method in CONSTRAINED_METHODS:
+            # Cheap constraints are evaluated by the method. Expensive constraint values are given back with f.
+            user_keys['constraints'] = self._config.get_constraints()
+
         for key, val in self._options.items():
             user_keys[key] = val
-        self.gen_specs.update({'gen_f': persistent_local_opt,
+        self.gen_specs.update({'gen_f': gen_f,
                      'in': [],
                      'out': gen_out,
                      'user': user_keys})
 
     def _configure_allocation(self):
         # local optimizer allocation
-        self.alloc_specs.update({'alloc_f': persistent_aposmm_alloc,
+        self.alloc_specs.update({'alloc_f': persistent_give_back_alloc,
                                  'out': [('given_back', bool)],
-                                 'user': {}})
+                                 'user': {'give_back': self._give_back_fields()}})
+
+    def _give_back_fields(self):
+        # Constraint values are given back to methods that handle constraints
+        constraints = self.gen_specs.get('user', {}).get('constraints')
+        return constraints.names if constraints else []
 
     def _configure_persistant_info(self):
         self.persis_info = add_unique_random_streams({}, self.nworkers + 1)
 
     def _configure_specs(self):
-        # Persistent generator + local optimization eval = 2 workers always
+        # Persistent generator + local optimization eval = 2 workers unless more are requested
+        #   extra workers evaluate finite-difference gradient points in parallel
+        self.nworkers = getattr(self._config.options, 'nworkers', self.nworkers)
         self.comms = 'local'
 
         for job in self._config.jobs:
@@ -172,10 +205,75 @@ class libEnsembleOptimizer(Optimizer):
         self.libE_specs.update({'nworkers': self.nworkers, 'comms': self.comms, **self.libE_specs})
 
     def _configure_sim(self):
-        sim_function = SimulationFunction(self._config.jobs, self._config.options.get_objective_function())
+        constraints = self._config.get_constraints()
+        sim_function = SimulationFunction(self._config.jobs, self._config.options.get_objective_function(),
+                                          timeout=self._config.options.timeout or None, scheduler=self.scheduler,
+                                          launcher=self.launcher, constraints=constraints,
+                                          penalize_constraints=not self.gen_specs.get('user', {}).get('constraints'))
         self.sim_specs.update({'sim_f': sim_function,
                                'in': ['x'],
-                               'out': [('f', float), ]})
+                               'out': [('f', float), ] + STATUS_FIELDS})
+        # Every result read from output files is recorded. A result named f is the objective.
+        results = [name for job in self._config.jobs for name in job.results if name != 'f']
+        self.sim_specs['out'] = self.sim_specs['out'] + [(name, float) for name in results]
+        if self._config.method in LEAST_SQUARES_METHODS:
+            # The generator and the local optimizer receive the residual vector
+            components = self._get_components()
+            self.sim_specs['out'] = self.sim_specs['out'] + [('fvec', float, components)]
+            self.gen_specs['user']['components'] = components
+        if constraints:
+            # Every constraint value is recorded. Points rejected before simulation are marked.
+            self.sim_specs['out'] = self.sim_specs['out'] + [(name, float) for name in constraints.names] + \
+                FEASIBILITY_FIELDS
+        if any(job.setup.get('monitor') for job in self._config.jobs):
+            # Records which points were stopped early by a monitor
+            self.sim_specs['out'] = self.sim_specs['out'] + MONITOR_FIELDS
+
+    def _get_components(self):
+        components = getattr(self._config.options, 'components', 0)
+        if not components:
+            # Each result with a target is one residual
+            components = sum('target' in result for job in self._config.jobs for result in job.results.values())
+        assert components, f"{self._config.method} needs options.components or results with a target to set the " \
+                           f"number of residuals"
+
+        return components
+
+    def _configure_prescreen(self):
+        # Wrap whichever allocation function the optimizer uses so a surrogate model can reject points
+        if not self._config.options.prescreen:
+            return
+        alloc_specs = self.alloc_specs or alloc_defaults.alloc_specs
+        self.alloc_specs = {'alloc_f': prescreen_alloc,
+                            'out': alloc_specs['out'],
+                            'user': {**alloc_specs['user'],
+                                     'alloc_f': alloc_specs['alloc_f'],
+                                     'prescreen': {'lb': self.lb, 'ub': self.ub,
+                                                   **self._config.options.prescreen}}}
+        self.sim_specs['out'] = self.sim_specs['out'] + PRESCREEN_FIELDS
+
+    def _configure_parameter_types(self):
+        # Generators map the unit cube to integer, categorical and log parameters in add_to_local_H
+        if self.parameter_types:
+            self.gen_specs['user']['parameter_types'] = self.parameter_types
+
+    def _configure_feasibility(self):
+        # Wrap whichever allocation function the optimizer uses so infeasible and repeated points are never simulated
+        constraints = self._config.get_constraints()
+        discrete = any(t in DISCRETE_TYPES for t in self.parameter_types or [])
+        if not discrete and (not constraints or not constraints.cheap):
+            return
+        alloc_specs = self.alloc_specs or alloc_defaults.alloc_specs
+        self.alloc_specs = {'alloc_f': feasibility_alloc,
+                            'out': alloc_specs['out'],
+                            'user': {**alloc_specs['user'],
+                                     'alloc_f': alloc_specs['alloc_f'],
+                                     'constraints': constraints,
+                                     'parameter_types': self.parameter_types,
+                                     'project': self._PROJECT_POINTS,
+                                     'lb': self.lb, 'ub': self.ub}}
+        if discrete:
+            self.sim_specs['out'] = self.sim_specs['out'] + DUPLICATE_FIELDS
 
     def _configure_executor(self):
         app_names = _set_app_names(self._config)
@@ -195,15 +293,40 @@ class libEnsembleOptimizer(Optimizer):
                 job.executor = app_name
                 job.executor_args['app_name'] = app_name
 
+        if self._config.options.scheduler:
+            # Tasks from all workers share the allocation through the scheduler ledger
+            allocation = read_allocation(**self._config.options.scheduler)
+            self.scheduler = ResourceScheduler.create(_SCHEDULER_LEDGER, allocation)
+            for job in self._config.jobs:
+                if job.executor:
+                    self.scheduler.check(job.setup.get('cores', 1), job.setup.get('ranks_per_node'))
+
+        if self._config.options.launch_limits:
+            self.launcher = LaunchLimiter.create(_LAUNCH_LEDGER, **self._config.options.launch_limits)
+
+    def _configure_elastic(self):
+        # Start as many workers as the allocation could run tasks at once. Workers without work hold no cores, so the
+        #   number of running simulations follows the work the generator has outstanding.
+        if not self._config.options.elastic:
+            return
+        assert self._config.options.scheduler, "elastic requires options.scheduler to describe the allocation"
+        allocation = read_allocation(**self._config.options.scheduler)
+        smallest = min(job.setup.get('cores', 1) for job in self._config.jobs)
+        # One extra worker for the generator
+        self._config.options.nworkers = sum(allocation.values()) // smallest + 1
 
     def _configure_libE(self):
         self._set_dimension()
+        self._configure_elastic()
         self._configure_optimizer()
+        self._configure_parameter_types()
         self._configure_allocation()
         self._configure_specs()
         self._configure_persistant_info()
         self._configure_executor()
         self._configure_sim()
+        self._configure_prescreen()
+        self._configure_feasibility()
         self._cleanup()
 
         if self._config.options.exit_criteria:
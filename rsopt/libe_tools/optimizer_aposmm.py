@@ -1,6 +1,5 @@
 from rsopt.libe_tools import optimizer
-from rsopt.libe_tools.interface import get_local_optimizer_method
-from libensemble.gen_funcs.persistent_aposmm import aposmm
+from rsopt.libe_tools.interface import get_local_optimizer_method, set_aposmm_optimizers
 from libensemble.alloc_funcs.persistent_aposmm_alloc import persistent_aposmm_alloc
 
 # TODO: make set_optimizer a member of Optimizer and have a Setup like class selection scheme
@@ -25,6 +24,9 @@ class AposmmOptimizer(optimizer.libEnsembleOptimizer):
         # #   default left to APOSMM setting:
 
     def _configure_optimizer(self):
+        # APOSMM imports the local optimization packages it is configured for when loaded
+        set_aposmm_optimizers()
+        from libensemble.gen_funcs.persistent_aposmm import aposmm
         gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in aposmm_gen_out]
 
         user_keys = {'lb': self.lb,
@@ -41,6 +43,11 @@ class AposmmOptimizer(optimizer.libEnsembleOptimizer):
                      'user': user_keys})
 
 
+    def _configure_parameter_types(self):
+        # libEnsemble's aposmm samples uniformly between lb and ub. Integer and categorical entries are rounded by the
+        #   allocation function.
+        assert 'log' not in (self.parameter_types or []), "log parameters are not available for aposmm"
+
     def _configure_allocation(self):
         # local optimizer allocation
         self.alloc_specs.update({'alloc_f': persistent_aposmm_alloc,
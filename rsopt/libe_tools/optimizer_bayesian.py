@@ -0,0 +1,37 @@
+from rsopt.libe_tools import optimizer
+from rsopt.libe_tools.generator_functions.bayesian_optimization import persistent_bayesian_optimization
+
+# dimension for x and x_on_cube set at run time
+bayesian_gen_out = [('x', float, None), ('x_on_cube', float, None), ('sim_id', int),
+                    ('local_pt', bool)]
+
+
+class BayesianOptimizer(optimizer.libEnsembleOptimizer):
+    # Batch Bayesian optimization through a persistent generator
+    # Allocation is inherited from libEnsembleOptimizer: returned evaluations are given back to the generator
+    #   as soon as they are available and a new point is proposed for each one
+    _PROJECT_POINTS = True
+
+    def _configure_optimizer(self):
+        gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in bayesian_gen_out]
+
+        user_keys = {'lb': self.lb,
+                     'ub': self.ub,
+                     'xstart': self.start,
+                     # Keep every simulation worker busy
+                     'batch_size': max(self._config.options.nworkers - 1, 1),
+                     'initial_design_size': self._config.options.initial_design_size,
+                     # Do not hold back returned points until the initial design is complete
+                     'initial_sample_size': 0,
+                     **self._config.options.software_options}
+
+        for key, val in self._options.items():
+            user_keys[key] = val
+        self.gen_specs.update({'gen_f': persistent_bayesian_optimization,
+                               'in': [],
+                               'out': gen_out,
+                               'user': user_keys})
+
+    def _configure_specs(self):
+        self.nworkers = self._config.options.nworkers
+        super(BayesianOptimizer, self)._configure_specs()
@@ -0,0 +1,43 @@
+import numpy as np
+from rsopt.libe_tools import optimizer
+from rsopt.libe_tools.generator_functions.cma_es import persistent_cmaes, default_popsize
+
+# dimension for x and x_on_cube set at run time
+cmaes_gen_out = [('x', float, None), ('x_on_cube', float, None), ('sim_id', int),
+                 ('local_pt', bool)]
+
+
+class CmaesOptimizer(optimizer.libEnsembleOptimizer):
+    # IPOP-CMA-ES through a persistent generator
+    # Allocation is inherited from libEnsembleOptimizer: returned evaluations are given back to the generator
+    #   as soon as they are available and replaced with new samples so no worker waits on a full generation
+    _PROJECT_POINTS = True
+
+    def _configure_optimizer(self):
+        gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in cmaes_gen_out]
+
+        user_keys = {'lb': self.lb,
+                     'ub': self.ub,
+                     'xstart': self.start,
+                     'popsize': self._population_size(),
+                     # Do not hold back returned points until a full generation is complete
+                     'initial_sample_size': 0,
+                     **self._config.options.software_options}
+
+        for key, val in self._options.items():
+            user_keys[key] = val
+        self.gen_specs.update({'gen_f': persistent_cmaes,
+                               'in': [],
+                               'out': gen_out,
+                               'user': user_keys})
+
+    def _configure_specs(self):
+        self.nworkers = self._config.options.nworkers
+        super(CmaesOptimizer, self)._configure_specs()
+
+    def _population_size(self):
+        # Use at least the default population and round up to a multiple of the simulation workers
+        if self._config.options.popsize:
+            return self._config.options.popsize
+        sim_workers = max(self._config.options.nworkers - 1, 1)
+        return sim_workers * int(np.ceil(default_popsize(self.dimension) / sim_workers))
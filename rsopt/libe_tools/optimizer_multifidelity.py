@@ -0,0 +1,45 @@
+from rsopt.libe_tools import optimizer
+from rsopt.libe_tools.generator_functions.multi_fidelity import persistent_multifidelity
+
+# dimension for x and x_on_cube set at run time
+multifidelity_gen_out = [('x', float, None), ('x_on_cube', float, None), ('fidelity', int), ('sim_id', int),
+                         ('local_pt', bool)]
+
+
+class MultifidelityOptimizer(optimizer.libEnsembleOptimizer):
+    # Asynchronous successive halving over the fidelity levels declared by the jobs
+    # Allocation is inherited from libEnsembleOptimizer: returned evaluations are given back to the generator
+    #   as soon as they are available and each is replaced by a promotion or a new low fidelity point
+    _PROJECT_POINTS = True
+
+    def _configure_optimizer(self):
+        levels = self._config.get_fidelity_levels()
+        assert levels > 1, "Multi-fidelity optimization requires at least one job to declare fidelities"
+        gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in multifidelity_gen_out]
+
+        user_keys = {'lb': self.lb,
+                     'ub': self.ub,
+                     'xstart': self.start,
+                     'fidelity_levels': levels,
+                     # Keep every simulation worker busy
+                     'batch_size': max(self._config.options.nworkers - 1, 1),
+                     'reduction_factor': self._config.options.reduction_factor,
+                     # Do not hold back returned points
+                     'initial_sample_size': 0,
+                     **self._config.options.software_options}
+
+        for key, val in self._options.items():
+            user_keys[key] = val
+        self.gen_specs.update({'gen_f': persistent_multifidelity,
+                               'in': [],
+                               'out': gen_out,
+                               'user': user_keys})
+
+    def _configure_specs(self):
+        self.nworkers = self._config.options.nworkers
+        super(MultifidelityOptimizer, self)._configure_specs()
+
+    def _configure_sim(self):
+        super(MultifidelityOptimizer, self)._configure_sim()
+        # SimulationFunction applies the settings overrides for the fidelity of each point
+        self.sim_specs['in'] = ['x', 'fidelity']
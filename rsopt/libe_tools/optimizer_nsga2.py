@@ -0,0 +1,62 @@
+import numpy as np
+from rsopt.libe_tools import optimizer
+from rsopt.libe_tools.generator_functions.nsga2 import persistent_nsga2, default_popsize
+from rsopt.libe_tools.tools import persistent_give_back_alloc
+
+# dimension for x and x_on_cube set at run time
+nsga2_gen_out = [('x', float, None), ('x_on_cube', float, None), ('sim_id', int),
+                 ('local_pt', bool)]
+
+
+class Nsga2Optimizer(optimizer.libEnsembleOptimizer):
+    # Multi-objective optimization with asynchronous NSGA-II through a persistent generator
+    # Each objective is recorded as its own field in the history. f holds the first objective.
+    _PROJECT_POINTS = True
+
+    def _configure_optimizer(self):
+        gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in nsga2_gen_out]
+
+        user_keys = {'lb': self.lb,
+                     'ub': self.ub,
+                     'xstart': self.start,
+                     'objectives': self._config.options.objectives,
+                     'popsize': self._population_size(),
+                     # Do not hold back returned points until a full generation is complete
+                     'initial_sample_size': 0,
+                     **self._config.options.software_options}
+
+        for key, val in self._options.items():
+            user_keys[key] = val
+        self.gen_specs.update({'gen_f': persistent_nsga2,
+                               'in': [],
+                               'out': gen_out,
+                               'user': user_keys})
+
+    def _configure_allocation(self):
+        # The objective fields are given back to the generator with f
+        self.alloc_specs.update({'alloc_f': persistent_give_back_alloc,
+                                 'out': [('given_back', bool)],
+                                 'user': {'give_back': self._config.options.objectives}})
+
+    def _configure_specs(self):
+        self.nworkers = self._config.options.nworkers
+        super(Nsga2Optimizer, self)._configure_specs()
+
+    def _configure_sim(self):
+        super(Nsga2Optimizer, self)._configure_sim()
+        objectives = self._config.options.objectives
+        # Objectives read from results already have a field
+        fields = [name for name, *_ in self.sim_specs['out']]
+        self.sim_specs['out'] = self.sim_specs['out'] + [(name, float) for name in objectives if name not in fields]
+        # SimulationFunction sorts the values returned for each point into the objective fields
+        self.sim_specs['user'] = {'objectives': objectives}
+
+    def _configure_prescreen(self):
+        assert not self._config.options.prescreen, "prescreen uses a single objective and is not available for nsga2"
+
+    def _population_size(self):
+        # Round up to a multiple of the simulation workers
+        if self._config.options.popsize:
+            return self._config.options.popsize
+        sim_workers = max(self._config.options.nworkers - 1, 1)
+        return sim_workers * int(np.ceil(default_popsize(self.dimension) / sim_workers))
@@ -0,0 +1,36 @@
+from rsopt.libe_tools import optimizer
+from rsopt.libe_tools.generator_functions.particle_swarm import persistant_pso
+
+# dimension for x and x_on_cube set at run time
+pso_gen_out = [('x', float, None), ('x_on_cube', float, None), ('sim_id', int),
+               ('local_pt', bool)]
+
+
+class PsoOptimizer(optimizer.libEnsembleOptimizer):
+    # Particle swarm optimization through a persistent generator
+    # Allocation is inherited from libEnsembleOptimizer: returned evaluations are given back to the generator
+    #   as soon as they are available so the swarm never waits on the slowest worker
+    _PROJECT_POINTS = True
+
+    def _configure_optimizer(self):
+        gen_out = [optimizer.set_dtype_dimension(dtype, self.dimension) for dtype in pso_gen_out]
+
+        user_keys = {'lb': self.lb,
+                     'ub': self.ub,
+                     'nparticles': self._config.options.nparticles,
+                     # The first particle starts from the parameter start values
+                     'initial_sample_points': self.start.reshape(1, -1),
+                     # Do not hold back returned points until a full generation is complete
+                     'initial_sample_size': 0,
+                     **self._config.options.software_options}
+
+        for key, val in self._options.items():
+            user_keys[key] = val
+        self.gen_specs.update({'gen_f': persistant_pso,
+                               'in': [],
+                               'out': gen_out,
+                               'user': user_keys})
+
+    def _configure_specs(self):
+        self.nworkers = self._config.options.nworkers
+        super(PsoOptimizer, self)._configure_specs()
@@ -3,6 +3,7 @@ from rsopt.libe_tools.optimizer import libEnsembleOptimizer
 from rsopt.libe_tools.optimizer import set_dtype_dimension
 from rsopt.libe_tools import tools
 from rsopt.libe_tools.generator_functions import utility_generators
+from rsopt.configuration.parameters import DISCRETE_TYPES
 
 mesh_sampler_gen_out =[('x', float, None)]
 
@@ -10,6 +11,8 @@ mesh_sampler_gen_out =[('x', float, None)]
 # TODO: Haven't checked if multijob run will work correctly
 
 class GridSampler(libEnsembleOptimizer):
+    # Sampled points are not given back to a generator so they may be projected
+    _PROJECT_POINTS = True
 
     def __init__(self):
         super().__init__()
@@ -48,12 +51,27 @@ class GridSampler(libEnsembleOptimizer):
         # _configure_specs must have been already called
         self.persis_info = tools.create_empty_persis_info(self.libE_specs)
 
+    def _configure_parameter_types(self):
+        # Mesh values are set for each parameter type in _define_mesh_parameters
+        pass
+
     def _define_mesh_parameters(self):
         mesh_parameters = []
         size = 1
-        for lb, ub, s in zip(self.lb, self.ub, self._config.get_parameters_list('get_samples')):
-            mp = [lb, ub, s]
+        table = self._config.parameter_table()
+        for lb, ub, s, t in zip(table.lb, table.ub, table.samples, table.types):
+            mp = _mesh_values(lb, ub, s, t)
             mesh_parameters.append(mp)
-            size *= s
+            size *= len(mp)
 
         return mesh_parameters, size
+
+
+def _mesh_values(lb, ub, samples, parameter_type):
+    # Log parameters are sampled geometrically. Integer and categorical values are only kept once.
+    if parameter_type == 'log':
+        return np.geomspace(lb, ub, samples)
+    elif parameter_type in DISCRETE_TYPES:
+        return np.unique(np.round(np.linspace(lb, ub, samples)))
+
+    return np.linspace(lb, ub, samples)
@@ -0,0 +1,259 @@
+"""
+Surrogate model prescreening of points before they are simulated.
+
+The allocation function is wrapped so that the manager fits a Gaussian process to the evaluated history. Every time
+simulation work is handed out the point is scored with the model and the decision is passed to the worker through
+persis_info. `SimulationFunction` skips the simulation of rejected points and records the failure penalty as their
+f so generators never take a prediction for a simulated value. The model prediction is recorded in f_predicted next
+to the true value of every point. Rejected points are marked `prescreened` and are left out of the model and the
+reported minimum.
+"""
+import math
+import numpy as np
+from libensemble.message_numbers import EVAL_SIM_TAG
+from rsopt.simulation import _PENALTY
+
+# Fields added to sim_specs['out'] when prescreening is used
+PRESCREEN_FIELDS = [('f_predicted', float), ('f_std', float), ('prescreened', bool)]
+
+# min_points: Number of simulated points before any point is rejected
+# rule: 'lcb' accepts a point if the lower confidence bound, prediction - kappa * std, is below the threshold
+#       'probability' accepts a point if the probability that it falls below the threshold is at least min_probability
+# percentile: The threshold is this percentile of the simulated values
+PRESCREEN_DEFAULTS = {'min_points': 10,
+                      'rule': 'lcb',
+                      'kappa': 2.,
+                      'min_probability': 0.05,
+                      'percentile': 50.}
+PRESCREEN_RULES = ('lcb', 'probability')
+
+
+class GaussianProcess:
+    """
+    Gaussian process regression with a squared exponential kernel on the unit cube.
+    Points are added one at a time by extending the Cholesky factor. The length scale is refit by maximum
+    likelihood when the number of points has doubled since the last fit.
+    """
+    LENGTH_SCALES = np.logspace(-2, 0.5, 12)
+
+    def __init__(self, dimension, nugget=1e-6):
+        self.x = np.zeros((0, dimension))
+        self.f = np.zeros(0)
+        # Cholesky factor of the kernel matrix in the leading N x N block. Rows are reserved ahead so adding a
+        #   point does not copy the factor.
+        self._factor = np.zeros((0, 0))
+        self.nugget = nugget
+        self.length_scale = 0.2
+        self._fit_size = 0
+        # Forward solutions L^-1 f and L^-1 1, extended as points are added
+        self._zf = np.zeros(0)
+        self._z1 = np.zeros(0)
+        self._alpha = np.zeros(0)
+
+    @property
+    def L(self):
+        return self._factor[:self.f.size, :self.f.size]
+
+    def __len__(self):
+        return self.f.size
+
+    def kernel(self, a, b):
+        distance = np.sum((a[:, np.newaxis, :] - b[np.newaxis, :, :])**2, axis=-1)
+        return np.exp(-distance / (2. * self.length_scale**2))
+
+    def add(self, x, f, refit=True):
+        """
+        Add points to the model. Each point costs O(N^2) for N points in the model. The refit when the number of points
+        has doubled costs O(N^3), which is O(N^2) per point over the run.
+        :param x: (array) k x n points on the unit cube
+        :param f: (array) k values
+        :param refit: (bool) Refit the length scale if the number of points has doubled since the last fit
+        :return: None
+        """
+        for xi, fi in zip(np.atleast_2d(x), np.atleast_1d(f)):
+            k = self.kernel(self.x, xi[np.newaxis, :])[:, 0]
+            l = _forward(self.L, k)
+            d2 = 1. + self.nugget - l @ l
+            if d2 <= 0.:
+                # Lost to round off. Adding it would make the factor singular.
+                continue
+            size = self.f.size
+            if size == len(self._factor):
+                factor = np.zeros((max(2 * size, 16), max(2 * size, 16)))
+                factor[:size, :size] = self._factor
+                self._factor = factor
+            self._factor[size, :size] = l
+            self._factor[size, size] = np.sqrt(d2)
+            self.x = np.vstack([self.x, xi])
+            self.f = np.append(self.f, fi)
+            # The new row of the factor extends the forward solutions by one entry
+            self._zf = np.append(self._zf, (fi - l @ self._zf) / self._factor[size, size])
+            self._z1 = np.append(self._z1, (1. - l @ self._z1) / self._factor[size, size])
+
+        if refit and self.f.size >= max(2 * self._fit_size, 2):
+            self.fit()
+        else:
+            self._update_alpha()
+
+    def fit(self):
+        """
+        Choose the length scale with the largest marginal likelihood and rebuild the Cholesky factor.
+        :return: None
+        """
+        y = self._standardized_f()
+        best = -np.inf
+        length_scale_in_use = self.length_scale
+        for length_scale in self.LENGTH_SCALES:
+            self.length_scale = length_scale
+            try:
+                L = np.linalg.cholesky(self.kernel(self.x, self.x) + self.nugget * np.eye(self.f.size))
+            except np.linalg.LinAlgError:
+                continue
+            v = _forward(L, y)
+            likelihood = -0.5 * v @ v - np.sum(np.log(np.diag(L)))
+            if likelihood > best:
+                best, best_length_scale, best_L = likelihood, length_scale, L
+        self._fit_size = self.f.size
+        if best == -np.inf:
+            # No length scale gave a positive definite matrix. Keep the incrementally built factor.
+            self.length_scale = length_scale_in_use
+            self._update_alpha()
+            return
+        self.length_scale = best_length_scale
+        self._set_factor(best_L)
+
+    def _set_factor(self, L):
+        # Replace the Cholesky factor of the kernel matrix and the solutions that depend on it
+        self._factor = L
+        self._zf = _forward(L, self.f)
+        self._z1 = _forward(L, np.ones(self.f.size))
+        self._update_alpha()
+
+    def predict(self, x):
+        """
+        Predict values at points.
+        :param x: (array) k x n points on the unit cube
+        :return: (array, array) mean and standard deviation at each point
+        """
+        x = np.atleast_2d(x)
+        k = self.kernel(x, self.x)
+        mean = k @ self._alpha * self._f_scale() + np.mean(self.f)
+        v = _forward(self.L, k.T)
+        variance = np.maximum(1. + self.nugget - np.sum(v**2, axis=0), 0.)
+
+        return mean, np.sqrt(variance) * self._f_scale()
+
+    def _update_alpha(self):
+        # Weights of the standardized values. L^-1 f and L^-1 1 are kept so a change of mean and scale only needs
+        #   one back substitution.
+        if not self.f.size:
+            self._alpha = np.zeros(0)
+            return
+        self._alpha = _backward(self.L, (self._zf - np.mean(self.f) * self._z1) / self._f_scale())
+
+    def _f_scale(self):
+        scale = np.std(self.f)
+        return scale if scale > 0. else 1.
+
+    def _standardized_f(self):
+        return (self.f - np.mean(self.f)) / self._f_scale()
+
+
+def _forward(L, b):
+    # Solve L y = b for lower triangular L by forward substitution. O(N^2) for each column of b.
+    y = np.array(b, dtype=float)
+    for i in range(y.shape[0]):
+        y[i] = (y[i] - L[i, :i] @ y[:i]) / L[i, i]
+
+    return y
+
+
+def _backward(L, b):
+    # Solve L^T y = b for lower triangular L and a vector b by back substitution. O(N^2).
+    #   Each solved entry is removed from the ones above it so L is read by rows.
+    y = np.array(b, dtype=float)
+    for i in range(y.size - 1, -1, -1):
+        y[i] /= L[i, i]
+        y[:i] -= L[i, :i] * y[i]
+
+    return y
+
+
+def accept(f_predicted, f_std, threshold, prescreen):
+    """
+    Acceptance rule for a single point.
+    :param f_predicted: (float) Predicted value
+    :param f_std: (float) Standard deviation of the prediction
+    :param threshold: (float) Value a point should be able to reach to be simulated
+    :param prescreen: (dict) Prescreen options with PRESCREEN_DEFAULTS applied
+    :return: (bool) True if the point should be simulated
+    """
+    if prescreen['rule'] == 'lcb':
+        return f_predicted - prescreen['kappa'] * f_std <= threshold
+    if f_std == 0.:
+        return f_predicted <= threshold
+    probability = 0.5 * (1. + math.erf((threshold - f_predicted) / (f_std * math.sqrt(2.))))
+    return probability >= prescreen['min_probability']
+
+
+def prescreen_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+    """
+    Wraps the allocation function given in alloc_specs['user']['alloc_f']. Simulated points returned since the last
+    call are added to the surrogate and every point handed out for simulation gets a prescreen decision in
+    persis_info[worker]['prescreen'].
+
+    alloc_specs['user']['prescreen'] should contain lb and ub to scale 'x' to the unit cube and optionally any of
+    PRESCREEN_DEFAULTS.
+    """
+    prescreen = {**PRESCREEN_DEFAULTS, **alloc_specs['user']['prescreen']}
+    lb, ub = prescreen['lb'], prescreen['ub']
+
+    if 'surrogate' not in persis_info:
+        persis_info['surrogate'] = GaussianProcess(len(ub))
+        persis_info['surrogate_rows'] = np.zeros(0, dtype=bool)
+    surrogate = persis_info['surrogate']
+
+    # Rows already added to the surrogate
+    added = np.zeros(len(H), dtype=bool)
+    added[:persis_info['surrogate_rows'].size] = persis_info['surrogate_rows']
+    # Failed simulations are given a penalty value and would distort the model
+    simulated = H['returned'] & ~H['prescreened'] & np.isfinite(H['f']) & (H['f'] < _PENALTY)
+    new = np.flatnonzero(simulated & ~added)
+    if new.size:
+        surrogate.add((H['x'][new] - lb) / (ub - lb), H['f'][new])
+    persis_info['surrogate_rows'] = added | simulated
+
+    Work, persis_info, *flag = alloc_specs['user']['alloc_f'](W, H, sim_specs, gen_specs, alloc_specs, persis_info)
+
+    active = len(surrogate) >= prescreen['min_points'] and np.sum(simulated) >= prescreen['min_points']
+    workers = [i for i, work in Work.items() if work['tag'] == EVAL_SIM_TAG]
+    if not active:
+        for i in workers:
+            persis_info[i]['prescreen'] = None
+    elif workers:
+        # Every point handed out is scored with a single prediction
+        rows = [Work[i]['libE_info']['H_rows'][0] for i in workers]
+        f_predicted, f_std = surrogate.predict((H['x'][rows] - lb) / (ub - lb))
+        threshold = np.percentile(H['f'][simulated], prescreen['percentile'])
+        for i, mean, std in zip(workers, f_predicted, f_std):
+            persis_info[i]['prescreen'] = {'f_predicted': mean,
+                                           'f_std': std,
+                                           'accept': accept(mean, std, threshold, prescreen)}
+
+    return (Work, persis_info, *flag)
+
+
+def prescreen_summary(H):
+    """
+    Summarize prescreening results from a history array.
+    :param H: (numpy structured array) libEnsemble history with PRESCREEN_FIELDS
+    :return: (dict) number of simulated and rejected points and the RMS prediction error on simulated points
+    """
+    scored = H['returned'] & (H['f_std'] > 0.)
+    simulated = scored & ~H['prescreened']
+    error = H['f'][simulated] - H['f_predicted'][simulated]
+
+    return {'simulated': int(np.sum(H['returned'] & ~H['prescreened'])),
+            'rejected': int(np.sum(H['prescreened'])),
+            'rms_prediction_error': float(np.sqrt(np.mean(error**2))) if error.size else None}
+
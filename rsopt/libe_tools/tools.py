@@ -1,3 +1,8 @@
+import numpy as np
+from libensemble.message_numbers import WORKER_DONE
+from libensemble.alloc_funcs.persistent_aposmm_alloc import persistent_aposmm_alloc
+
+
 
 def create_empty_persis_info(libE_specs):
     """
@@ -8,4 +13,34 @@ def create_empty_persis_info(libE_specs):
     nworkers = libE_specs['nworkers']
     persis_info = {i: {'worker_num': i} for i in range(1, nworkers+1)}
 
-    return persis_info
\ No newline at end of file
+    return persis_info
+
+
+def suggest_timeout(H, percentile=99., factor=2.):
+    """
+    Suggest a simulation timeout from the runtimes of completed points.
+    :param H: (numpy structured array) libEnsemble history with 'runtime' and 'sim_status' fields
+    :param percentile: (float) Percentile of the completed runtimes
+    :param factor: (float) Multiplies the percentile
+    :return: (float or None) Suggested timeout in seconds. None if no point has completed.
+    """
+    completed = H['returned'] & (H['sim_status'] == WORKER_DONE)
+    if not np.any(completed):
+        return None
+
+    return factor * np.percentile(H['runtime'][completed], percentile)
+
+
+def persistent_give_back_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+    """
+    persistent_aposmm_alloc that also gives the fields named in alloc_specs['user']['give_back'] back to the
+    persistent generator.
+    """
+    first_call = persis_info.get('first_call', True)
+    Work, persis_info, *flag = persistent_aposmm_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info)
+    if first_call:
+        # Nothing has been given back on the first call
+        persis_info['fields_to_give_back'] += [name for name in alloc_specs['user'].get('give_back', [])
+                                               if name not in persis_info['fields_to_give_back']]
+
+    return (Work, persis_info, *flag)
@@ -2,7 +2,6 @@ from rsopt.configuration import Configuration, Job
 from rsopt.parse import read_configuration_file, parse_yaml_configuration
 from pykern.pkcollections import PKDict
 from os import path
-import numpy as np
 
 
 _NAME = None
@@ -30,7 +29,7 @@ class Optimizer:
         self.clean_working_directory = False
     @property
     def lb(self):
-        return self._config.get_parameters_list('get_lower_bound', formatter=np.array)
+        return self._config.parameter_table().lb
 
     @lb.setter
     def lb(self, value=None):
@@ -38,7 +37,7 @@ class Optimizer:
 
     @property
     def ub(self):
-        return self._config.get_parameters_list('get_upper_bound', formatter=np.array)
+        return self._config.parameter_table().ub
 
     @ub.setter
     def ub(self, value=None):
@@ -46,12 +45,16 @@ class Optimizer:
 
     @property
     def start(self):
-        return self._config.get_parameters_list('get_start', formatter=np.array)
+        return self._config.parameter_table().start
 
     @start.setter
     def start(self, value=None):
         pass
 
+    @property
+    def parameter_types(self):
+        return self._config.get_parameter_types()
+
     def load_configuration(self, config):
         """
         Load a configuration file to setup an optimization run.
@@ -84,6 +87,17 @@ class Optimizer:
         assert job < len(self._config.jobs), f"Job with index {job} cannot be found"
         self._config.jobs[job].settings = settings
 
+    def set_fidelities(self, fidelities, job=0):
+        assert job < len(self._config.jobs), f"Job with index {job} cannot be found"
+        self._config.jobs[job].fidelities = fidelities
+
+    def set_results(self, results, job=0):
+        assert job < len(self._config.jobs), f"Job with index {job} cannot be found"
+        self._config.jobs[job].results = results
+
+    def set_constraints(self, constraints):
+        self._config.constraints = constraints
+
     def set_exit_criteria(self, exit_criteria):
         # TODO: Will override in sublcasses probably
         self.exit_criteria = exit_criteria
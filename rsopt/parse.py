@@ -1,3 +1,7 @@
+import hashlib
+import os
+import pickle
+import time
 from pykern.pkyaml import load_file
 from rsopt.configuration import Configuration, Job, Options
 from rsopt.codes import _SUPPORTED_CODES
@@ -6,7 +10,14 @@ _CODE_FIELD = 'codes'  # TODO: Might be more consistent to change this this fiel
 _PARAMETERS_FIELD = 'parameters'
 _SETTINGS_FIELD = 'settings'
 _SETUP_FIELD = 'setup'
+_FIDELITIES_FIELD = 'fidelities'
+_RESULTS_FIELD = 'results'
 _OPTIONS_FIELD = 'options'
+_CONSTRAINTS_FIELD = 'constraints'
+# Compiled configurations are saved next to the configuration file as .<file name>.compiled
+_COMPILED_SUFFIX = '.compiled'
+# Increment when the layout of Configuration or the compiled file changes so old compiled files are not loaded
+_COMPILED_FORMAT = 2
 
 
 def _DEFAULT_SETUP(code_name):
@@ -37,6 +48,8 @@ def _read_codes_to_jobs(template: dict):
         new_job = Job(code_name)
         new_job.parameters = code_dict.get(_PARAMETERS_FIELD) or {}
         new_job.settings = code_dict.get(_SETTINGS_FIELD) or {}
+        new_job.fidelities = code_dict.get(_FIDELITIES_FIELD) or []
+        new_job.results = code_dict.get(_RESULTS_FIELD) or {}
         new_job.setup = code_dict.get(_SETUP_FIELD) or _DEFAULT_SETUP(code_name)
 
         job_list.append(new_job)
@@ -75,5 +88,120 @@ def parse_yaml_configuration(template: dict, configuration=None) -> Configuratio
 
     options = _read_options(template)
     configuration.options = options
+    configuration.constraints = template.get(_CONSTRAINTS_FIELD) or {}
 
     return configuration
+
+
+def compiled_path(filename):
+    """
+    :param filename: (str) Path to configuration file
+    :return: (str) Path to the compiled configuration saved next to the configuration file
+    """
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, '.' + name + _COMPILED_SUFFIX)
+
+
+def load_configuration(filename, recompile=False):
+    """
+    Load a configuration file into a Configuration object.
+    The parsed Configuration is saved next to the configuration file together with hashes of the file and every file
+    it names. It is loaded instead of parsing the configuration file again while none of these files has changed and
+    rsopt is run from the same directory.
+    :param filename: (str) Path to configuration file
+    :param recompile: (bool) Parse the configuration file even if the compiled configuration is current
+    :return: (Configuration)
+    """
+    path = compiled_path(filename)
+    if not recompile:
+        start = time.time()
+        compiled = _read_compiled(path)
+        if compiled is not None and _is_current(compiled):
+            configuration = compiled['configuration']
+            configuration.write_support_files()
+            saved = compiled['compile_time'] - (time.time() - start)
+            print(f"Loaded compiled configuration {path} (saved {saved:.2f} s)")
+            return configuration
+
+    start = time.time()
+    template = read_configuration_file(filename)
+    # Parsing removes entries from the template so referenced files are found first
+    files = [os.path.abspath(filename)] + _referenced_files(template)
+    configuration = parse_yaml_configuration(template)
+    _write_compiled(path, configuration, files, time.time() - start)
+
+    return configuration
+
+
+def _file_hash(filename):
+    with open(filename, 'rb') as ff:
+        return hashlib.sha256(ff.read()).hexdigest()
+
+
+def _referenced_files(value):
+    # Absolute paths of every string in the configuration that names an existing file
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        files = []
+        for v in value:
+            files.extend(f for f in _referenced_files(v) if f not in files)
+        return files
+    if isinstance(value, str) and os.path.isfile(value):
+        return [os.path.abspath(value)]
+
+    return []
+
+
+def _rsopt_version():
+    from importlib import metadata
+    try:
+        return metadata.version('rsopt')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _read_compiled(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as ff:
+            return pickle.load(ff)
+    except Exception:
+        # Compiled files written by other versions of rsopt may not unpickle. The configuration is parsed again.
+        return None
+
+
+def _is_current(compiled):
+    if compiled.get('format') != _COMPILED_FORMAT or compiled.get('version') != _rsopt_version():
+        return False
+    # Relative paths in the configuration are resolved from the run directory
+    if compiled.get('cwd') != os.getcwd():
+        return False
+    for filename, file_hash in compiled['hashes'].items():
+        if not os.path.isfile(filename) or _file_hash(filename) != file_hash:
+            return False
+
+    return True
+
+
+def _write_compiled(path, configuration, files, compile_time):
+    compiled = {'format': _COMPILED_FORMAT,
+                'version': _rsopt_version(),
+                'cwd': os.getcwd(),
+                'hashes': {f: _file_hash(f) for f in files},
+                'compile_time': compile_time,
+                'configuration': configuration}
+    try:
+        data = pickle.dumps(compiled)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        print(f"Configuration could not be compiled and will be parsed on every run: {e}")
+        return
+    try:
+        # Write to a temporary file first so concurrent runs never read a partial file
+        temporary = path + f'.{os.getpid()}'
+        with open(temporary, 'wb') as ff:
+            ff.write(data)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Compiled configuration could not be written to {path}: {e}")
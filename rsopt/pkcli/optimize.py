@@ -2,12 +2,17 @@ import rsopt.parse as parse
 import numpy as np
 import os
 from rsopt import run
-from libensemble.tools import save_libE_output
 
 
-def configuration(config):
-    config_yaml = parse.read_configuration_file(config)
-    _config = parse.parse_yaml_configuration(config_yaml)
+def configuration(config, recompile=False):
+    # libEnsemble and the optimizers are only loaded once a run is requested
+    from libensemble.tools import save_libE_output
+    from rsopt.libe_tools.surrogate import prescreen_summary
+    from rsopt.libe_tools.tools import suggest_timeout
+    from rsopt.libe_tools.generator_functions.nsga2 import pareto_front
+
+    # The compiled configuration is used while the configuration file and the files it names are unchanged
+    _config = parse.load_configuration(config, recompile=recompile)
 
     software = _config.options.NAME
     try:
@@ -26,17 +31,61 @@ def configuration(config):
     if software in _final_result:
         _final_result[software](H)
 
+    if getattr(_config.options, 'objectives', None):
+        # Non-dominated rows of the history are saved next to it
+        front = pareto_front(H, _config.options.objectives)
+        np.save("pareto_" + filename + ".npy", front)
+        _final_pareto_result(front, _config.options.objectives)
+
+    if 'prescreened' in H.dtype.names:
+        print("Prescreening:", prescreen_summary(H))
+
+    if 'node_utilization' in persis_info:
+        print("Node utilization:")
+        for node, utilization in persis_info['node_utilization'].items():
+            print(f"    {node}: {utilization:.1%}")
+
+    if 'runtime' in H.dtype.names and suggest_timeout(H):
+        print("Suggested timeout (seconds):", suggest_timeout(H))
+
+
+def _evaluated(H):
+    # Rows that were simulated. Generated rows that never returned, prescreened and rejected rows have no real f.
+    H = H[H['returned']]
+    for name in ('prescreened', 'rejected'):
+        if name in H.dtype.names:
+            H = H[~H[name]]
+
+    return H
+
 
 def _final_local_result(H):
-    best, index = np.nanmin(H['f']), np.argmin(H['f'])
-    print("Minimum result:", H['x'][index], best)
+    H = _evaluated(H)
+    if np.all(np.isnan(H['f'])):
+        print("Minimum result: no points were evaluated")
+        return
+    index = np.nanargmin(H['f'])
+    print("Minimum result:", H['x'][index], H['f'][index])
 
 def _final_global_result(H):
     print("Local Minima Found: ('x', 'f')")
     for lm in H[H['local_min']]:
         print(lm['x'], lm['f'])
 
+def _final_multifidelity_result(H):
+    # Only results from the full simulation are reported. Rows that did not return are skipped by _final_local_result.
+    _final_local_result(H[H['fidelity'] == np.max(H['fidelity'])])
+
+def _final_pareto_result(front, objectives):
+    print(f"Pareto front: {len(front)} points ('x', {', '.join(objectives)})")
+    for row in front:
+        print(row['x'], *[row[name] for name in objectives])
+
 _final_result = {
     'nlopt': _final_local_result,
-    'aposmm': _final_global_result
+    'aposmm': _final_global_result,
+    'pso': _final_local_result,
+    'cmaes': _final_local_result,
+    'bayesian': _final_local_result,
+    'multifidelity': _final_multifidelity_result
 }
\ No newline at end of file
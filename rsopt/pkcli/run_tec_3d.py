@@ -1,6 +1,4 @@
 import sys, os
-from rswarp.run_files.tec.gridded_tec_3d import main
-from rswarp.run_files.tec.tec_utilities import read_parameter_file
 
 
 def simulate_efficiency(attribute_file, run_id=None):
@@ -18,6 +16,10 @@ def simulate_efficiency(attribute_file, run_id=None):
     phi_cw: Resistivity of collector side wiring in ohm*cm
     run_id: Run id will be added to diagnostic folder name. Mainly used for parallel optimization.
     """
+    # Warp is only loaded when a simulation is run
+    from rswarp.run_files.tec.gridded_tec_3d import main
+    from rswarp.run_files.tec.tec_utilities import read_parameter_file
+
     print("trying to open file", attribute_file)
     print("I am in", os.getcwd())
     run_attributes = read_parameter_file(attribute_file)
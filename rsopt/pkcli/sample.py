@@ -2,11 +2,12 @@ import rsopt.parse as parse
 import numpy as np
 import os
 from rsopt.run import grid_sampler
-from libensemble.tools import save_libE_output
 
-def configuration(config):
-    config_yaml = parse.read_configuration_file(config)
-    _config = parse.parse_yaml_configuration(config_yaml)
+def configuration(config, recompile=False):
+    from libensemble.tools import save_libE_output
+
+    # The compiled configuration is used while the configuration file and the files it names are unchanged
+    _config = parse.load_configuration(config, recompile=recompile)
 
     # TODO: This is hard coded to serial for testing right now
     runner = grid_sampler(_config)
@@ -2,32 +2,73 @@
 # This is just a temporary setup. libEnsembleOptimizer shouldn't actually be tied to execution mode
 # It is instantiated because nlopt was requested
 # THe executor will be setup separately based off 'execution_type' in YAML and registered with libEnsembleOptimizer
-from rsopt.libe_tools.optimizer import libEnsembleOptimizer
-from rsopt.libe_tools.sampler import GridSampler
-from rsopt.libe_tools.optimizer_aposmm import AposmmOptimizer
+# Optimizers are imported when a run is set up so only the requested software and its generator are loaded
 
 
 def local_optimizer(config):
+    from rsopt.libe_tools.optimizer import libEnsembleOptimizer
     opt = libEnsembleOptimizer()
     opt.load_configuration(config)
 
     return opt  #.run()
 
 def grid_sampler(config):
+    from rsopt.libe_tools.sampler import GridSampler
     sample = GridSampler()
     sample.load_configuration(config)
 
     return sample
 
 def aposmm_optimizer(config):
+    from rsopt.libe_tools.optimizer_aposmm import AposmmOptimizer
     opt = AposmmOptimizer()
     opt.load_configuration(config)
 
     return opt  #.run()
 
+def pso_optimizer(config):
+    from rsopt.libe_tools.optimizer_pso import PsoOptimizer
+    opt = PsoOptimizer()
+    opt.load_configuration(config)
+
+    return opt
+
+def cmaes_optimizer(config):
+    from rsopt.libe_tools.optimizer_cmaes import CmaesOptimizer
+    opt = CmaesOptimizer()
+    opt.load_configuration(config)
+
+    return opt
+
+def bayesian_optimizer(config):
+    from rsopt.libe_tools.optimizer_bayesian import BayesianOptimizer
+    opt = BayesianOptimizer()
+    opt.load_configuration(config)
+
+    return opt
+
+def multifidelity_optimizer(config):
+    from rsopt.libe_tools.optimizer_multifidelity import MultifidelityOptimizer
+    opt = MultifidelityOptimizer()
+    opt.load_configuration(config)
+
+    return opt
+
+def nsga2_optimizer(config):
+    from rsopt.libe_tools.optimizer_nsga2 import Nsga2Optimizer
+    opt = Nsga2Optimizer()
+    opt.load_configuration(config)
+
+    return opt
+
 # These names have to line up with accepted values for setup.execution_type
 # Another place where shared names are imported from common source
 run_modes = {
     'nlopt': local_optimizer,
-    'aposmm': aposmm_optimizer
+    'aposmm': aposmm_optimizer,
+    'pso': pso_optimizer,
+    'cmaes': cmaes_optimizer,
+    'bayesian': bayesian_optimizer,
+    'multifidelity': multifidelity_optimizer,
+    'nsga2': nsga2_optimizer
 }
\ No newline at end of file
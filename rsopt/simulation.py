@@ -2,14 +2,18 @@ import logging
 import time
 import numpy as np
 import rsopt.conversion
-from libensemble.message_numbers import WORKER_DONE, WORKER_KILL, TASK_FAILED
+from rsopt.extraction import extract_results, results_objective, results_residuals
+from rsopt.configuration.parameters import parameter_value
+from libensemble.message_numbers import WORKER_DONE, WORKER_KILL, TASK_FAILED, WORKER_KILL_ON_TIMEOUT
 from libensemble.executors.executor import Executor
-from collections import Iterable
+from collections.abc import Iterable
 
 # TODO: This should probably be in libe_tools right?
 
 _POLL_TIME = 1  # seconds
 _PENALTY = 1e9
+# Fields added to sim_specs['out'] by rsopt optimizers. sim_status holds the libEnsemble calc status of the point.
+STATUS_FIELDS = [('runtime', float), ('sim_status', int)]
 
 def get_x_from_H(H):
     # Assumes vector data
@@ -33,7 +37,8 @@ def _parse_x(x, parameters):
     if not isinstance(x, Iterable):
         x = [x, ]
     for val, name in zip(x, parameters.keys()):
-        x_struct[name] = val
+        # Integer and categorical parameters are passed to jobs as their values
+        x_struct[name] = parameter_value(parameters[name], val)
 
     return x_struct
 
@@ -48,12 +53,44 @@ def compose_args(x, parameters, settings):
 
     return args, kwargs
 
+def format_residuals(output, fvec):
+    # Least-squares methods need the vector of residuals. f is the sum of squares.
+    fvec = np.asarray(fvec, dtype=float)
+    components = output['fvec'].shape[1]
+    if fvec.ndim == 0:
+        # Penalties and predictions are spread over the components so the sum of squares is the value
+        fvec = np.full(components, np.sqrt(max(fvec, 0.) / components))
+    assert fvec.size == components, f"Objective returned {fvec.size} residuals but {components} components are set"
+    output['fvec'] = fvec
+    output['f'] = np.sum(fvec**2)
+
+    return output
+
+def format_objectives(output, values, objectives):
+    # Multi-objective optimizers record each objective in its own field. f is the first objective.
+    if isinstance(values, dict):
+        values = [values[name] for name in objectives]
+    elif not hasattr(values, '__iter__'):
+        # Penalties apply to every objective
+        values = [values] * len(objectives)
+    values = list(values)
+    assert len(values) == len(objectives), f"Objective returned {len(values)} values for objectives {objectives}"
+    for name, value in zip(objectives, values):
+        output[name] = value
+    output['f'] = values[0]
+
+    return output
+
 def format_evaluation(sim_specs, container):
-    if not hasattr(container, '__iter__'):
-        container = (container,)
     # FUTURE: Type check for container values against spec
     outspecs = sim_specs['out']
     output = np.zeros(1, dtype=outspecs)
+    if sim_specs.get('user', {}).get('objectives'):
+        return format_objectives(output, container, sim_specs['user']['objectives'])
+    if 'fvec' in output.dtype.names:
+        return format_residuals(output, container)
+    if not hasattr(container, '__iter__'):
+        container = (container,)
     for spec, value in zip(output.dtype.names, container):
         output[spec] = value
 
@@ -61,7 +98,8 @@ def format_evaluation(sim_specs, container):
 
 class SimulationFunction:
 
-    def __init__(self, jobs: list, objective_function: callable):
+    def __init__(self, jobs: list, objective_function: callable, timeout: float = None,
+                 scheduler=None, launcher=None, constraints=None, penalize_constraints=False):
         # Received from libEnsemble during function evaluation
         self.H = None
         self.J = {}
@@ -71,6 +109,16 @@ class SimulationFunction:
         self.log = logging.getLogger('libensemble')
         self.jobs = jobs
         self.objective_function = objective_function
+        # Time limit in seconds for executor jobs that do not set `timeout` in their setup
+        self.timeout = timeout
+        # rsopt.libe_tools.executors.ResourceScheduler shared by all workers. Places executor tasks if set.
+        self.scheduler = scheduler
+        # rsopt.libe_tools.executors.LaunchLimiter shared by all workers. Throttles executor task launches if set.
+        self.launcher = launcher
+        # rsopt.constraints.Constraints. Constraint values are recorded for every point if set.
+        self.constraints = constraints
+        # Record the failure penalty for points that violate a constraint. Used if the method cannot handle constraints.
+        self.penalize_constraints = penalize_constraints
         self.switchyard = None
 
 
@@ -79,11 +127,29 @@ class SimulationFunction:
         self.persis_info = persis_info
         self.sim_specs = sim_specs
         self.libE_info = libE_info
+        # Results of the previous point must not be recorded for this one
+        self.J['results'] = {}
 
         x = get_x_from_H(H)
+        # Set by multi-fidelity generators. Jobs apply the settings overrides declared for the level.
+        fidelity = H['fidelity'][0] if 'fidelity' in H.dtype.names else None
 
+        # Set by the prescreen allocation function if a surrogate model is used
+        prescreen = persis_info.get('prescreen')
+        if prescreen and not prescreen['accept']:
+            # Rejected points are not simulated. Generators read f as a real evaluation, so f is the failure penalty,
+            # as for points rejected by constraints. The prediction is only recorded in f_predicted.
+            output = format_evaluation(self.sim_specs, _PENALTY)
+            output['f_predicted'], output['f_std'] = prescreen['f_predicted'], prescreen['f_std']
+            output['prescreened'] = True
+            if 'sim_status' in output.dtype.names:
+                output['sim_status'] = WORKER_DONE
+            return output, persis_info, WORKER_DONE
+
+        start_time = time.time()
+        monitor = None
         for job in self.jobs:
-            _, kwargs = compose_args(x, job.parameters, job.settings)
+            _, kwargs = compose_args(x, job.parameters, job.fidelity_settings(fidelity))
             job._setup.generate_input_file(kwargs, '.')  # TODO: Worker needs to be in their own directory
 
             if self.switchyard and job.input_distribution:
@@ -92,22 +158,26 @@ class SimulationFunction:
             if job.executor:
                 # MPI Job or non-Python executable
                 exctr = Executor.executor
-                task = exctr.submit(**job.executor_args)
-                while True:
-                    time.sleep(_POLL_TIME)
-                    task.poll()
-                    if task.finished:
-                        if task.state == 'FINISHED':
-                            sim_status = WORKER_DONE
-                            f = None
-                            break
-                        elif task.state == 'FAILED':
-                            sim_status = TASK_FAILED
-                            break
-                        else:
-                            self.log.warning("Unknown task failure")
-                            sim_status = TASK_FAILED
-                            break
+                executor_args = job.executor_args
+                reserved = None
+                if self.scheduler:
+                    # Wait for free cores in the allocation and place the task on them
+                    reserved = self.scheduler.acquire(job.setup.get('cores', 1), job.setup.get('ranks_per_node'),
+                                                      job.setup.get('placement', 'pack'), job.setup.get('max_cores'))
+                    # MPI runner arguments set by the job are kept after the placement arguments
+                    executor_args = {**executor_args,
+                                     **reserved.executor_args(extra_args=executor_args.get('extra_args'))}
+                try:
+                    if self.launcher:
+                        task = self.launcher.launch(exctr.submit, **executor_args)
+                    else:
+                        task = exctr.submit(**executor_args)
+                    monitor = job.monitor
+                    sim_status = self._wait_on_task(task, job.setup.get('timeout') or self.timeout, monitor)
+                finally:
+                    if reserved:
+                        self.scheduler.release(reserved)
+                f = None
             else:
                 # Serial Python Job
                 f = job.execute(**kwargs)
@@ -115,18 +185,42 @@ class SimulationFunction:
                 # NOTE: Right now f is not passed to the objective function. Would need to go inside J. Or pass J into
                 #       function job.execute(**kwargs)
 
+            if sim_status != WORKER_DONE:
+                # Output of a killed or failed job is not passed on and later jobs in the chain are not run
+                break
+
+            if job.results:
+                # Values declared in the configuration are read from the job output files
+                try:
+                    self.J['results'].update(extract_results(job.results))
+                except (OSError, KeyError, IndexError, ValueError) as e:
+                    self.log.warning(f'Results of job {job.code} could not be read: {e}')
+                    sim_status = TASK_FAILED
+                    break
+
             if job.output_distribution:
                 self.switchyard = rsopt.conversion.create_switchyard(job.output_distribution, job.code)
                 self.J['switchyard'] = self.switchyard
 
 
-
+        results = {name: result for job in self.jobs for name, result in job.results.items()}
+        objectives = self.sim_specs.get('user', {}).get('objectives') or []
+        objective = None
+        if results and sim_status == WORKER_DONE:
+            if objectives and all(name in results for name in objectives):
+                objective = {name: self.J['results'][name] for name in objectives}
+            elif 'fvec' in [name for name, *_ in self.sim_specs['out']] and 'f' not in results:
+                objective = results_residuals(results, self.J['results'])
+            else:
+                objective = results_objective(results, self.J['results'])
         if sim_status == WORKER_DONE:
             # Use objective function is present
             if self.objective_function:
                 val = self.objective_function(self.J)
                 output = format_evaluation(self.sim_specs, val)
                 self.log.info('val: {}, output: {}'.format(val, output))
+            elif objective is not None:
+                output = format_evaluation(self.sim_specs, objective)
             else:
                 # If only serial python was run then then objective_function doesn't need to be defined
                 try:
@@ -134,10 +228,52 @@ class SimulationFunction:
                 except NameError as e:
                     print(e)
                     print("An objective function must be defined if final Job is is not Python")
+        elif sim_status == WORKER_KILL:
+            output = format_evaluation(self.sim_specs, monitor.get_result(_PENALTY))
         else:
             # TODO: Temporary penalty. Need to add a way to adjust this.
             self.log.warning('Penalty was used because result could not be evaluated')
             output = format_evaluation(self.sim_specs, _PENALTY)
 
+        if self.constraints:
+            values = self.constraints.values(x, self.J['results'] if sim_status == WORKER_DONE else None)
+            if self.penalize_constraints and sim_status == WORKER_DONE and self.constraints.violated(values):
+                output = format_evaluation(self.sim_specs, _PENALTY)
+            for name, value in values.items():
+                output[name] = value
+
+        for name in results:
+            if name in output.dtype.names and name != 'f':
+                # Points that did not complete have no results
+                output[name] = self.J['results'].get(name, np.nan) if sim_status == WORKER_DONE else np.nan
+        if 'terminated' in output.dtype.names:
+            output['terminated'] = sim_status == WORKER_KILL
+        if 'sim_status' in output.dtype.names:
+            output['runtime'] = time.time() - start_time
+            output['sim_status'] = sim_status
+        if prescreen:
+            output['f_predicted'], output['f_std'] = prescreen['f_predicted'], prescreen['f_std']
+
+        return output, persis_info, sim_status
 
-        return output, persis_info, sim_status
\ No newline at end of file
+    def _wait_on_task(self, task, timeout, monitor):
+        while True:
+            time.sleep(_POLL_TIME)
+            task.poll()
+            if not task.finished and timeout and task.runtime > timeout:
+                self.log.warning(f'Task {task.name} killed after exceeding timeout of {timeout} seconds')
+                task.kill()
+                return WORKER_KILL_ON_TIMEOUT
+            if not task.finished and monitor and monitor.check(task):
+                # Partial results show the point is not worth finishing
+                self.log.warning(f'Task {task.name} terminated early with partial result {monitor.value}')
+                task.kill()
+                return WORKER_KILL
+            if task.finished:
+                if task.state == 'FINISHED':
+                    return WORKER_DONE
+                elif task.state == 'FAILED':
+                    return TASK_FAILED
+                else:
+                    self.log.warning("Unknown task failure")
+                    return TASK_FAILED
@@ -0,0 +1,65 @@
+# python test_multifidelity_six_hump_camel.py --nworkers 4 --comms local
+import numpy as np
+# Import libEnsemble items for this test
+from libensemble.libE import libE
+from libensemble.sim_funcs.six_hump_camel import six_hump_camel_func
+from rsopt.libe_tools.generator_functions.multi_fidelity import persistent_multifidelity as gen_f
+from libensemble.alloc_funcs.persistent_aposmm_alloc import persistent_aposmm_alloc as alloc_f
+from libensemble.tools import parse_args, add_unique_random_streams
+
+nworkers, is_master, libE_specs, _ = parse_args()
+
+n = 2
+levels = 3
+
+
+def sim_f(H, persis_info, sim_specs, _):
+    # Lower fidelity levels see a shifted and distorted version of the function
+    x, fidelity = H['x'][0], H['fidelity'][0]
+    error = (levels - 1 - fidelity) / (levels - 1)
+    out = np.zeros(1, dtype=sim_specs['out'])
+    out['f'] = six_hump_camel_func(x + 0.1 * error) + 0.2 * error * np.sin(5. * x[0])
+
+    return out, persis_info
+
+
+sim_specs = {'sim_f': sim_f,
+             'in': ['x', 'fidelity'],
+             'out': [('f', float)]}
+
+gen_out = [('x', float, n), ('x_on_cube', float, n), ('fidelity', int), ('sim_id', int),
+           ('local_pt', bool)]
+
+gen_specs = {'gen_f': gen_f,
+             'in': [],
+             'out': gen_out,
+             'user': {'batch_size': nworkers - 1,
+                      'fidelity_levels': levels,
+                      'initial_sample_size': 0,  # Give evaluations back to the generator as soon as they return
+                      'xstart': np.array([1.5, 1.]),
+                      'lb': np.array([-3, -2]),
+                      'ub': np.array([3, 2])}
+             }
+
+alloc_specs = {'alloc_f': alloc_f, 'out': [('given_back', bool)], 'user': {}}
+
+persis_info = add_unique_random_streams({}, nworkers + 1)
+
+exit_criteria = {'sim_max': 600}
+
+# Perform the run
+H, persis_info, flag = libE(sim_specs, gen_specs, exit_criteria, persis_info,
+                            alloc_specs, libE_specs)
+
+
+def test_optimizer_result():
+    full = H['fidelity'] == levels - 1
+    print("Evaluations at each fidelity:", np.bincount(H['fidelity'], minlength=levels))
+    print("Best:", np.min(H['f'][full]))
+    six_hump_min_target = -1.031628445
+    assert np.abs(six_hump_min_target - np.min(H['f'][full])) < 5e-2
+    # Most of the evaluations are made at the lowest fidelity
+    assert np.sum(full) < np.sum(H['fidelity'] == 0) / 4
+    assert np.all(H['x'] >= gen_specs['user']['lb']) and np.all(H['x'] <= gen_specs['user']['ub'])
+
+test_optimizer_result()
@@ -0,0 +1,47 @@
+# python test_pso_six_hump_camel.py --nworkers 4 --comms local
+import numpy as np
+# Import libEnsemble items for this test
+from libensemble.libE import libE
+from libensemble.sim_funcs.six_hump_camel import six_hump_camel as sim_f
+from rsopt.libe_tools.generator_functions.particle_swarm import persistant_pso as gen_f
+from libensemble.alloc_funcs.persistent_aposmm_alloc import persistent_aposmm_alloc as alloc_f
+from libensemble.tools import parse_args, add_unique_random_streams
+
+nworkers, is_master, libE_specs, _ = parse_args()
+
+n = 2
+sim_specs = {'sim_f': sim_f,
+             'in': ['x'],
+             'out': [('f', float)]}
+
+gen_out = [('x', float, n), ('x_on_cube', float, n), ('sim_id', int),
+           ('local_pt', bool)]
+
+gen_specs = {'gen_f': gen_f,
+             'in': [],
+             'out': gen_out,
+             'user': {'nparticles': 12,
+                      'initial_sample_size': 0,  # Give evaluations back to the swarm as soon as they return
+                      'initial_sample_points': np.array([[0.08, -0.7]]),
+                      'lb': np.array([-3, -2]),
+                      'ub': np.array([3, 2])}
+             }
+
+alloc_specs = {'alloc_f': alloc_f, 'out': [('given_back', bool)], 'user': {}}
+
+persis_info = add_unique_random_streams({}, nworkers + 1)
+
+exit_criteria = {'sim_max': 600}
+
+# Perform the run
+H, persis_info, flag = libE(sim_specs, gen_specs, exit_criteria, persis_info,
+                            alloc_specs, libE_specs)
+
+
+def test_optimizer_result():
+    print("Best:", np.min(H['f']))
+    six_hump_min_target = -1.031628445
+    assert np.abs(six_hump_min_target - np.min(H['f'])) < 1e-4
+    assert np.all(H['x'] >= gen_specs['user']['lb']) and np.all(H['x'] <= gen_specs['user']['ub'])
+
+test_optimizer_result()
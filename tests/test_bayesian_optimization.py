@@ -0,0 +1,94 @@
+import unittest
+import numpy as np
+from unittest import mock
+from libensemble.message_numbers import EVAL_GEN_TAG, STOP_TAG
+from rsopt.libe_tools.generator_functions import bayesian_optimization as bo
+from rsopt.libe_tools.surrogate import GaussianProcess
+from rsopt.simulation import _PENALTY
+
+
+def sphere(x):
+    return np.sum((x - 0.3)**2, axis=-1)
+
+
+class TestBayesianOptimization(unittest.TestCase):
+
+    def setUp(self):
+        self.rand_stream = np.random.RandomState(5)
+        self.user_specs = {**bo.BAYESIAN_DEFAULTS, 'ncandidates': 500}
+
+    def test_expected_improvement(self):
+        ei = bo.expected_improvement(np.array([0., 1., 1.]), np.array([0., 0., 1.]), 0.5)
+        np.testing.assert_allclose(ei[:2], [0.5, 0.])
+        self.assertGreater(ei[2], 0.)
+
+    def test_batch_is_distinct(self):
+        gp = GaussianProcess(2)
+        x = self.rand_stream.uniform(0, 1, (8, 2))
+        gp.add(x, sphere(x))
+        pending = self.rand_stream.uniform(0, 1, (2, 2))
+        batch = bo.propose_batch(gp, pending, 4, self.user_specs, self.rand_stream)
+        self.assertEqual(batch.shape, (4, 2))
+        points = np.vstack([x, pending, batch])
+        distances = np.linalg.norm(points[:, np.newaxis] - points[np.newaxis, :], axis=-1)
+        self.assertGreater(np.min(distances[np.triu_indices(len(points), 1)]), 1e-6)
+
+    def test_converges(self):
+        gp = GaussianProcess(2)
+        x = self.rand_stream.uniform(0, 1, (5, 2))
+        gp.add(x, sphere(x))
+        while len(gp) < 35:
+            batch = bo.propose_batch(gp, np.zeros((0, 2)), 3, self.user_specs, self.rand_stream)
+            gp.add(batch, sphere(batch))
+        self.assertLess(np.min(gp.f), 1e-4)
+
+    def _run(self, values, projected=None):
+        # Run the generator with the manager returning values[i] for the i-th point it was sent
+        #   projected maps a row to the point the manager simulated in place of the one that was sent
+        gen_specs = {'out': [('x', float, 2), ('x_on_cube', float, 2), ('sim_id', int), ('local_pt', bool)],
+                     'user': {'lb': np.zeros(2), 'ub': np.ones(2), 'batch_size': 2, 'initial_design_size': 3,
+                              'ncandidates': 100}}
+        sent, models = [], []
+
+        class RecordedProcess(GaussianProcess):
+            def __init__(self, n, **kwargs):
+                super().__init__(n, **kwargs)
+                models.append(self)
+
+        def returned():
+            calc_in = np.zeros(3, dtype=[('sim_id', int), ('f', float), ('x', float, 2), ('x_on_cube', float, 2)])
+            for name in ['sim_id', 'x', 'x_on_cube']:
+                calc_in[name] = sent[0][name]
+            calc_in['f'] = values
+            for row, x in (projected or {}).items():
+                calc_in['x'][row] = calc_in['x_on_cube'][row] = x
+            return calc_in
+
+        messages = iter([lambda: (EVAL_GEN_TAG, None, returned()), lambda: (STOP_TAG, None, None)])
+        with mock.patch.object(bo, 'send_mgr_worker_msg', side_effect=lambda comm, rows: sent.append(rows)), \
+                mock.patch.object(bo, 'get_mgr_worker_msg', side_effect=lambda comm: next(messages)()), \
+                mock.patch.object(bo, 'GaussianProcess', RecordedProcess):
+            local_H, persis_info, _ = bo.persistent_bayesian_optimization(
+                np.zeros(0, dtype=gen_specs['out']), {'rand_stream': self.rand_stream}, gen_specs, {'comm': None})
+
+        return models[0], persis_info, sent
+
+    def test_penalty_not_modeled(self):
+        gp, persis_info, sent = self._run([0.5, _PENALTY, 0.2])
+        np.testing.assert_array_equal(gp.f, [0.5, 0.2])
+        self.assertEqual(len(sent[1]), 2)
+        self.assertEqual(persis_info['best_f'], 0.2)
+
+    def test_all_initial_points_failed(self):
+        gp, persis_info, sent = self._run([_PENALTY, _PENALTY, np.nan])
+        self.assertEqual(len(gp), 0)
+        # New points are sampled so the run continues
+        self.assertEqual(len(sent[1]), 2)
+        self.assertNotIn('best_f', persis_info)
+
+    def test_projected_point_modeled(self):
+        # f is paired with the point the manager simulated, not the point the generator sent
+        gp, persis_info, sent = self._run([0.5, 0.1, 0.2], projected={1: [0.25, 0.75]})
+        np.testing.assert_array_equal(gp.x[1], [0.25, 0.75])
+        self.assertEqual(gp.f[1], 0.1)
+        np.testing.assert_array_equal(persis_info['best_x'], [0.25, 0.75])
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from rsopt.libe_tools.generator_functions import cma_es
+
+_N = 6
+
+
+def ellipsoid(x):
+    # Minimum of 0 at x = 0.3 on the unit cube with a condition number of 1e4
+    scales = 10.**(4. * np.arange(_N) / (_N - 1))
+    return np.sum(scales * (x - 0.3)**2, axis=-1)
+
+
+class TestCMAES(unittest.TestCase):
+
+    def setUp(self):
+        self.rand_stream = np.random.RandomState(11)
+
+    def _es(self, **kwargs):
+        return cma_es.CMAES(np.full(_N, 0.7), 0.3, cma_es.default_popsize(_N), self.rand_stream, **kwargs)
+
+    def test_batch_ask_tell(self):
+        es = self._es()
+        for _ in range(300):
+            x = es.ask(es.popsize)
+            es.tell(x, ellipsoid(x))
+        self.assertLess(ellipsoid(es.mean), 1e-10)
+
+    def test_asynchronous_returns(self):
+        # Keep two populations in flight and update from whichever points return first,
+        # so most updates include points sampled from an earlier distribution
+        es = self._es()
+        in_flight = es.ask(2 * es.popsize)
+        for _ in range(400):
+            returned = self.rand_stream.permutation(len(in_flight))[:es.popsize]
+            x = in_flight[returned]
+            es.tell(x, ellipsoid(x))
+            in_flight = np.vstack([np.delete(in_flight, returned, axis=0), es.ask(es.popsize)])
+        self.assertLess(ellipsoid(es.mean), 1e-8)
+
+    def test_stop_on_flat_objective(self):
+        es = self._es()
+        for _ in range(100):
+            x = es.ask(es.popsize)
+            es.tell(x, np.ones(es.popsize))
+            if es.stop():
+                break
+        self.assertTrue(es.stop())
+
+    def test_nan_ranked_last(self):
+        es = self._es()
+        x = es.ask(es.popsize)
+        f = ellipsoid(x)
+        f[0] = np.nan
+        es.tell(x, f)
+        self.assertTrue(np.all(np.isfinite(es.C)))
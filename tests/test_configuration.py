@@ -1,6 +1,11 @@
+import os
+import shutil
+import tempfile
 import unittest
 import numpy as np
 import rsopt.configuration as config
+from unittest import mock
+from rsopt import parse
 from rsopt.parse import read_configuration_file, parse_yaml_configuration
 SUPPORT_PATH = './support/'
 
@@ -68,6 +73,47 @@ class TestParameterReaders(unittest.TestCase):
             self.assertEqual(list(reader[1]), base_value)
 
 
+class TestParameterTable(unittest.TestCase):
+
+    def setUp(self):
+        self.configuration = config.Configuration()
+        jobs = [config.Job('python'), config.Job('python')]
+        jobs[0].parameters = parameters_dict
+        jobs[1].parameters = {'gap': {'min': 1., 'max': 2., 'start': 1.5, 'samples': 3}}
+        self.configuration.set_jobs(jobs)
+
+    def test_arrays(self):
+        table = self.configuration.parameter_table()
+        self.assertEqual(table.names, tuple(parameters_dict) + ('gap',))
+        self.assertEqual(table.index['gap'], 5)
+        np.testing.assert_array_equal(table.lb, [30., 1., 10., 30., 0.25, 1.])
+        np.testing.assert_array_equal(table.start, [46., 5., 20., 35., 1., 1.5])
+        self.assertEqual(table.samples.tolist(), [None] * 5 + [3])
+        np.testing.assert_array_equal(table.offsets, [0, 5, 6])
+        np.testing.assert_array_equal(table.job, [0, 0, 0, 0, 0, 1])
+
+    def test_read_only(self):
+        table = self.configuration.parameter_table()
+        for array in (table.lb, table.ub, table.start, table.types):
+            with self.assertRaises(ValueError):
+                array[0] = array[1]
+
+    def test_cached(self):
+        self.assertIs(self.configuration.parameter_table(), self.configuration.parameter_table())
+        self.assertIs(self.configuration.parameter_table().lb, self.configuration.parameter_table().lb)
+
+    def test_rebuilt_after_parse(self):
+        table = self.configuration.parameter_table()
+        self.configuration.jobs[1].parameters = {'width': {'min': 0., 'max': 1., 'start': 0.5}}
+        self.assertIsNot(self.configuration.parameter_table(), table)
+        self.assertEqual(self.configuration.get_dimension(), 7)
+        np.testing.assert_array_equal(self.configuration.parameter_table().offsets, [0, 5, 7])
+
+    def test_duplicate_parameter(self):
+        with self.assertRaises(KeyError):
+            self.configuration.jobs[1].parameters = {'gap': {'min': 1., 'max': 2., 'start': 1.5}}
+
+
 class TestSettingReaders(unittest.TestCase):
 
     def test_setting_dict_read(self):
@@ -82,6 +128,12 @@ class TestOptionsReaders(unittest.TestCase):
                                'exit_criteria': 'fill'},
                      'aposmm': {'method': 'LN_COBYLA',
                                 'exit_criteria': 'fill'},
+                     'pso': {'exit_criteria': 'fill'},
+                     'cmaes': {'exit_criteria': 'fill'},
+                     'bayesian': {'exit_criteria': 'fill'},
+                     'multifidelity': {'exit_criteria': 'fill'},
+                     'nsga2': {'exit_criteria': 'fill',
+                               'objectives': ['fill']},
                      'mesh_scan': {}}
 
     def test_options_set(self):
@@ -107,6 +159,28 @@ class TestConfigurationSetup(unittest.TestCase):
         cfg = config.configuration.Configuration()
         cfg.options = options_dict
 
+    def test_timeout(self):
+        cfg = config.configuration.Configuration()
+        cfg.options = {'software': 'nlopt', 'method': 'LN_SBPLX', 'exit_criteria': {'sim_max': 10}, 'timeout': 3600}
+        self.assertEqual(cfg.options.timeout, 3600)
+
+        job = config.jobs.Job('python')
+        job.setup = {'function': print, 'execution_type': 'serial', 'timeout': 60.}
+        self.assertEqual(job.setup['timeout'], 60.)
+        with self.assertRaises(ValueError):
+            job.setup = {'function': print, 'execution_type': 'serial', 'timeout': -1}
+
+    def test_max_cores(self):
+        job = config.jobs.Job('python')
+        job.setup = {'function': print, 'execution_type': 'parallel', 'cores': 2, 'max_cores': 8}
+        self.assertEqual(job.setup['max_cores'], 8)
+        # Serial jobs cannot borrow cores
+        with self.assertRaises(AssertionError):
+            job.setup = {'function': print, 'execution_type': 'serial', 'cores': 1, 'max_cores': 8}
+        # Fewer cores than the job always uses
+        with self.assertRaises(AssertionError):
+            job.setup = {'function': print, 'execution_type': 'parallel', 'cores': 4, 'max_cores': 2}
+
 
 class TestYAMLtoConfiguration(unittest.TestCase):
     config_file = SUPPORT_PATH + 'config_six_hump_camel.yaml'
@@ -131,5 +205,73 @@ class TestYAMLtoConfiguration(unittest.TestCase):
         assert callable(setup.function)
 
 
-
-
+class TestCompiledConfiguration(unittest.TestCase):
+    config_file = 'config_six_hump_camel.yaml'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for name in (self.config_file, 'six_hump_camel.py'):
+            shutil.copy(os.path.join(SUPPORT_PATH, name), self.directory.name)
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _load(self, **kwargs):
+        with mock.patch.object(parse, 'parse_yaml_configuration', wraps=parse.parse_yaml_configuration) as parser:
+            configuration = parse.load_configuration(self.config_file, **kwargs)
+        return configuration, parser.called
+
+    def test_compiled_file_written(self):
+        self._load()
+        self.assertTrue(os.path.isfile(parse.compiled_path(self.config_file)))
+        self.assertEqual(os.path.dirname(parse.compiled_path(self.config_file)), os.getcwd())
+
+    def test_compiled_configuration_loaded(self):
+        parsed, _ = self._load()
+        loaded, parsed_again = self._load()
+        self.assertFalse(parsed_again)
+        self.assertEqual(loaded.options.NAME, parsed.options.NAME)
+        self.assertEqual(loaded.get_parameters_list('get_parameter_names'), ['x', 'y'])
+        np.testing.assert_array_equal(loaded.get_parameters_list('get_start', formatter=np.array),
+                                      parsed.get_parameters_list('get_start', formatter=np.array))
+        self.assertEqual(loaded.jobs[0].executor_args, parsed.jobs[0].executor_args)
+        self.assertTrue(callable(loaded.jobs[0].execute))
+
+    def test_recompile(self):
+        self._load()
+        _, parsed = self._load(recompile=True)
+        self.assertTrue(parsed)
+
+    def test_changed_configuration(self):
+        self._load()
+        with open(self.config_file, 'a') as ff:
+            ff.write('\n  sym_links: [six_hump_camel.py]\n')
+        configuration, parsed = self._load()
+        self.assertTrue(parsed)
+        self.assertEqual(configuration.options.sym_links, ['six_hump_camel.py'])
+
+    def test_changed_referenced_file(self):
+        self._load()
+        with open('six_hump_camel.py', 'a') as ff:
+            ff.write('\n# changed\n')
+        _, parsed = self._load()
+        self.assertTrue(parsed)
+
+    def test_changed_directory(self):
+        self._load()
+        os.mkdir('run')
+        os.chdir('run')
+        self.config_file = os.path.join('..', self.config_file)
+        _, parsed = self._load()
+        self.assertTrue(parsed)
+
+    def test_unreadable_compiled_file(self):
+        self._load()
+        with open(parse.compiled_path(self.config_file), 'wb') as ff:
+            ff.write(b'not a compiled configuration')
+        configuration, parsed = self._load()
+        self.assertTrue(parsed)
+        self.assertEqual(configuration.options.NAME, 'nlopt')
@@ -0,0 +1,225 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from libensemble.message_numbers import EVAL_SIM_TAG, WORKER_DONE
+from rsopt import parse
+from rsopt.configuration import Configuration, Job
+from rsopt.constraints import Constraint, Constraints, validate_constraints
+from rsopt.libe_tools.feasibility import feasibility_alloc
+from rsopt.run import local_optimizer
+from rsopt.simulation import SimulationFunction, _PENALTY
+
+_CONSTRAINTS = {'sum': {'expression': 'a + b - limit'},
+                'ratio': {'expression': 'a - 2 * b', 'type': 'expensive'}}
+
+
+def quadratic(a, b, limit):
+    return (a - 0.8)**2 + (b - 0.8)**2
+
+
+def make_config(method='LN_COBYLA', constraints=_CONSTRAINTS):
+    job = Job('python')
+    job.parameters = {'a': {'min': 0., 'max': 1., 'start': 0.2}, 'b': {'min': 0., 'max': 1., 'start': 0.2}}
+    job.settings = {'limit': 1.}
+    job.setup = {'function': quadratic, 'execution_type': 'serial'}
+    config = Configuration()
+    config.set_jobs(job)
+    config.options = {'software': 'nlopt', 'method': method, 'exit_criteria': {'sim_max': 100},
+                      'software_options': {'xtol_rel': 1e-6}}
+    config.constraints = constraints
+
+    return config
+
+
+class TestConstraint(unittest.TestCase):
+
+    def test_expression(self):
+        constraint = Constraint('c', expression='sqrt(a) - max(b, 2.)')
+        self.assertEqual(constraint({'a': 9., 'b': 1.}), 1.)
+
+    def test_function(self):
+        constraint = Constraint('c', function=lambda a, **kwargs: a - 1.)
+        self.assertEqual(constraint({'a': 3., 'b': 1.}), 2.)
+
+    def test_no_builtins(self):
+        with self.assertRaises(NameError):
+            Constraint('c', expression='open("x")')({})
+
+    def test_pickle(self):
+        constraint = pickle.loads(pickle.dumps(Constraint('c', expression='a - 1')))
+        self.assertEqual(constraint({'a': 3.}), 2.)
+
+    def test_validate(self):
+        self.assertTrue(validate_constraints(_CONSTRAINTS))
+        self.assertTrue(validate_constraints({'c': {'function': ['constraints.py', 'c'], 'action': 'project'}}))
+        self.assertFalse(validate_constraints({'c': {}}))
+        self.assertFalse(validate_constraints({'c': {'expression': 'a', 'function': ['c.py', 'c']}}))
+        self.assertFalse(validate_constraints({'c': {'expression': 'a', 'type': 'cheapest'}}))
+        self.assertFalse(validate_constraints({'c': {'expression': 'a', 'action': 'ignore'}}))
+        self.assertFalse(validate_constraints({'c': {'expression': 'a', 'target': 1.}}))
+
+
+class TestConstraints(unittest.TestCase):
+
+    def setUp(self):
+        self.constraints = Constraints({'sum': {'expression': 'a + b - limit', 'action': 'project'},
+                                        'ratio': {'expression': 'a - 2 * b', 'type': 'expensive'}},
+                                       ['a', 'b'], {'limit': 1.}, start=np.array([0.2, 0.2]))
+
+    def test_values(self):
+        values = self.constraints.values([0.5, 0.1], results={})
+        self.assertAlmostEqual(values['sum'], -0.4)
+        self.assertAlmostEqual(values['ratio'], 0.3)
+        self.assertTrue(np.isnan(self.constraints.values([0.5, 0.1])['ratio']))
+        self.assertEqual([c.name for c in self.constraints.violated(values)], ['ratio'])
+
+    def test_project(self):
+        x = self.constraints.project(np.array([0.9, 0.8]))
+        self.assertTrue(self.constraints.feasible(x))
+        self.assertAlmostEqual(x[0] + x[1], 1., places=6)
+        # On the line to the start point
+        self.assertAlmostEqual((x[1] - 0.2) / (x[0] - 0.2), 0.6 / 0.7)
+
+    def test_infeasible_start(self):
+        with self.assertRaises(AssertionError):
+            Constraints({'sum': {'expression': 'a + b - 1', 'action': 'project'}}, ['a', 'b'], {},
+                        start=np.array([0.6, 0.6]))
+
+
+def fake_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+    # Hands out rows in order without checking 'given', like persistent_aposmm_alloc
+    Work = {}
+    for i in W['worker_id'][W['active'] == 0]:
+        row = persis_info.get('next_to_give', 0)
+        if row < len(H):
+            Work[i] = {'tag': EVAL_SIM_TAG, 'libE_info': {'H_rows': np.array([row])}}
+            persis_info['next_to_give'] = row + 1
+
+    return Work, persis_info
+
+
+class TestFeasibilityAlloc(unittest.TestCase):
+    sim_specs = {'out': [('f', float), ('sum', float), ('ratio', float), ('rejected', bool)]}
+
+    def _alloc(self, constraints, x, nworkers=1, project=False):
+        W = np.zeros(nworkers, dtype=[('worker_id', int), ('active', int)])
+        W['worker_id'] = np.arange(1, nworkers + 1)
+        H = np.zeros(len(x), dtype=self.sim_specs['out'] + [('x', float, (2,)), ('x_on_cube', float, (2,)),
+                                                             ('given', bool), ('returned', bool),
+                                                             ('given_time', float)])
+        H['x'] = H['x_on_cube'] = x
+        alloc_specs = {'user': {'alloc_f': fake_alloc, 'constraints': constraints, 'project': project,
+                                'lb': np.zeros(2), 'ub': np.ones(2)}}
+        Work, persis_info = feasibility_alloc(W, H, self.sim_specs, {}, alloc_specs, {})
+
+        return H, Work, persis_info
+
+    def test_reject(self):
+        constraints = Constraints(_CONSTRAINTS, ['a', 'b'], {'limit': 1.})
+        H, Work, _ = self._alloc(constraints, [[0.9, 0.9], [0.9, 0.95], [0.3, 0.3]])
+        np.testing.assert_array_equal(H['rejected'], [True, True, False])
+        np.testing.assert_array_equal(H['f'], [_PENALTY, _PENALTY, 0.])
+        self.assertTrue(np.all(H['returned'][:2]))
+        self.assertAlmostEqual(H['sum'][0], 0.8)
+        self.assertTrue(np.isnan(H['ratio'][0]))
+        # The rejected rows are skipped and the feasible row is handed out
+        self.assertEqual(Work[1]['libE_info']['H_rows'][0], 2)
+
+    def test_project(self):
+        constraints = Constraints({'sum': {'expression': 'a + b - 1', 'action': 'project'}}, ['a', 'b'], {},
+                                  start=np.array([0.2, 0.2]))
+        H, Work, persis_info = self._alloc(constraints, [[0.9, 0.9]], project=True)
+        self.assertFalse(H['rejected'][0])
+        self.assertAlmostEqual(np.sum(H['x'][0]), 1., places=6)
+        np.testing.assert_array_equal(H['x'][0], H['x_on_cube'][0])
+        self.assertEqual(persis_info['projected'], 1)
+        self.assertIn(1, Work)
+
+    def test_project_without_read_back(self):
+        # Generators that keep the point they asked for get the penalty at that point
+        constraints = Constraints({'sum': {'expression': 'a + b - 1', 'action': 'project'}}, ['a', 'b'], {},
+                                  start=np.array([0.2, 0.2]))
+        H, Work, persis_info = self._alloc(constraints, [[0.9, 0.9]])
+        self.assertTrue(H['rejected'][0])
+        self.assertEqual(H['f'][0], _PENALTY)
+        np.testing.assert_array_equal(H['x'][0], [0.9, 0.9])
+        self.assertEqual(persis_info['projected'], 0)
+
+
+class TestSimulationFunction(unittest.TestCase):
+    sim_specs = {'out': [('f', float), ('sum', float), ('ratio', float), ('rejected', bool)]}
+
+    def _evaluate(self, x, penalize):
+        config = make_config()
+        H = np.zeros(1, dtype=[('x', float, (2,))])
+        H['x'] = x
+        sim_function = SimulationFunction(config.jobs, None, constraints=config.get_constraints(),
+                                          penalize_constraints=penalize)
+        return sim_function(H, {}, self.sim_specs, {})
+
+    def test_values_recorded(self):
+        output, _, status = self._evaluate([0.6, 0.2], False)
+        self.assertEqual(status, WORKER_DONE)
+        self.assertAlmostEqual(output['f'][0], 0.4)
+        self.assertAlmostEqual(output['ratio'][0], 0.2)
+        self.assertAlmostEqual(output['sum'][0], -0.2)
+
+    def test_penalty(self):
+        output, _, _ = self._evaluate([0.6, 0.2], True)
+        self.assertEqual(output['f'][0], _PENALTY)
+        self.assertAlmostEqual(output['ratio'][0], 0.2)
+        output, _, _ = self._evaluate([0.2, 0.6], True)
+        self.assertAlmostEqual(output['f'][0], 0.4)
+
+
+class TestConfiguration(unittest.TestCase):
+
+    def test_parse(self):
+        template = {'codes': [{'python': {'parameters': {'a': {'min': 0., 'max': 1., 'start': 0.2}},
+                                          'settings': {'limit': 1.},
+                                          'setup': {'function': quadratic, 'execution_type': 'serial'}}}],
+                    'options': {'software': 'nlopt', 'method': 'LN_COBYLA', 'exit_criteria': {'sim_max': 10}},
+                    'constraints': {'c': {'expression': 'a - limit / 2'}}}
+        config = parse.parse_yaml_configuration(template)
+        constraints = config.get_constraints()
+        self.assertEqual(constraints.names, ['c'])
+        self.assertTrue(constraints.feasible([0.2]))
+        self.assertFalse(constraints.feasible([0.7]))
+
+    def test_invalid(self):
+        with self.assertRaises(AssertionError):
+            Configuration().constraints = {'c': {'expression': 'a', 'type': 'cheapest'}}
+
+    def test_no_constraints(self):
+        self.assertIsNone(make_config(constraints={}).get_constraints())
+
+
+class TestCobyla(unittest.TestCase):
+
+    def _run(self, method):
+        directory = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        try:
+            H, _, _ = local_optimizer(make_config(method)).run()
+        finally:
+            os.chdir(cwd)
+            directory.cleanup()
+
+        return H[H['returned']]
+
+    def test_constrained_optimum(self):
+        # The unconstrained minimum at (0.8, 0.8) violates a + b <= 1
+        H = self._run('LN_COBYLA')
+        feasible = H[(H['sum'] <= 1e-6) & (H['ratio'] <= 1e-6)]
+        best = feasible[np.argmin(feasible['f'])]
+        np.testing.assert_allclose(best['x'], [0.5, 0.5], atol=1e-3)
+
+    def test_penalty_for_unconstrained_methods(self):
+        H = self._run('LN_BOBYQA')
+        simulated = H[~H['rejected']]
+        violated = simulated['ratio'] > 0.
+        self.assertTrue(np.all(simulated['f'][violated] == _PENALTY))
+        self.assertTrue(np.all(H['sum'][~H['rejected']] <= 0.))
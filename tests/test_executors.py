@@ -1,6 +1,8 @@
 import unittest
 import tempfile
 import os
+import time
+from importlib.util import find_spec
 import rsopt.libe_tools.executors as execs
 
 _SSH_CONFIG = \
@@ -26,6 +28,16 @@ class TestExecutorrsmpi(unittest.TestCase):
         execs._generate_rsmpi_node_file(4)
         self.assertTrue(os.path.isfile('libe_nodes'))
 
+    def test_node_file_not_rewritten(self):
+        execs._generate_rsmpi_node_file(4)
+        modified = os.path.getmtime('libe_nodes')
+        os.utime('libe_nodes', (modified - 10., modified - 10.))
+        execs._generate_rsmpi_node_file(4)
+        self.assertEqual(os.path.getmtime('libe_nodes'), modified - 10.)
+        execs._generate_rsmpi_node_file(2)
+        with open('libe_nodes') as ff:
+            self.assertEqual(ff.read().split(), ['1', '2'])
+
     def test_detect_rsmpi_resources(self):
         hosts = execs._detect_rsmpi_resources()
         self.assertEqual(2, hosts)
@@ -50,3 +62,179 @@ class TestExecutorrsmpi(unittest.TestCase):
             os.remove('libe_nodes')
         except OSError:
             pass
+
+
+class TestAllocation(unittest.TestCase):
+
+    def test_expand_slurm_nodelist(self):
+        self.assertEqual(execs.expand_slurm_nodelist('nid[008-010,012],login1'),
+                         ['nid008', 'nid009', 'nid010', 'nid012', 'login1'])
+
+    def test_read_slurm_allocation(self):
+        env = {'SLURM_JOB_NODELIST': 'nid[1-3]', 'SLURM_JOB_CPUS_PER_NODE': '32(x2),16'}
+        self.assertEqual(execs.read_allocation('slurm', env=env), {'nid1': 32, 'nid2': 32, 'nid3': 16})
+        self.assertEqual(execs.read_allocation('slurm', cores_per_node=4, env=env), {'nid1': 4, 'nid2': 4, 'nid3': 4})
+
+    def test_read_local_allocation(self):
+        self.assertEqual(execs.read_allocation('local', cores_per_node=4, nnodes=2),
+                         {'localhost:0': 4, 'localhost:1': 4})
+        self.assertEqual(execs.read_allocation(['a', 'b'], cores_per_node=8), {'a': 8, 'b': 8})
+
+
+class TestPlacement(unittest.TestCase):
+    nodes = {'a': 4, 'b': 4, 'c': 8}
+
+    def test_pack(self):
+        self.assertEqual(execs.place(self.nodes, {'a': 1, 'b': 4, 'c': 8}, 3), {'b': 3})
+
+    def test_spread(self):
+        self.assertEqual(execs.place(self.nodes, {'a': 1, 'b': 4, 'c': 8}, 3, placement='spread'), {'c': 3})
+
+    def test_ranks_per_node(self):
+        self.assertEqual(execs.place(self.nodes, self.nodes, 10, ranks_per_node=4), {'a': 4, 'b': 4, 'c': 2})
+        self.assertIsNone(execs.place(self.nodes, {'a': 4, 'b': 2, 'c': 2}, 8, ranks_per_node=4))
+
+    def test_split(self):
+        self.assertEqual(execs.place(self.nodes, self.nodes, 10), {'c': 8, 'a': 2})
+        self.assertIsNone(execs.place(self.nodes, {'a': 1, 'b': 4, 'c': 2}, 8))
+
+
+class TestResourceScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.directory.name, 'ledger.json')
+        self.scheduler = execs.ResourceScheduler.create(self.ledger, {'localhost:0': 4, 'localhost:1': 4})
+
+    def test_acquire_release(self):
+        first = self.scheduler.try_acquire(3)
+        second = self.scheduler.try_acquire(3)
+        self.assertNotEqual(first.nodes, second.nodes)
+        self.assertIsNone(self.scheduler.try_acquire(3))
+        # A second scheduler object on the same ledger, as in another worker, sees the same state
+        other = execs.ResourceScheduler(self.ledger)
+        self.assertEqual(other.try_acquire(1).num_procs, 1)
+        other.release(first)
+        self.assertIsNotNone(self.scheduler.try_acquire(2))
+        self.assertGreater(self.scheduler.utilization()['localhost:0'], 0.)
+
+    def test_borrow_idle_cores(self):
+        reserved = self.scheduler.try_acquire(2, max_cores=6)
+        self.assertEqual(reserved.num_procs, 6)
+        self.assertEqual(self.scheduler.try_acquire(1, max_cores=6).num_procs, 2)
+
+    def test_max_cores_below_cores(self):
+        # Nothing is borrowed but the task still gets the cores it needs
+        self.assertEqual(self.scheduler.try_acquire(4, max_cores=2).num_procs, 4)
+
+    def test_waiting_cores_not_borrowed(self):
+        self.scheduler.try_acquire(4)
+        with self.scheduler._state() as state:
+            state['waiting']['other_worker'] = 3
+        self.assertEqual(self.scheduler.try_acquire(1, max_cores=4).num_procs, 1)
+        # The waiting request itself may take the cores
+        self.assertEqual(self.scheduler.try_acquire(3, request_id='other_worker').num_procs, 3)
+
+    def test_check(self):
+        self.scheduler.check(8)
+        with self.assertRaises(ValueError):
+            self.scheduler.check(9)
+
+    def test_machinefile(self):
+        reserved = self.scheduler.try_acquire(6, ranks_per_node=3)
+        args = reserved.executor_args(self.directory.name)
+        self.assertEqual(args['extra_args'], '-np 6')
+        with open(args['machinefile']) as ff:
+            self.assertEqual(ff.read().split(), ['localhost'] * 6)
+
+    def test_job_extra_args_kept(self):
+        reserved = self.scheduler.try_acquire(2)
+        args = reserved.executor_args(self.directory.name, extra_args='--bind-to core')
+        self.assertEqual(args['extra_args'], '-np 2 --bind-to core')
+
+    def test_machinefile_removed_on_release(self):
+        reserved = self.scheduler.try_acquire(2)
+        machinefile = reserved.executor_args(self.directory.name)['machinefile']
+        self.assertTrue(os.path.isfile(machinefile))
+        self.scheduler.release(reserved)
+        self.assertFalse(os.path.exists(machinefile))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+class TestLaunchLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.directory.name, 'launches.json')
+
+    def test_ledger_started_on_first_launch(self):
+        limiter = execs.LaunchLimiter(self.ledger, max_concurrent=1)
+        self.assertIsNotNone(limiter.try_acquire())
+        self.assertTrue(os.path.isfile(self.ledger))
+
+    def test_max_concurrent(self):
+        limiter = execs.LaunchLimiter.create(self.ledger, max_concurrent=2)
+        first = limiter.try_acquire()
+        self.assertIsNotNone(limiter.try_acquire())
+        self.assertIsNone(limiter.try_acquire())
+        limiter.release(first)
+        self.assertIsNotNone(limiter.try_acquire())
+
+    def test_hold_expires(self):
+        limiter = execs.LaunchLimiter.create(self.ledger, max_concurrent=1, hold=0.1)
+        limiter.try_acquire()
+        self.assertIsNone(limiter.try_acquire())
+        time.sleep(0.2)
+        self.assertIsNotNone(limiter.try_acquire())
+
+    def test_min_interval(self):
+        limiter = execs.LaunchLimiter.create(self.ledger, min_interval=0.3)
+        start = time.time()
+        for _ in range(3):
+            limiter.release(limiter.acquire())
+        self.assertGreaterEqual(time.time() - start, 0.5)
+
+    def test_retry_failed_launch(self):
+        limiter = execs.LaunchLimiter.create(self.ledger, max_attempts=3, retry_delay=0.)
+        attempts = []
+
+        def launch():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError('launch failed')
+            return len(attempts)
+
+        self.assertEqual(limiter.launch(launch, failed=lambda result: result < 3), 3)
+        # Every attempt released its launch
+        with limiter._state() as state:
+            self.assertEqual(state['active'], {})
+
+    def test_last_failure_raised(self):
+        limiter = execs.LaunchLimiter.create(self.ledger, max_attempts=2, retry_delay=0.)
+
+        def launch():
+            raise OSError('launch failed')
+
+        with self.assertRaises(OSError):
+            limiter.launch(launch)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+@unittest.skipIf(find_spec('rsbeams') is None, 'The Runner requires rsbeams')
+class TestRunnerLaunches(unittest.TestCase):
+
+    def test_only_errors_retried(self):
+        from rsopt.codes.runner import HALT, ERROR
+        from rsopt.codes.runner.sim_functions import _runner_failed
+        self.assertTrue(_runner_failed(({}, ERROR)))
+        self.assertFalse(_runner_failed(({}, HALT)))
+        self.assertFalse(_runner_failed(1.5))
+
+    def test_ledger_in_run_directory(self):
+        from rsopt.codes.runner.sim_functions import _LAUNCH_LIMITS
+        self.assertEqual(os.path.dirname(_LAUNCH_LIMITS['ledger']), os.getcwd())
+        self.assertEqual(_LAUNCH_LIMITS['max_attempts'], 1)
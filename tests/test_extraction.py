@@ -0,0 +1,176 @@
+import os
+import struct
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+from unittest import mock
+from libensemble.message_numbers import WORKER_DONE, TASK_FAILED
+from rsopt import extraction
+from rsopt.configuration.jobs import Job
+from rsopt.simulation import SimulationFunction, _PENALTY
+
+_HEADER = \
+    """SDDS1
+!# little-endian
+&description text="test", &end
+&parameter name=nux, type=double, &end
+&parameter name=label, type=string, &end
+&parameter name=fixed, type=long, fixed_value=7, &end
+&column name=s, type=double, &end
+&column name=element, type=string, &end
+&column name=betax, type=double, &end
+&data mode={mode}, column_major_order={column_major}, &end
+"""
+
+
+def _string(value):
+    return struct.pack('<i', len(value)) + value.encode()
+
+
+def write_binary_sdds(path, pages, column_major=False):
+    # pages: list of (nux, label, rows) with rows as (s, element, betax)
+    with open(path, 'wb') as ff:
+        ff.write(_HEADER.format(mode='binary', column_major=int(column_major)).encode())
+        for nux, label, rows in pages:
+            ff.write(struct.pack('<i', len(rows)) + struct.pack('<d', nux) + _string(label))
+            if column_major:
+                ff.write(b''.join(struct.pack('<d', row[0]) for row in rows))
+                ff.write(b''.join(_string(row[1]) for row in rows))
+                ff.write(b''.join(struct.pack('<d', row[2]) for row in rows))
+            else:
+                for s, element, betax in rows:
+                    ff.write(struct.pack('<d', s) + _string(element) + struct.pack('<d', betax))
+
+
+def write_ascii_sdds(path, pages):
+    with open(path, 'w') as ff:
+        ff.write(_HEADER.format(mode='ascii', column_major=0))
+        for nux, label, rows in pages:
+            ff.write(f'{nux}\n"{label}"\n! page rows\n{len(rows)}\n')
+            for s, element, betax in rows:
+                ff.write(f'{s} "{element}" {betax}\n')
+
+
+_PAGES = [(0.2, 'first', [(0., 'Q1', 10.), (1., 'D 1', 12.)]),
+          (0.3, 'second', [(0., 'Q1', 5.), (1., 'D 1', 7.), (2., 'Q2', 6.)])]
+
+
+class TestSDDS(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'twiss.sdds')
+
+    def _check(self):
+        with extraction.SDDSFile(self.path) as sdds:
+            self.assertEqual(sdds.parameter('nux'), 0.3)
+            self.assertEqual(sdds.parameter('nux', page=0), 0.2)
+            self.assertEqual(sdds.parameter('label', page=0), 'first')
+            self.assertEqual(sdds.parameter('fixed'), 7)
+            np.testing.assert_array_equal(sdds.column('betax'), [5., 7., 6.])
+            np.testing.assert_array_equal(sdds.column('element', page=0), ['Q1', 'D 1'])
+            self.assertEqual(sdds.pages, 2)
+            with self.assertRaises(KeyError):
+                sdds.column('betay')
+
+    def test_binary_row_major(self):
+        write_binary_sdds(self.path, _PAGES)
+        self._check()
+
+    def test_binary_column_major(self):
+        write_binary_sdds(self.path, _PAGES, column_major=True)
+        self._check()
+
+    def test_ascii(self):
+        write_ascii_sdds(self.path, _PAGES)
+        self._check()
+
+    def test_numeric_rows_read_without_strings(self):
+        with open(self.path, 'wb') as ff:
+            ff.write(b'SDDS1\n&column name=s, type=double, &end\n&column name=n, type=long, &end\n'
+                     b'&data mode=binary, &end\n')
+            ff.write(struct.pack('<i', 3) + b''.join(struct.pack('<di', float(i), i) for i in range(3)))
+        with extraction.SDDSFile(self.path) as sdds:
+            np.testing.assert_array_equal(sdds.column('n'), [0, 1, 2])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+class TestResults(unittest.TestCase):
+    results = {'nux': {'file': 'twiss.sdds', 'parameter': 'nux', 'target': 0.25},
+               'betax_max': {'file': 'twiss.sdds', 'column': 'betax', 'reduction': 'max', 'page': 0},
+               'eta': {'file': 'output.h5', 'attribute': 'efficiency@eta', 'target': 1., 'weight': 2.},
+               'current': {'file': 'output.h5', 'dataset': 'efficiency/current', 'reduction': 'mean'}}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        write_binary_sdds(os.path.join(self.directory.name, 'twiss.sdds'), _PAGES)
+        with h5.File(os.path.join(self.directory.name, 'output.h5'), 'w') as datafile:
+            datafile.create_group('efficiency').attrs['eta'] = 0.5
+            datafile['efficiency/current'] = np.array([1., 2., 3.])
+
+    def test_validate(self):
+        self.assertTrue(extraction.validate_results(self.results))
+        self.assertFalse(extraction.validate_results({'a': {'file': 'a.sdds'}}))
+        self.assertFalse(extraction.validate_results({'a': {'file': 'a.sdds', 'column': 'x', 'parameter': 'y'}}))
+        self.assertFalse(extraction.validate_results({'a': {'file': 'a.sdds', 'column': 'x', 'reduction': 'median'}}))
+
+    def test_extract(self):
+        values = extraction.extract_results(self.results, self.directory.name)
+        self.assertEqual(values, {'nux': 0.3, 'betax_max': 12., 'eta': 0.5, 'current': 2.})
+        self.assertAlmostEqual(extraction.results_objective(self.results, values), 0.05**2 + 2. * 0.5**2)
+        self.assertEqual(extraction.results_objective(self.results, {**values, 'f': 3.}), 3.)
+
+    def _job(self):
+        job = Job('python')
+        job.parameters = {'x': {'min': 0., 'max': 1., 'start': 0.5}}
+        job.setup = {'function': lambda x: None, 'execution_type': 'serial'}
+        job.results = self.results
+        return job
+
+    def _evaluate(self, simulation):
+        sim_specs = {'out': [('f', float), ('nux', float), ('current', float)]}
+        H = np.zeros(1, dtype=[('x', float, (1,))])
+        cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            return simulation(H, {}, sim_specs, {})
+        finally:
+            os.chdir(cwd)
+
+    def test_simulation_function(self):
+        output, _, status = self._evaluate(SimulationFunction([self._job()], None))
+        self.assertEqual(status, WORKER_DONE)
+        self.assertAlmostEqual(output['f'][0], 0.05**2 + 2. * 0.5**2)
+        self.assertEqual(output['nux'][0], 0.3)
+        self.assertEqual(output['current'][0], 2.)
+
+    def test_missing_result_file(self):
+        simulation = SimulationFunction([self._job()], None)
+        self._evaluate(simulation)
+        # Results of the previous point are not recorded for a point without output
+        os.remove(os.path.join(self.directory.name, 'twiss.sdds'))
+        output, _, status = self._evaluate(simulation)
+        self.assertEqual(status, TASK_FAILED)
+        self.assertEqual(output['f'][0], _PENALTY)
+        self.assertTrue(np.isnan(output['nux'][0]))
+        self.assertTrue(np.isnan(output['current'][0]))
+
+    def test_failed_task(self):
+        job = self._job()
+        simulation = SimulationFunction([job], None)
+        self._evaluate(simulation)
+        job.executor = 'python'
+        with mock.patch('rsopt.simulation.Executor'), \
+                mock.patch.object(SimulationFunction, '_wait_on_task', return_value=TASK_FAILED), \
+                mock.patch('rsopt.simulation.extract_results') as extract:
+            output, _, status = self._evaluate(simulation)
+        extract.assert_not_called()
+        self.assertEqual(status, TASK_FAILED)
+        self.assertEqual(output['f'][0], _PENALTY)
+        self.assertTrue(np.isnan(output['nux'][0]))
+
+    def tearDown(self):
+        self.directory.cleanup()
@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+from rsopt.libe_tools.generator_functions import finite_difference as fd
+
+
+def quadratic(x):
+    return np.sum((x - 0.2)**2 * np.arange(1, x.shape[-1] + 1), axis=-1)
+
+
+def quadratic_gradient(x):
+    return 2. * (x - 0.2) * np.arange(1, x.size + 1)
+
+
+class TestFiniteDifference(unittest.TestCase):
+
+    def _gradient(self, x, step, scheme):
+        upper, lower = fd.gradient_stencil(x, step, scheme)
+        return fd.assemble_gradient(quadratic(upper), quadratic(lower), upper, lower)
+
+    def test_forward_gradient(self):
+        x = np.array([0.5, 0.1, 0.9])
+        np.testing.assert_allclose(self._gradient(x, 1e-6, 'forward'), quadratic_gradient(x), atol=1e-5)
+
+    def test_central_gradient(self):
+        # Central differences are exact for a quadratic
+        x = np.array([0.5, 0.1, 0.9])
+        np.testing.assert_allclose(self._gradient(x, 1e-2, 'central'), quadratic_gradient(x), atol=1e-9)
+
+    def test_stencil_stays_on_cube(self):
+        x = np.array([0., 1., 0.5])
+        for scheme in fd.FINITE_DIFFERENCE_SCHEMES:
+            upper, lower = fd.gradient_stencil(x, 1e-3, scheme)
+            self.assertTrue(np.all(upper >= 0.) and np.all(upper <= 1.))
+            self.assertTrue(np.all(lower >= 0.) and np.all(lower <= 1.))
+            self.assertTrue(np.all(np.diag(upper) > np.diag(lower)))
+            np.testing.assert_allclose(self._gradient(x, 1e-3, scheme), quadratic_gradient(x), atol=1e-2)
+
+    def test_forward_stencil_reuses_iterate(self):
+        # Each forward difference pair contains the iterate so only n new points are needed
+        x = np.array([0.3, 0.6])
+        upper, lower = fd.gradient_stencil(x, [1e-4, 2e-4], 'forward')
+        keys = {fd.point_key(p) for p in np.vstack([upper, lower])}
+        self.assertEqual(len(keys), x.size + 1)
+        self.assertIn(fd.point_key(x), keys)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(AssertionError):
+            fd.gradient_stencil(np.array([0.5]), 1e-6, 'backward')
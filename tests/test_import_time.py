@@ -0,0 +1,60 @@
+"""
+Import cost of rsopt and its command line modules.
+
+Run this file directly to print the cumulative `python -X importtime` cost of each module:
+
+    python test_import_time.py
+"""
+import subprocess
+import sys
+import unittest
+
+MODULES = ['rsopt', 'rsopt.configuration', 'rsopt.parse', 'rsopt.run', 'rsopt.pkcli.optimize', 'rsopt.pkcli.sample',
+           'rsopt.pkcli.cleanup', 'rsopt.pkcli.run_tec_3d']
+# Packages that are only loaded when a code path needs them
+HEAVY_PACKAGES = ('libensemble', 'jinja2', 'scipy', 'h5py', 'sirepo', 'radia', 'rsbeams', 'rswarp', 'nlopt',
+                  'pkg_resources')
+
+
+def import_times(module):
+    """
+    Import a module in a new interpreter.
+    :param module: (str) Module name
+    :return: (dict, str) Cumulative import time in microseconds of every module loaded and the output printed
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+
+    return times, result.stdout
+
+
+def heavy_imports(times):
+    return sorted({name.split('.')[0] for name in times if name.split('.')[0] in HEAVY_PACKAGES})
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        for module in MODULES:
+            times, output = import_times(module)
+            self.assertEqual(heavy_imports(times), [], module)
+            self.assertEqual(output, '', module)
+
+    def test_local_opt_generator(self):
+        # Optimization packages are found and loaded when a local optimization runs
+        times, output = import_times('rsopt.libe_tools.generator_functions.local_opt_generator')
+        self.assertNotIn('nlopt', times)
+        self.assertNotIn('scipy', times)
+        self.assertEqual(output, '')
+
+
+if __name__ == '__main__':
+    for module in MODULES:
+        times, _ = import_times(module)
+        print(f'{module:<30} {times[module] / 1e3:8.1f} ms  {" ".join(heavy_imports(times))}')
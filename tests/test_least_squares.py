@@ -0,0 +1,118 @@
+import os
+import unittest
+import importlib.util
+import tempfile
+import numpy as np
+from libensemble.message_numbers import WORKER_DONE
+from rsopt.configuration import Configuration, Job
+from rsopt.libe_tools.optimizer import libEnsembleOptimizer
+from rsopt.simulation import SimulationFunction, format_evaluation
+from rsopt import extraction
+
+_RESULTS = {'betax': {'file': 'twiss.h5', 'attribute': '@betax', 'target': 18.},
+            'betay': {'file': 'twiss.h5', 'attribute': '@betay', 'target': 20., 'weight': 4.},
+            'length': {'file': 'twiss.h5', 'attribute': '@length'}}
+
+
+def residuals(x):
+    return np.array([x[0] - 0.3, 2. * (x[1] - 0.6), x[0] * x[1] - 0.18])
+
+
+def make_config(method, results=None, components=0):
+    job = Job('python')
+    job.parameters = {'a': {'min': 0., 'max': 1., 'start': 0.5}, 'b': {'min': 0., 'max': 1., 'start': 0.5}}
+    job.setup = {'function': lambda a, b: residuals([a, b]), 'execution_type': 'serial'}
+    job.results = results or {}
+    config = Configuration()
+    config.set_jobs(job)
+    config.options = {'software': 'nlopt', 'method': method, 'exit_criteria': {'sim_max': 200},
+                      'components': components}
+
+    return config
+
+
+class TestResiduals(unittest.TestCase):
+    sim_specs = {'out': [('f', float), ('fvec', float, 3)]}
+
+    def test_vector(self):
+        output = format_evaluation(self.sim_specs, [1., 2., 2.])
+        np.testing.assert_array_equal(output['fvec'][0], [1., 2., 2.])
+        self.assertEqual(output['f'][0], 9.)
+
+    def test_scalar_spread(self):
+        output = format_evaluation(self.sim_specs, 12.)
+        self.assertAlmostEqual(output['f'][0], 12.)
+        self.assertTrue(np.all(output['fvec'][0] == output['fvec'][0][0]))
+
+    def test_wrong_length(self):
+        with self.assertRaises(AssertionError):
+            format_evaluation(self.sim_specs, [1., 2.])
+
+    def test_results_residuals(self):
+        values = {'betax': 19., 'betay': 19., 'length': 3.}
+        fvec = extraction.results_residuals(_RESULTS, values)
+        np.testing.assert_array_equal(fvec, [1., -2.])
+        self.assertEqual(np.sum(fvec**2), extraction.results_objective(_RESULTS, values))
+
+
+class TestConfiguration(unittest.TestCase):
+
+    def _configure_sim(self, config):
+        opt = libEnsembleOptimizer()
+        opt.load_configuration(config)
+        opt.gen_specs['user'] = {}
+        opt._configure_sim()
+        return opt
+
+    def test_components_from_results(self):
+        opt = self._configure_sim(make_config('dfols', _RESULTS))
+        self.assertIn(('fvec', float, 2), opt.sim_specs['out'])
+        self.assertEqual(opt.gen_specs['user']['components'], 2)
+
+    def test_components_option(self):
+        opt = self._configure_sim(make_config('pounders', components=3))
+        self.assertIn(('fvec', float, 3), opt.sim_specs['out'])
+
+    def test_components_required(self):
+        with self.assertRaises(AssertionError):
+            self._configure_sim(make_config('dfols'))
+
+    def test_scalar_methods_unchanged(self):
+        opt = self._configure_sim(make_config('LN_SBPLX', _RESULTS))
+        self.assertNotIn('fvec', [field[0] for field in opt.sim_specs['out']])
+
+    def test_simulation_function_residuals(self):
+        import h5py as h5
+        directory = tempfile.TemporaryDirectory()
+        with h5.File(os.path.join(directory.name, 'twiss.h5'), 'w') as datafile:
+            datafile.attrs.update({'betax': 17., 'betay': 21., 'length': 2.})
+        opt = self._configure_sim(make_config('dfols', _RESULTS))
+        H = np.zeros(1, dtype=[('x', float, (2,))])
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        try:
+            output, _, status = SimulationFunction(opt._config.jobs, None)(H, {}, opt.sim_specs, {})
+        finally:
+            os.chdir(cwd)
+            directory.cleanup()
+        self.assertEqual(status, WORKER_DONE)
+        np.testing.assert_array_equal(output['fvec'][0], [-1., 2.])
+        self.assertEqual(output['f'][0], 5.)
+        self.assertEqual(output['length'][0], 2.)
+
+
+@unittest.skipUnless(importlib.util.find_spec('dfols'), 'dfols is not installed')
+class TestDfols(unittest.TestCase):
+
+    def test_run(self):
+        from rsopt.run import local_optimizer
+        config = make_config('dfols', components=3)
+        directory = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        try:
+            H, persis_info, _ = local_optimizer(config).run()
+        finally:
+            os.chdir(cwd)
+            directory.cleanup()
+        self.assertLess(np.min(H['f'][H['returned']]), 1e-8)
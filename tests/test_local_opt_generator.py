@@ -0,0 +1,28 @@
+import unittest
+import numpy as np
+from rsopt.libe_tools.generator_functions import local_opt_generator
+
+_USER_SPECS = {'lb': np.array([-3., -2.]), 'ub': np.array([3., 2.])}
+
+
+class TestMultistartStarts(unittest.TestCase):
+
+    def setUp(self):
+        self.rand_stream = np.random.RandomState(3)
+
+    def test_xstart_first(self):
+        user_specs = {**_USER_SPECS, 'xstart': np.array([0., 1.]), 'nstarts': 3}
+        starts = local_opt_generator.initialize_starts(user_specs, 2, self.rand_stream)
+        self.assertEqual(starts.shape, (3, 2))
+        np.testing.assert_allclose(starts[0], [0.5, 0.75])
+        self.assertTrue(np.all((starts > 0.) & (starts < 1.)))
+
+    def test_user_starts(self):
+        user_specs = {**_USER_SPECS, 'xstart': np.array([0., 1.]), 'starts': [[3., 2.], [-3., -2.]], 'nstarts': 2}
+        starts = local_opt_generator.initialize_starts(user_specs, 2, self.rand_stream)
+        np.testing.assert_allclose(starts, [[0.5, 0.75], [1., 1.]])
+
+    def test_default_nstarts(self):
+        user_specs = {**_USER_SPECS, 'starts': np.array([1., 1.])}
+        starts = local_opt_generator.initialize_starts(user_specs, 2, self.rand_stream)
+        self.assertEqual(starts.shape, (2, 2))
@@ -0,0 +1,47 @@
+import unittest
+from rsopt.libe_tools import monitor
+
+
+class DummyTask:
+    def __init__(self, progress):
+        self.progress = progress
+
+
+def read_progress(task):
+    return task.progress
+
+
+def stalled(progress):
+    return progress < 0.5
+
+
+class TestMonitor(unittest.TestCase):
+
+    def test_validate(self):
+        self.assertTrue(monitor.validate_monitor({'partial_result': read_progress, 'terminate': stalled}))
+        self.assertTrue(monitor.validate_monitor({'partial_result': ['monitor.py', 'read'],
+                                                  'terminate': ['monitor.py', 'stop'],
+                                                  'result': 'partial'}))
+        self.assertFalse(monitor.validate_monitor({'partial_result': read_progress}))
+        self.assertFalse(monitor.validate_monitor({'partial_result': read_progress, 'terminate': stalled,
+                                                   'result': 'best'}))
+
+    def test_check(self):
+        m = monitor.Monitor.from_setup({'partial_result': read_progress, 'terminate': stalled, 'interval': 0.})
+        self.assertFalse(m.check(DummyTask(None)))
+        self.assertFalse(m.check(DummyTask(0.7)))
+        self.assertTrue(m.check(DummyTask(0.2)))
+        self.assertEqual(m.value, 0.2)
+
+    def test_interval(self):
+        m = monitor.Monitor(read_progress, stalled, interval=1e6)
+        self.assertFalse(m.check(DummyTask(0.2)))
+        self.assertIsNone(m.value)
+
+    def test_result(self):
+        m = monitor.Monitor(read_progress, stalled, interval=0., result='partial')
+        self.assertEqual(m.get_result(1e9), 1e9)
+        m.check(DummyTask(0.2))
+        self.assertEqual(m.get_result(1e9), 0.2)
+        m.result = 'penalty'
+        self.assertEqual(m.get_result(1e9), 1e9)
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from rsopt.configuration import Configuration, Job
+from rsopt.libe_tools.generator_functions import multi_fidelity as mf
+
+
+def make_local_H(f, fidelity, returned=True):
+    local_H = mf.initialize_local_H(np.zeros(0, dtype=[('sim_id', int)]), 2)
+    mf.add_points_to_local_H(local_H, np.linspace(0, 1, 2 * len(f)).reshape(-1, 2), 0,
+                             {'lb': np.zeros(2), 'ub': np.ones(2)})
+    local_H['f'] = f
+    local_H['fidelity'] = fidelity
+    local_H['returned'] = returned
+
+    return local_H
+
+
+class TestPromotion(unittest.TestCase):
+
+    def test_no_promotion_until_enough_results(self):
+        local_H = make_local_H([3., 1.], [0, 0])
+        self.assertIsNone(mf.next_promotion(local_H, 2, 3))
+
+    def test_promotes_best_point(self):
+        local_H = make_local_H([3., 1., 2.], [0, 0, 0])
+        self.assertEqual(mf.next_promotion(local_H, 2, 3), 1)
+        local_H['promoted'][1] = True
+        self.assertIsNone(mf.next_promotion(local_H, 2, 3))
+
+    def test_failed_points_ranked_last(self):
+        local_H = make_local_H([np.nan, 2., 1.], [0, 0, 0])
+        self.assertEqual(mf.next_promotion(local_H, 2, 3), 2)
+
+    def test_highest_level_first(self):
+        local_H = make_local_H([1., 2., 3., 0.5, 0.7, 0.9], [0, 0, 0, 1, 1, 1])
+        local_H['promoted'][0] = True
+        self.assertEqual(mf.next_promotion(local_H, 3, 3), 3)
+        # Points at the highest level are never promoted
+        self.assertIsNone(mf.next_promotion(local_H, 2, 3))
+
+    def test_best_at_highest_fidelity(self):
+        local_H = make_local_H([0., 2., 1.], [0, 1, 1])
+        self.assertEqual(mf.best_at_highest_fidelity(local_H), 2)
+        local_H['returned'][1:] = False
+        self.assertEqual(mf.best_at_highest_fidelity(local_H), 0)
+
+
+class TestFidelitySettings(unittest.TestCase):
+
+    def setUp(self):
+        self.job = Job('python')
+        self.job.settings = {'particles': 10000, 'steps': 100}
+        self.job.fidelities = [{'particles': 100, 'steps': 10}, {'particles': 1000}]
+
+    def test_fidelity_settings(self):
+        self.assertEqual(self.job.fidelity_settings(0), {'particles': 100, 'steps': 10})
+        self.assertEqual(self.job.fidelity_settings(1), {'particles': 1000, 'steps': 100})
+        self.assertEqual(self.job.fidelity_settings(2), self.job.settings)
+        self.assertEqual(self.job.fidelity_settings(), self.job.settings)
+
+    def test_fidelity_levels(self):
+        config = Configuration()
+        config.set_jobs([self.job, Job('python')])
+        self.assertEqual(config.get_fidelity_levels(), 3)
+
+        other = Job('python')
+        other.fidelities = [{'particles': 100}]
+        config.set_jobs(other)
+        with self.assertRaises(AssertionError):
+            config.get_fidelity_levels()
@@ -0,0 +1,131 @@
+import unittest
+import numpy as np
+from rsopt.configuration import Configuration, Job
+from rsopt.libe_tools.generator_functions import nsga2
+from rsopt.libe_tools.optimizer_nsga2 import Nsga2Optimizer
+from rsopt.simulation import format_evaluation
+
+
+def zdt1(x):
+    # Pareto front at x[1:] = 0 with f2 = 1 - sqrt(f1)
+    x = np.atleast_2d(x)
+    g = 1. + 9. * np.mean(x[:, 1:], axis=1)
+    f1 = x[:, 0]
+    return np.column_stack([f1, g * (1. - np.sqrt(f1 / g))])
+
+
+def brute_force_front(F):
+    return {i for i in range(len(F)) if not any(nsga2.dominates(F[j], F[i]) or
+                                                (j < i and np.all(F[j] == F[i])) for j in range(len(F)))}
+
+
+class TestParetoFront(unittest.TestCase):
+
+    def setUp(self):
+        self.rand_stream = np.random.RandomState(3)
+
+    def _check_front(self, F):
+        front = nsga2.ParetoFront(F.shape[1])
+        for i, f in enumerate(F):
+            front.add(f, i)
+        self.assertEqual(set(front.ids), brute_force_front(F))
+
+    def test_two_objectives(self):
+        # Rounded values give ties in each objective
+        self._check_front(np.round(self.rand_stream.uniform(size=(400, 2)), 1))
+        self._check_front(zdt1(self.rand_stream.uniform(size=(400, 4))))
+
+    def test_three_objectives(self):
+        self._check_front(np.round(self.rand_stream.uniform(size=(300, 3)), 1))
+
+    def test_sorted_two_objectives(self):
+        front = nsga2.ParetoFront(2)
+        for i, f in enumerate(zdt1(self.rand_stream.uniform(size=(200, 3)))):
+            front.add(f, i)
+        self.assertTrue(np.all(np.diff(front.F[:, 0]) > 0.))
+        self.assertTrue(np.all(np.diff(front.F[:, 1]) < 0.))
+
+    def test_failed_points_skipped(self):
+        front = nsga2.ParetoFront(2)
+        self.assertFalse(front.add([np.nan, 0.], 0))
+        self.assertTrue(front.add([1., 1.], 1))
+        self.assertEqual(len(front), 1)
+
+    def test_history_front(self):
+        F = zdt1(self.rand_stream.uniform(size=(50, 3)))
+        H = np.zeros(50, dtype=[('x', float, (3,)), ('f1', float), ('f2', float), ('returned', bool)])
+        H['f1'], H['f2'], H['returned'] = F[:, 0], F[:, 1], True
+        H['returned'][0] = False
+        front = nsga2.pareto_front(H, ['f1', 'f2'])
+        self.assertEqual(len(front), len(brute_force_front(F[1:])))
+        self.assertTrue(np.all(np.diff(front['f1']) > 0.))
+
+
+class TestSelection(unittest.TestCase):
+
+    def test_non_dominated_sort(self):
+        F = np.array([[1., 4.], [2., 2.], [4., 1.], [3., 3.], [4., 4.], [np.nan, 0.]])
+        np.testing.assert_array_equal(nsga2.non_dominated_sort(F), [0, 0, 0, 1, 2, 0])
+
+    def test_crowding_keeps_extremes(self):
+        F = np.array([[0., 1.], [0.5, 0.5], [0.51, 0.49], [1., 0.]])
+        keep, ranks, _ = nsga2.select(F, 3)
+        self.assertIn(0, keep)
+        self.assertIn(3, keep)
+        self.assertTrue(np.all(ranks == 0))
+
+    def test_zdt1(self):
+        rand_stream = np.random.RandomState(5)
+        population = nsga2.NSGA2(6, 40, rand_stream)
+        # Two batches in flight and asynchronous returns
+        in_flight = population.ask(80)
+        for _ in range(150):
+            returned = rand_stream.permutation(len(in_flight))[:20]
+            population.tell(in_flight[returned], zdt1(in_flight[returned]))
+            in_flight = np.vstack([np.delete(in_flight, returned, axis=0), population.ask(20)])
+        F = population.F
+        # Distance from the true front and spread along it
+        self.assertLess(np.max(F[:, 1] - (1. - np.sqrt(F[:, 0]))), 0.05)
+        self.assertGreater(np.ptp(F[:, 0]), 0.8)
+
+    def test_offspring_on_cube(self):
+        population = nsga2.NSGA2(3, 10, np.random.RandomState(0))
+        x = population.ask(10)
+        population.tell(x, zdt1(x))
+        offspring = population.ask(7)
+        self.assertEqual(offspring.shape, (7, 3))
+        self.assertTrue(np.all((offspring >= 0.) & (offspring <= 1.)))
+
+
+class TestObjectives(unittest.TestCase):
+    sim_specs = {'out': [('f', float), ('k', float), ('km', float)], 'user': {'objectives': ['k', 'km']}}
+
+    def test_named(self):
+        output = format_evaluation(self.sim_specs, {'km': 2., 'k': 1.})
+        self.assertEqual((output['k'][0], output['km'][0], output['f'][0]), (1., 2., 1.))
+
+    def test_sequence(self):
+        output = format_evaluation(self.sim_specs, (3., 4.))
+        self.assertEqual((output['k'][0], output['km'][0]), (3., 4.))
+        with self.assertRaises(AssertionError):
+            format_evaluation(self.sim_specs, (3., 4., 5.))
+
+    def test_penalty(self):
+        output = format_evaluation(self.sim_specs, 1e9)
+        self.assertEqual((output['k'][0], output['km'][0]), (1e9, 1e9))
+
+    def test_configure_sim(self):
+        job = Job('python')
+        job.parameters = {'a': {'min': 0., 'max': 1., 'start': 0.5}}
+        job.setup = {'function': lambda a: {'k': a, 'km': 1. - a}, 'execution_type': 'serial'}
+        job.results = {'km': {'file': 'out.h5', 'attribute': '@km'}}
+        config = Configuration()
+        config.set_jobs(job)
+        config.options = {'software': 'nsga2', 'objectives': ['k', 'km'], 'exit_criteria': {'sim_max': 10}}
+        opt = Nsga2Optimizer()
+        opt.load_configuration(config)
+        opt._configure_sim()
+        names = [name for name, *_ in opt.sim_specs['out']]
+        self.assertEqual(names.count('km'), 1)
+        self.assertIn('k', names)
+        self.assertEqual(opt.sim_specs['user']['objectives'], ['k', 'km'])
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from libensemble.message_numbers import EVAL_SIM_TAG
+from rsopt.configuration import Configuration, Job
+from rsopt.configuration.parameters import Parameters, parameter_value
+from rsopt.libe_tools.feasibility import feasibility_alloc
+from rsopt.libe_tools.generator_functions.local_opt_generator import cube_to_x, x_to_cube
+from rsopt.run import pso_optimizer
+from rsopt.simulation import compose_args
+
+_PARAMETERS = {'n': {'min': 1, 'max': 5, 'start': 2, 'type': 'integer'},
+               'shape': {'type': 'categorical', 'values': ['a', 'b', 'c'], 'start': 'b'},
+               'current': {'min': 1e-3, 'max': 1e3, 'start': 1., 'type': 'log'},
+               'gap': {'min': 0., 'max': 2., 'start': 1.}}
+
+
+def objective(n, shape, current, gap):
+    assert isinstance(n, int) and shape in ('a', 'b', 'c')
+    return (n - 3)**2 + {'a': 1., 'b': 0., 'c': 2.}[shape] + np.log10(current)**2 + gap**2
+
+
+def make_job():
+    job = Job('python')
+    job.parameters = _PARAMETERS
+    job.setup = {'function': objective, 'execution_type': 'serial'}
+
+    return job
+
+
+class TestParameterTypes(unittest.TestCase):
+
+    def test_parse(self):
+        job = make_job()
+        self.assertEqual(job._parameters.get_types(), ['integer', 'categorical', 'log', 'float'])
+        np.testing.assert_array_equal(job._parameters.get_lower_bound(), [1, 0, 1e-3, 0.])
+        np.testing.assert_array_equal(job._parameters.get_upper_bound(), [5, 2, 1e3, 2.])
+        np.testing.assert_array_equal(job._parameters.get_start(), [2, 1, 1., 1.])
+
+    def test_untyped(self):
+        config = Configuration()
+        job = Job('python')
+        job.parameters = {'gap': {'min': 0., 'max': 2., 'start': 1.}}
+        config.set_jobs(job)
+        self.assertIsNone(config.get_parameter_types())
+
+    def test_invalid(self):
+        for parameter in [{'min': 0., 'max': 1., 'start': 0.5, 'type': 'log'},
+                          {'min': 0, 'max': 1.5, 'start': 1, 'type': 'integer'},
+                          {'min': 0., 'max': 1., 'start': 0.5, 'type': 'complex'},
+                          {'type': 'categorical', 'values': ['a', 'b'], 'start': 'c'}]:
+            with self.assertRaises(AssertionError):
+                Parameters().parse('p', [parameter.get(key) for key in ('min', 'max', 'start', 'samples', 'type',
+                                                                        'values')])
+
+    def test_values(self):
+        _, kwargs = compose_args([3., 2., 10., 0.5], make_job().parameters, {})
+        self.assertEqual(kwargs, {'n': 3, 'shape': 'c', 'current': 10., 'gap': 0.5})
+        self.assertIsInstance(kwargs['n'], int)
+        self.assertEqual(parameter_value({'type': 'float'}, 0.25), 0.25)
+
+
+class TestCubeTransformation(unittest.TestCase):
+    user_specs = {'lb': np.array([1, 0, 1e-3, 0.]), 'ub': np.array([5, 2, 1e3, 2.]),
+                  'parameter_types': ['integer', 'categorical', 'log', 'float']}
+
+    def test_round_trip(self):
+        x = np.array([[2, 1, 1., 1.], [5, 0, 1e-2, 0.5]])
+        np.testing.assert_allclose(cube_to_x(x_to_cube(x, self.user_specs), self.user_specs), x)
+
+    def test_log(self):
+        np.testing.assert_allclose(x_to_cube(np.array([1., 1e-3, 1e3]), {'lb': np.full(3, 1e-3),
+                                                                         'ub': np.full(3, 1e3),
+                                                                         'parameter_types': ['log'] * 3}),
+                                   [0.5, 0., 1.])
+
+    def test_integer_bins(self):
+        # Every integer covers an equal part of the cube
+        user_specs = {'lb': np.array([1.]), 'ub': np.array([5.]), 'parameter_types': ['integer']}
+        x = cube_to_x(np.linspace(0., 1., 1001).reshape(-1, 1), user_specs)
+        values, counts = np.unique(x, return_counts=True)
+        np.testing.assert_array_equal(values, [1, 2, 3, 4, 5])
+        self.assertLessEqual(counts.max() - counts.min(), 1)
+
+    def test_float(self):
+        user_specs = {'lb': np.array([1.]), 'ub': np.array([5.])}
+        np.testing.assert_allclose(cube_to_x(np.array([0.25]), user_specs), [2.])
+
+
+def fake_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+    # Hands out rows in order without checking 'given', like persistent_aposmm_alloc
+    Work = {}
+    for i in W['worker_id'][W['active'] == 0]:
+        row = persis_info.get('next_to_give', 0)
+        if row < len(H):
+            Work[i] = {'tag': EVAL_SIM_TAG, 'libE_info': {'H_rows': np.array([row])}}
+            persis_info['next_to_give'] = row + 1
+
+    return Work, persis_info
+
+
+class TestDeduplication(unittest.TestCase):
+    sim_specs = {'out': [('f', float), ('duplicate', bool)]}
+
+    def test_duplicates(self):
+        W = np.zeros(2, dtype=[('worker_id', int), ('active', int)])
+        W['worker_id'] = [1, 2]
+        H = np.zeros(3, dtype=self.sim_specs['out'] + [('x', float, (2,)), ('given', bool), ('returned', bool),
+                                                       ('given_time', float)])
+        H['x'] = [[1.2, 0.5], [0.9, 0.5], [2., 0.5]]
+        alloc_specs = {'user': {'alloc_f': fake_alloc, 'parameter_types': ['integer', 'float'],
+                                'lb': np.zeros(2), 'ub': np.array([3., 1.])}}
+        persis_info = {}
+        Work, persis_info = feasibility_alloc(W, H, self.sim_specs, {}, alloc_specs, persis_info)
+        np.testing.assert_array_equal(H['x'][:, 0], [1., 1., 2.])
+        np.testing.assert_array_equal(H['duplicate'], [False, True, False])
+        # The repeated point is not handed to the second worker
+        self.assertEqual(list(Work), [1])
+        self.assertFalse(H['returned'][1])
+
+        H['f'][0], H['returned'][0] = 4., True
+        W['active'] = [1, 0]
+        Work, _ = feasibility_alloc(W, H, self.sim_specs, {}, alloc_specs, persis_info)
+        self.assertEqual(Work[2]['libE_info']['H_rows'][0], 2)
+        self.assertTrue(H['returned'][1])
+        self.assertEqual(H['f'][1], 4.)
+
+
+class TestOptimization(unittest.TestCase):
+
+    def test_pso(self):
+        config = Configuration()
+        config.set_jobs(make_job())
+        config.options = {'software': 'pso', 'exit_criteria': {'sim_max': 40}, 'nworkers': 3}
+        directory = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        try:
+            H, _, _ = pso_optimizer(config).run()
+        finally:
+            os.chdir(cwd)
+            directory.cleanup()
+        H = H[H['returned']]
+        np.testing.assert_array_equal(H['x'][:, :2], np.round(H['x'][:, :2]))
+        simulated = H['x'][~H['duplicate']]
+        self.assertEqual(len(np.unique(simulated, axis=0)), len(simulated))
+        self.assertTrue(np.all((H['x'][:, 2] >= 1e-3) & (H['x'][:, 2] <= 1e3)))
@@ -0,0 +1,62 @@
+import io
+import unittest
+import numpy as np
+from contextlib import redirect_stdout
+from rsopt.pkcli import optimize
+
+
+def make_history(f, returned, fidelity=None):
+    dtype = [('x', float, (1,)), ('f', float), ('returned', bool), ('prescreened', bool), ('rejected', bool)]
+    if fidelity is not None:
+        dtype.append(('fidelity', int))
+    H = np.zeros(len(f), dtype=dtype)
+    H['x'][:, 0] = np.arange(len(f))
+    H['f'] = f
+    H['returned'] = returned
+    if fidelity is not None:
+        H['fidelity'] = fidelity
+
+    return H
+
+
+def final_result(software, H):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        optimize._final_result[software](H)
+
+    return output.getvalue()
+
+
+class TestFinalLocalResult(unittest.TestCase):
+
+    def test_unreturned_rows(self):
+        # Rows that were generated but not returned have f = 0
+        H = make_history([2., 0., 1., 0.], [True, False, True, False])
+        self.assertEqual(final_result('pso', H), "Minimum result: [2.] 1.0\n")
+
+    def test_prescreened_and_rejected_rows(self):
+        H = make_history([2., 0.5, 1., 0.1], [True] * 4)
+        H['prescreened'][1] = True
+        H['rejected'][3] = True
+        self.assertEqual(final_result('nlopt', H), "Minimum result: [2.] 1.0\n")
+
+    def test_nan(self):
+        H = make_history([np.nan, 3., 2.], [True] * 3)
+        self.assertEqual(final_result('pso', H), "Minimum result: [2.] 2.0\n")
+
+    def test_nothing_evaluated(self):
+        H = make_history([0., 0.], [False, False])
+        self.assertEqual(final_result('pso', H), "Minimum result: no points were evaluated\n")
+
+    def test_cmaes(self):
+        H = make_history([0.5, 0., 0.25], [True, False, True])
+        self.assertEqual(final_result('cmaes', H), "Minimum result: [2.] 0.25\n")
+
+    def test_bayesian(self):
+        H = make_history([0., 0.75, 0.5], [False, True, True])
+        self.assertEqual(final_result('bayesian', H), "Minimum result: [2.] 0.5\n")
+
+    def test_multifidelity(self):
+        # Only full fidelity rows that returned are reported
+        H = make_history([0.1, 0., 0.5, 0.75], [True, False, True, True], fidelity=[1, 2, 2, 2])
+        self.assertEqual(final_result('multifidelity', H), "Minimum result: [2.] 0.5\n")
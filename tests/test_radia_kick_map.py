@@ -0,0 +1,81 @@
+import unittest
+import sys
+from unittest import mock
+import numpy as np
+sys.modules.setdefault("radia", mock.MagicMock())
+from rsopt.codes.radia import sim_functions
+
+_PERIOD, _PERIOD_NUMBER, _GAP = 46., 2, 20.
+_P0 = [0, -_PERIOD * _PERIOD_NUMBER / 2, 0]
+_R = 0.75 * _GAP
+_NP = 21
+
+
+class FakeKickMap:
+    # Stands in for rad.FldFocKickPer with an analytic kick map and counts the transverse points evaluated
+    # Like Radia, matrix rows run from the top of the grid down and the grid positions are returned with the kicks
+    def __init__(self, peaks):
+        self.peaks = peaks
+        self.points = 0
+
+    def kick(self, x, z):
+        return sum(a * np.exp(-((x - x0)**2 + (z - z0)**2) / w**2) for a, x0, z0, w in self.peaks)
+
+    def __call__(self, obj, p0, vl, per, nper, vt, r1, np1, r2, np2):
+        self.points += np1 * np2
+        x = p0[0] + np.linspace(-r1 / 2., r1 / 2., np1)
+        z = p0[2] + np.linspace(r2 / 2., -r2 / 2., np2)
+        xx, zz = np.meshgrid(x, z)
+        kh = self.kick(xx, zz)
+        return [kh.tolist(), (0.5 * kh).tolist(), kh.tolist(), x.tolist(), z.tolist(), '']
+
+
+class TestKickMapMax(unittest.TestCase):
+
+    def setUp(self):
+        sim_functions._KM_MAX_LOCATION.clear()
+
+    def _km_max(self, kick_map, mode):
+        with mock.patch.object(sim_functions.rad, 'FldFocKickPer', kick_map):
+            return sim_functions.km_max(None, _P0, _PERIOD, _PERIOD_NUMBER, _R, _NP, _R, _NP, mode=mode)
+
+    def test_adaptive_matches_full_grid(self):
+        full_map, adaptive_map = FakeKickMap([(1e-3, 2.1, -3.4, 4.)]), FakeKickMap([(1e-3, 2.1, -3.4, 4.)])
+        full = self._km_max(full_map, 'full')
+        adaptive = self._km_max(adaptive_map, 'adaptive')
+
+        self.assertEqual(full, adaptive)
+        self.assertEqual(full_map.points, _NP * _NP)
+        self.assertLess(adaptive_map.points * 3, full_map.points)
+
+    def test_adaptive_error_bound(self):
+        rng = np.random.default_rng(4)
+        for _ in range(25):
+            peaks = [(rng.uniform(1e-4, 1e-3), *rng.uniform(-_R / 2., _R / 2., 2), rng.uniform(0.5, 4.))
+                     for _ in range(3)]
+            full = self._km_max(FakeKickMap(peaks), 'full')
+            adaptive = self._km_max(FakeKickMap(peaks), 'adaptive')
+            # Only points of the full grid are evaluated so the full grid maximum is never exceeded
+            self.assertLessEqual(adaptive, full)
+            self.assertLess(full - adaptive, 0.5 * full)
+
+    def test_cached_location_is_refined(self):
+        # A narrow peak that falls between coarse points is recovered from the previous maximum location
+        wide = [(1e-3, 3.75, 0., 6.)]
+        narrow = [(2e-4, 3.75, 0., 6.), (1e-3, -3., 3., 0.5)]
+        sim_functions._KM_MAX_LOCATION[(_R, _NP, _R, _NP)] = (-3., 3.)
+        full = self._km_max(FakeKickMap(narrow), 'full')
+        adaptive = self._km_max(FakeKickMap(narrow), 'adaptive')
+        self.assertEqual(full, adaptive)
+
+        sim_functions._KM_MAX_LOCATION.clear()
+        self._km_max(FakeKickMap(wide), 'adaptive')
+        self.assertAlmostEqual(sim_functions._KM_MAX_LOCATION[(_R, _NP, _R, _NP)][0], 3.75)
+
+    def test_cached_location(self):
+        self._km_max(FakeKickMap([(1e-3, 3.75, -3., 3.)]), 'adaptive')
+        np.testing.assert_allclose(sim_functions._KM_MAX_LOCATION[(_R, _NP, _R, _NP)], (3.75, -3.))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self._km_max(FakeKickMap([(1e-3, 0., 0., 1.)]), 'sparse')
@@ -0,0 +1,45 @@
+import os
+import time
+import tempfile
+import unittest
+from rsopt.codes.runner.Execution import CodeProcess, run_processes
+
+
+class TestCodeProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def test_output_to_log_files(self):
+        # More output than a pipe buffer holds
+        process = CodeProcess('yes output | head -c 1000000; echo problem >&2', self.directory.name, 'code')
+        self.assertEqual(run_processes([process]), [0])
+        self.assertEqual(os.path.getsize(process.log_file), 1000000)
+        with open(process.error_file) as ff:
+            self.assertEqual(ff.read(), 'problem\n')
+
+    def test_empty_error_log_removed(self):
+        process = CodeProcess('true', self.directory.name, 'code')
+        run_processes([process])
+        self.assertFalse(os.path.isfile(process.error_file))
+
+    def test_failure(self):
+        process = CodeProcess('exit 3', self.directory.name, 'code')
+        self.assertEqual(run_processes([process]), [3])
+
+    def test_timeout(self):
+        process = CodeProcess('sleep 10', self.directory.name, 'code', timeout=0.2)
+        start = time.time()
+        returncode, = run_processes([process])
+        self.assertLess(time.time() - start, 5.)
+        self.assertNotEqual(returncode, 0)
+        self.assertTrue(process.timed_out)
+
+    def test_concurrent(self):
+        processes = [CodeProcess('sleep 0.5', self.directory.name, f'code{i}') for i in range(3)]
+        start = time.time()
+        self.assertEqual(run_processes(processes), [0, 0, 0])
+        self.assertLess(time.time() - start, 1.4)
+
+    def tearDown(self):
+        self.directory.cleanup()
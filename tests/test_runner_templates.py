@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import unittest
+import yaml
+from importlib.util import find_spec
+from rsopt.codes.runner.Templates import Elegant
+
+_INPUT_MODULE = \
+    """
+lattice = "Q1: QUAD, L=0.1, K1={k1}\\n"
+run = "&run_setup lattice={source_directory}/lattice, use_beamline={beamline} &end\\n"
+"""
+
+
+class TestTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.directory.name, 'elegant_inputs.py'), 'w') as ff:
+            ff.write(_INPUT_MODULE)
+        sys.path.insert(0, self.directory.name)
+        self.template = Elegant({'settings': {'beamline': 'BL'},
+                                 'parameters': [{'k1': {}}],
+                                 'setup': {'input_file': 'elegant_inputs', 'source_directory': 'src',
+                                           'run_command': 'elegant', 'cores': 1}})
+
+    def test_fields_parsed_once(self):
+        self.assertEqual(self.template.fields, ('k1', 'source_directory', 'beamline'))
+
+    def test_template_reused(self):
+        for k1 in (1., 2.):
+            H = {'parameters': {'k1': k1}, 'active_directory': self.directory.name}
+            self.template.prepare(H, None)
+            with open(os.path.join(self.directory.name, 'elegant_0.in')) as ff:
+                self.assertEqual(ff.read(), f'Q1: QUAD, L=0.1, K1={k1}\n')
+        with open(os.path.join(self.directory.name, 'elegant_1.in')) as ff:
+            self.assertEqual(ff.read(), '&run_setup lattice=src/lattice, use_beamline=BL &end\n')
+
+    def test_label(self):
+        # The Runner labels codes when several of the same type are in the chain
+        self.template.label = 'elegant_2'
+        H = {'parameters': {'k1': 1.}, 'active_directory': self.directory.name}
+        self.template.prepare(H, None)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory.name, 'elegant_2_0.in')))
+        self.assertTrue(self.template.create_run_command(H).endswith('elegant_2_0.in'))
+        self.assertEqual(self.template.create_process(H).log_file,
+                         os.path.join(self.directory.name, 'log_elegant_2.log'))
+
+    @unittest.skipIf(find_spec('rsbeams') is None, 'The Runner requires rsbeams')
+    def test_concurrent_codes_of_same_type(self):
+        from rsopt.codes.runner.Runner import Runner
+        setup = {'input_file': 'elegant_inputs', 'source_directory': 'src', 'run_command': 'elegant', 'cores': 1}
+        code = {'settings': {'beamline': 'BL'}, 'parameters': [{'k1': {}}]}
+        schema = {'codes': [{'elegant': {**code, 'setup': setup}},
+                            {'elegant': {**code, 'setup': {**setup, 'concurrent': True,
+                                                           'input_distribution': 'beam.sdds'}}}],
+                  'options': {'software': 'nlopt'}}
+        schema_file = os.path.join(self.directory.name, 'schema.yml')
+        with open(schema_file, 'w') as ff:
+            yaml.dump(schema, ff)
+        runner = Runner(schema_file, objective_function=None)
+        labels = [code['code'].file_label for code in runner._groups[0]]
+        self.assertEqual(labels, ['elegant_0', 'elegant_1'])
+
+    def tearDown(self):
+        sys.path.remove(self.directory.name)
+        sys.modules.pop('elegant_inputs', None)
+        self.directory.cleanup()
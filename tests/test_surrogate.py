@@ -0,0 +1,149 @@
+import unittest
+import numpy as np
+from unittest import mock
+from libensemble.message_numbers import EVAL_SIM_TAG
+from rsopt.libe_tools import surrogate
+from rsopt.simulation import SimulationFunction, _PENALTY
+
+
+def branin(x):
+    # Branin function scaled to the unit square
+    x1, x2 = 15. * x[:, 0] - 5., 15. * x[:, 1]
+    return (x2 - 5.1 / (4. * np.pi**2) * x1**2 + 5. / np.pi * x1 - 6.)**2 + 10. * (1. - 1. / (8. * np.pi)) * np.cos(x1) + 10.
+
+
+class TestGaussianProcess(unittest.TestCase):
+
+    def setUp(self):
+        rand_stream = np.random.RandomState(7)
+        self.x = rand_stream.uniform(0, 1, (60, 2))
+        self.x_test = rand_stream.uniform(0, 1, (200, 2))
+
+    def test_incremental_matches_batch(self):
+        incremental = surrogate.GaussianProcess(2)
+        for x in self.x:
+            incremental.add(x, branin(x[np.newaxis, :]))
+        batch = surrogate.GaussianProcess(2)
+        batch.add(self.x, branin(self.x))
+        batch.length_scale = incremental.length_scale
+        batch.fit()
+        batch.length_scale = incremental.length_scale
+        batch._set_factor(np.linalg.cholesky(batch.kernel(batch.x, batch.x) + batch.nugget * np.eye(len(batch))))
+
+        np.testing.assert_allclose(incremental.predict(self.x_test)[0], batch.predict(self.x_test)[0], rtol=1e-6)
+
+    def test_prediction(self):
+        gp = surrogate.GaussianProcess(2)
+        gp.add(self.x, branin(self.x))
+        mean, std = gp.predict(self.x_test)
+        error = np.abs(mean - branin(self.x_test))
+        self.assertLess(np.median(error), 0.05 * np.ptp(branin(self.x_test)))
+        # Training points are reproduced with small uncertainty
+        mean, std = gp.predict(self.x[:5])
+        np.testing.assert_allclose(mean, branin(self.x[:5]), rtol=1e-3)
+        self.assertTrue(np.all(std < 1e-2 * np.std(gp.f)))
+
+    def test_update_matches_factorization(self):
+        gp = surrogate.GaussianProcess(2)
+        gp.add(self.x[:40], branin(self.x[:40]))
+        # Added points extend the factor by triangular solves. Nothing is refactored or solved by LU.
+        with mock.patch.object(np.linalg, 'cholesky', side_effect=AssertionError('refactored')), \
+                mock.patch.object(np.linalg, 'solve', side_effect=AssertionError('general solve')):
+            for x in self.x[40:]:
+                gp.add(x, branin(x[np.newaxis, :]), refit=False)
+            mean, std = gp.predict(self.x_test)
+        K = gp.kernel(gp.x, gp.x) + gp.nugget * np.eye(len(gp))
+        np.testing.assert_allclose(gp.L, np.linalg.cholesky(K), atol=1e-8)
+        alpha = np.linalg.solve(K, (gp.f - np.mean(gp.f)) / np.std(gp.f))
+        np.testing.assert_allclose(gp._alpha, alpha, rtol=1e-6, atol=1e-6 * np.max(np.abs(alpha)))
+        k = gp.kernel(self.x_test, gp.x)
+        np.testing.assert_allclose(mean, k @ alpha * np.std(gp.f) + np.mean(gp.f), rtol=1e-6)
+        variance = 1. + gp.nugget - np.sum(k * np.linalg.solve(K, k.T).T, axis=1)
+        np.testing.assert_allclose(std, np.sqrt(np.maximum(variance, 0.)) * np.std(gp.f), atol=1e-5 * np.std(gp.f))
+
+    def test_failed_refit(self):
+        gp = surrogate.GaussianProcess(2)
+        gp.add(self.x[:10], branin(self.x[:10]))
+        length_scale = gp.length_scale
+        # The incrementally built factor is kept if no length scale can be factored
+        with mock.patch.object(np.linalg, 'cholesky', side_effect=np.linalg.LinAlgError):
+            gp.add(self.x[10:20], branin(self.x[10:20]))
+        self.assertEqual(gp.length_scale, length_scale)
+        mean, _ = gp.predict(self.x[:20])
+        np.testing.assert_allclose(mean, branin(self.x[:20]), rtol=1e-3)
+
+    def test_repeated_point(self):
+        gp = surrogate.GaussianProcess(2)
+        gp.add(self.x[:3], branin(self.x[:3]))
+        gp.add(self.x[:1], branin(self.x[:1]))
+        mean, std = gp.predict(self.x[:3])
+        self.assertTrue(np.all(np.isfinite(mean)) and np.all(np.isfinite(std)))
+
+
+class TestPrescreen(unittest.TestCase):
+
+    def test_rules(self):
+        lcb = {**surrogate.PRESCREEN_DEFAULTS, 'rule': 'lcb', 'kappa': 2.}
+        self.assertTrue(surrogate.accept(1.5, 0.3, 1., lcb))
+        self.assertFalse(surrogate.accept(1.7, 0.3, 1., lcb))
+        probability = {**surrogate.PRESCREEN_DEFAULTS, 'rule': 'probability', 'min_probability': 0.05}
+        self.assertTrue(surrogate.accept(1.4, 0.3, 1., probability))
+        self.assertFalse(surrogate.accept(1.6, 0.3, 1., probability))
+
+    def test_alloc_wrapper(self):
+        n_points = 30
+        rand_stream = np.random.RandomState(2)
+        H = np.zeros(n_points + 2, dtype=[('x', float, 2), ('f', float), ('returned', bool)] +
+                     surrogate.PRESCREEN_FIELDS)
+        H['x'] = rand_stream.uniform(0, 1, (n_points + 2, 2))
+        H['x'][-2:] = [[0.54, 0.15], [0.05, 0.05]]  # near a minimum and near the maximum
+        H['f'][:n_points] = branin(H['x'][:n_points])
+        H['returned'][:n_points] = True
+
+        def inner_alloc(W, H, sim_specs, gen_specs, alloc_specs, persis_info):
+            Work = {}
+            for i, row in zip([1, 2], [n_points, n_points + 1]):
+                Work[i] = {'tag': EVAL_SIM_TAG, 'persis_info': persis_info[i], 'libE_info': {'H_rows': [row]}}
+            return Work, persis_info
+
+        alloc_specs = {'user': {'alloc_f': inner_alloc,
+                                'prescreen': {'lb': np.zeros(2), 'ub': np.ones(2), 'kappa': 1.}}}
+        persis_info = {1: {}, 2: {}}
+        Work, persis_info = surrogate.prescreen_alloc(None, H, {}, {}, alloc_specs, persis_info)
+
+        self.assertEqual(len(persis_info['surrogate']), n_points)
+        self.assertTrue(persis_info[1]['prescreen']['accept'])
+        self.assertFalse(persis_info[2]['prescreen']['accept'])
+
+        # Returned points extend the model without refactoring it and handed out points share one prediction
+        H['f'][n_points:] = branin(H['x'][n_points:])
+        H['returned'][n_points:] = True
+        with mock.patch.object(np.linalg, 'cholesky', side_effect=AssertionError('refactored')), \
+                mock.patch.object(surrogate.GaussianProcess, 'predict', autospec=True,
+                                  side_effect=surrogate.GaussianProcess.predict) as predict:
+            Work, persis_info = surrogate.prescreen_alloc(None, H, {}, {}, alloc_specs, persis_info)
+        self.assertEqual(len(persis_info['surrogate']), n_points + 2)
+        self.assertEqual(predict.call_count, 1)
+
+    def test_summary(self):
+        H = np.zeros(3, dtype=[('f', float), ('returned', bool)] + surrogate.PRESCREEN_FIELDS)
+        H['returned'] = True
+        H['f'] = [1., 2., 5.]
+        H['f_predicted'] = [1.5, 2., 5.]
+        H['f_std'] = [0.1, 0.1, 0.1]
+        H['prescreened'] = [False, False, True]
+        summary = surrogate.prescreen_summary(H)
+        self.assertEqual(summary['simulated'], 2)
+        self.assertEqual(summary['rejected'], 1)
+        self.assertAlmostEqual(summary['rms_prediction_error'], np.sqrt(0.125))
+
+    def test_rejected_point_not_simulated(self):
+        simulation = SimulationFunction([], None)
+        sim_specs = {'out': [('f', float)] + surrogate.PRESCREEN_FIELDS}
+        H = np.zeros(1, dtype=[('x', float, (2,))])
+        prescreen = {'f_predicted': 3., 'f_std': 0.5, 'accept': False}
+        output, _, _ = simulation(H, {'prescreen': prescreen}, sim_specs, {})
+        # The prediction is never recorded as an evaluation
+        self.assertEqual(output['f'][0], _PENALTY)
+        self.assertEqual(output['f_predicted'][0], 3.)
+        self.assertTrue(output['prescreened'][0])
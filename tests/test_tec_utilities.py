@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+import yaml
+import numpy as np
+import h5py as h5
+import logging
+from libensemble.message_numbers import WORKER_DONE, TASK_FAILED
+from rsopt.codes.warp import libe_sim
+from rsopt.codes.warp import tec_utilities
+
+_BASE_FILE = \
+    """
+tec:
+  strut_height: 1.0e-06
+  strut_width: 1.0e-06
+  emitter:
+    temperature: 1100.0
+simulation:
+  steps: 100
+"""
+
+
+class TestTecSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.base_file = os.path.join(self.directory.name, 'tec_start.yaml')
+        with open(self.base_file, 'w') as ff:
+            ff.write(_BASE_FILE)
+
+    def _read(self, sim_id):
+        with open(os.path.join(self.directory.name, sim_id + '.yaml')) as ff:
+            return yaml.safe_load(ff)
+
+    def test_default_paths(self):
+        tec_utilities.create_settings_file(self.directory.name, 'a', self.base_file, np.array([2e-6, 3e-6]))
+        settings = self._read('a')
+        self.assertEqual(settings['tec']['strut_height'], 2e-6)
+        self.assertEqual(settings['tec']['strut_width'], 3e-6)
+        self.assertEqual(settings['simulation']['steps'], 100)
+
+    def test_template_not_changed(self):
+        tec = tec_utilities.TecSettings(self.base_file, ['tec.emitter.temperature', 'simulation.steps', 'tec.gap'])
+        tec.write(self.directory.name, 'a', np.array([1200., 50, 1e-3]))
+        tec.write(self.directory.name, 'b', [1300., 60, 2e-3])
+        self.assertEqual(self._read('a')['tec']['emitter']['temperature'], 1200.)
+        self.assertEqual(self._read('b')['tec']['emitter']['temperature'], 1300.)
+        self.assertEqual(self._read('b')['tec']['gap'], 2e-3)
+        # Integer settings stay integers
+        self.assertEqual(self._read('a')['simulation']['steps'], 50)
+        self.assertIsInstance(self._read('a')['simulation']['steps'], int)
+        self.assertIsInstance(self._read('b')['tec']['emitter']['temperature'], float)
+        self.assertEqual(tec.template['tec']['emitter']['temperature'], 1100.)
+        self.assertNotIn('gap', tec.template['tec'])
+
+    def test_bad_path(self):
+        with self.assertRaises(AssertionError):
+            tec_utilities.TecSettings(self.base_file, ['missing.strut_height'])
+
+    def test_parameter_count(self):
+        tec = tec_utilities.TecSettings(self.base_file)
+        with self.assertRaises(AssertionError):
+            tec.settings([1., 2., 3.])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+class TestDiagnostics(unittest.TestCase):
+    diagnostics = {'efficiency': 'efficiency@eta', 'current': 'efficiency/J_em', 'power': 'efficiency@P_load'}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def _write(self, sim_id, complete=0):
+        with h5.File(os.path.join(self.directory.name, f'efficiency_id_{sim_id}.h5'), 'w') as datafile:
+            datafile.attrs['complete'] = complete
+            group = datafile.create_group('efficiency')
+            group.attrs['eta'] = 0.25
+            group.attrs['P_load'] = 3.
+            group['J_em'] = 12.
+
+    def test_read_several(self):
+        self._write('a')
+        values = tec_utilities.read_diagnostics(self.directory.name, 'a', self.diagnostics)
+        self.assertEqual(values, {'efficiency': 0.25, 'current': 12., 'power': 3.})
+        self.assertEqual(tec_utilities.get_efficiency(self.directory.name, 'a'), 0.25)
+
+    def test_not_written(self):
+        with self.assertRaises(tec_utilities.ResultNotWritten):
+            tec_utilities.read_diagnostics(self.directory.name, 'a')
+        self.assertIsNone(tec_utilities.read_partial_diagnostics(self.directory.name, 'a'))
+
+    def test_failed(self):
+        self._write('a', complete=1)
+        with self.assertRaises(tec_utilities.ResultFailed):
+            tec_utilities.read_diagnostics(self.directory.name, 'a')
+        self.assertEqual(tec_utilities.get_efficiency(self.directory.name, 'a', penalty=-10.), -10.)
+        # Monitors have no partial result to check
+        self.assertIsNone(tec_utilities.read_partial_diagnostics(self.directory.name, 'a'))
+
+    def test_missing_diagnostic(self):
+        logger = logging.getLogger('test')
+        self._write('a')
+        # A wrong location is a configuration error, not a failed simulation
+        with self.assertRaises(tec_utilities.DiagnosticMissing):
+            tec_utilities.read_diagnostics(self.directory.name, 'a', {'missing': 'efficiency@missing'})
+        with self.assertRaises(tec_utilities.DiagnosticMissing):
+            libe_sim.read_task_diagnostics(self.directory.name, 'a', {'missing': 'efficiency/missing'}, logger)
+
+    def test_task_diagnostics(self):
+        logger = logging.getLogger('test')
+        libe_sim._READ_DELAY = 0.
+        self._write('a', complete=1)
+        self.assertEqual(libe_sim.read_task_diagnostics(self.directory.name, 'a', self.diagnostics, logger),
+                         ({}, WORKER_DONE))
+        self.assertEqual(libe_sim.read_task_diagnostics(self.directory.name, 'b', self.diagnostics, logger),
+                         ({}, TASK_FAILED))
+
+    def test_output_fields(self):
+        sim_specs = {'out': [('f', float), ('current', float)], 'user': {'scaling': lambda x: -x}}
+        output = libe_sim.create_output(sim_specs, 0.25, {'current': 12., 'power': 3.})
+        self.assertEqual(output['f'][0], -0.25)
+        self.assertEqual(output['current'][0], 12.)
+
+    def tearDown(self):
+        self.directory.cleanup()
@@ -0,0 +1,27 @@
+import unittest
+import numpy as np
+from libensemble.message_numbers import WORKER_DONE, WORKER_KILL_ON_TIMEOUT
+from rsopt.libe_tools.tools import suggest_timeout
+from rsopt.simulation import STATUS_FIELDS
+
+
+class TestSuggestTimeout(unittest.TestCase):
+
+    def setUp(self):
+        self.H = np.zeros(101, dtype=STATUS_FIELDS + [('returned', bool)])
+        self.H['runtime'][:100] = np.arange(1., 101.)
+        self.H['sim_status'][:100] = WORKER_DONE
+        self.H['returned'][:100] = True
+
+    def test_suggest_timeout(self):
+        self.assertAlmostEqual(suggest_timeout(self.H, percentile=100., factor=2.), 200.)
+        self.assertAlmostEqual(suggest_timeout(self.H, percentile=50., factor=1.), 50.5)
+
+    def test_killed_points_ignored(self):
+        self.H['runtime'][99] = 1e4
+        self.H['sim_status'][99] = WORKER_KILL_ON_TIMEOUT
+        self.assertAlmostEqual(suggest_timeout(self.H, percentile=100., factor=1.), 99.)
+
+    def test_no_completed_points(self):
+        self.H['returned'] = False
+        self.assertIsNone(suggest_timeout(self.H))